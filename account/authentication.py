@@ -0,0 +1,173 @@
+# account/authentication.py
+"""
+JWT authentication without a users-table read per request.
+
+A principal is the handful of columns authentication needs (id, flags and
+token_version). It is cached in a small per-process LRU (PRINCIPAL_LOCAL_TTL)
+and in Redis (`auth:principal:{user_id}`). request.user is then a UserAuth
+built from the principal with every other field deferred. The first time a
+view reads one of those fields, the whole row is loaded in a single query
+(see UserAuth.refresh_from_db).
+
+Revocation: tokens carry a `ver` claim, and `revoke_tokens` bumps the user's
+token_version. Every token issued before the bump is then rejected, at most
+PRINCIPAL_LOCAL_TTL seconds later in other processes.
+
+Invalidation also bumps `auth:principal:ver:{user_id}`. A principal read from
+the DB is written back only if that version hasn't moved since the read
+started (same check as account.cards), so a request racing a revocation can't
+put the old token_version back for PRINCIPAL_TTL.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from django_redis import get_redis_connection
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import UserAuth
+
+logger = logging.getLogger(__name__)
+
+REDIS = get_redis_connection("default")
+
+PRINCIPAL_FIELDS = ("user_id", "is_active", "is_staff", "is_superuser", "is_verified", "token_version")
+PRINCIPAL_TTL = 10 * 60           # Redis copy
+PRINCIPAL_LOCAL_TTL = 30          # in-process copy; bounds revocation lag
+PRINCIPAL_LOCAL_SIZE = 10000
+PRINCIPAL_VERSION_TTL = 24 * 60 * 60
+
+TOKEN_VERSION_CLAIM = "ver"
+
+
+def principal_key(user_id) -> str:
+    return f"auth:principal:{user_id}"
+
+
+def principal_version_key(user_id) -> str:
+    return f"auth:principal:ver:{user_id}"
+
+
+# KEYS: principal key, version key   ARGV: expected version, payload, ttl
+_WRITE_BACK = REDIS.register_script("""
+local version = redis.call('GET', KEYS[2]) or '0'
+if version == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', tonumber(ARGV[3]))
+    return 1
+end
+return 0
+""")
+
+
+class _LRU:
+    def __init__(self, size: int, ttl: int):
+        self.size = size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+_local = _LRU(PRINCIPAL_LOCAL_SIZE, PRINCIPAL_LOCAL_TTL)
+
+
+class PrincipalCache:
+    @staticmethod
+    def get(user_id: int):
+        """Principal dict for the user, or None if the user doesn't exist."""
+        principal = _local.get(user_id)
+        if principal is not None:
+            return principal
+
+        raw, version = REDIS.mget([principal_key(user_id), principal_version_key(user_id)])
+        if raw is not None:
+            principal = json.loads(raw)
+        else:
+            principal = UserAuth.objects.filter(pk=user_id).values(*PRINCIPAL_FIELDS).first()
+            if principal is None:
+                return None
+            written = _WRITE_BACK(
+                keys=[principal_key(user_id), principal_version_key(user_id)],
+                args=[version.decode() if version is not None else "0", json.dumps(principal), PRINCIPAL_TTL],
+            )
+            if not written:
+                # invalidated while we read: good for this request, not worth caching
+                return principal
+
+        _local.set(user_id, principal)
+        return principal
+
+    @staticmethod
+    def invalidate(user_id: int) -> None:
+        _local.delete(user_id)
+        pipe = REDIS.pipeline(transaction=True)
+        pipe.incr(principal_version_key(user_id))
+        pipe.expire(principal_version_key(user_id), PRINCIPAL_VERSION_TTL)
+        pipe.delete(principal_key(user_id))
+        pipe.execute()
+
+
+def user_from_principal(principal: dict) -> UserAuth:
+    """A UserAuth with only the principal columns loaded, the rest deferred."""
+    # from_db expects partial values in concrete-field order
+    field_names = [f.attname for f in UserAuth._meta.concrete_fields if f.attname in PRINCIPAL_FIELDS]
+    return UserAuth.from_db("default", field_names, [principal[name] for name in field_names])
+
+
+def revoke_tokens(user) -> None:
+    """Invalidate every JWT issued to the user so far."""
+    UserAuth.objects.filter(pk=user.pk).update(token_version=F("token_version") + 1)
+    user.token_version = UserAuth.objects.values_list("token_version", flat=True).get(pk=user.pk)
+    user_id = user.pk
+    PrincipalCache.invalidate(user_id)
+    # again once the bump is visible to other connections
+    transaction.on_commit(lambda: PrincipalCache.invalidate(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        principal = PrincipalCache.get(user_id)
+        if principal is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not principal["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != principal["token_version"]:
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+        return user_from_principal(principal)
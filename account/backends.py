@@ -1,6 +1,5 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
 
 User = get_user_model()
 
@@ -10,13 +9,14 @@ class EmailPhoneUsernameBackend(ModelBackend):
         if username is None or password is None:
             return None
 
-        try:
-            user = User.objects.get(
-                Q(email__iexact=username) | Q(phone=username) | Q(username__iexact=username)
-            )
-        except User.DoesNotExist:
+        # one index probe on the column the identifier's shape points to
+        users = list(User.objects.by_login_identifier(username).order_by()[:2])
+        if len(users) != 1:
+            # run the hasher anyway so a miss takes as long as a wrong password
+            User().set_password(password)
             return None
 
+        user = users[0]
         if user.check_password(password) and self.user_can_authenticate(user):
             return user
         return None
\ No newline at end of file
@@ -0,0 +1,210 @@
+# account/cards.py
+"""
+Profile cards: the few columns every user list shows, cached in Redis.
+
+    card:v{CARD_SCHEMA}:{user_id}   JSON of CARD_FIELDS + the user's pop images; TTL = CARD_TTL
+    card:ver:{user_id}              per-user version, bumped on every invalidation
+
+A page of cards is one MGET. Misses are loaded with a single in_bulk query
+(plus one query for their pop images) and written back only if the user's
+version hasn't moved since the read started, so a backfill racing a profile
+save can't put the old row back. Invalidation runs after commit.
+
+Readers get UserAuth / MakeYourProfilePop instances (everything outside the
+card deferred), so the existing serializers work unchanged. Only stored
+columns are cached: age, picture URLs and `is_online` (live presence) are
+worked out per request. Users whose is_online came from presence carry
+`_presence_loaded = True`.
+
+Email stays out of the card (it's PII and most lists don't show it); callers
+that render it pass emails=True and it is filled in with one extra query.
+"""
+import json
+import logging
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from .models import MakeYourProfilePop, UserAuth
+from .presence import get_presence
+
+logger = logging.getLogger(__name__)
+
+REDIS = get_redis_connection("default")
+
+CARD_SCHEMA = 2   # bump when CARD_FIELDS or the payload shape changes
+CARD_TTL = 6 * 60 * 60
+CARD_VERSION_TTL = 24 * 60 * 60
+
+CARD_FIELDS = (
+    "user_id", "username", "full_name", "is_active",
+    "profile_pic", "profile_pic_variants", "dob",
+    "hobbies", "bio", "distance", "location", "looking_for",
+    "latitude", "longitude",
+)
+
+_USER_FIELDS = [f for f in UserAuth._meta.concrete_fields if f.attname in CARD_FIELDS]
+_POP_FIELDS = list(MakeYourProfilePop._meta.concrete_fields)
+
+# KEYS: card key, version key, ...   ARGV: ttl, expected version, payload, ...
+_BACKFILL = REDIS.register_script("""
+local written = 0
+for i = 1, #KEYS, 2 do
+    local version = redis.call('GET', KEYS[i + 1]) or '0'
+    if version == ARGV[i + 1] then
+        redis.call('SET', KEYS[i], ARGV[i + 2], 'EX', tonumber(ARGV[1]))
+        written = written + 1
+    end
+end
+return written
+""")
+
+
+def card_key(user_id) -> str:
+    return f"card:v{CARD_SCHEMA}:{user_id}"
+
+
+def version_key(user_id) -> str:
+    return f"card:ver:{user_id}"
+
+
+def _raw(instance, field):
+    value = getattr(instance, field.attname)
+    # FieldFile -> storage name
+    return getattr(value, "name", value) if hasattr(value, "storage") else value
+
+
+def _restore(model, fields, values: dict):
+    names = [f.attname for f in fields]
+    row = [
+        None if values.get(f.attname) is None else f.to_python(values[f.attname])
+        for f in fields
+    ]
+    return model.from_db("default", names, row)
+
+
+def _dump(user: UserAuth, pop_images) -> str:
+    return json.dumps(
+        {
+            "user": {f.attname: _raw(user, f) for f in _USER_FIELDS},
+            "pop_images": [{f.attname: _raw(pop, f) for f in _POP_FIELDS} for pop in pop_images],
+        },
+        cls=DjangoJSONEncoder,
+    )
+
+
+def _load(payload: dict) -> UserAuth:
+    user = _restore(UserAuth, _USER_FIELDS, payload["user"])
+    pop_images = [_restore(MakeYourProfilePop, _POP_FIELDS, values) for values in payload["pop_images"]]
+
+    # same shape prefetch_related leaves behind: user.pop_images.all() runs no query
+    queryset = user.pop_images.get_queryset()
+    queryset._result_cache = pop_images
+    queryset._prefetch_done = True
+    user._prefetched_objects_cache = {"pop_images": queryset}
+    return user
+
+
+class ProfileCardCache:
+    @staticmethod
+    def get_many(user_ids, presence: bool = True, emails: bool = False) -> dict:
+        """
+        {user_id: UserAuth} for the users that exist. With `presence`, their
+        is_online is the live state from Redis instead of the DB column; with
+        `emails`, their email is loaded from the DB.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+
+        users = {}
+        missing = []
+        for user_id, raw in zip(user_ids, REDIS.mget([card_key(uid) for uid in user_ids])):
+            if raw is None:
+                missing.append(user_id)
+            else:
+                users[user_id] = _load(json.loads(raw))
+
+        if missing:
+            users.update(ProfileCardCache._backfill(missing))
+
+        if presence:
+            states = get_presence(list(users))
+            for user_id, user in users.items():
+                user.is_online = states[user_id]["is_online"]
+                user._presence_loaded = True
+        if emails and users:
+            for user_id, email in UserAuth.objects.filter(pk__in=list(users)).values_list("pk", "email"):
+                users[user_id].email = email
+        return users
+
+    @staticmethod
+    def ordered(user_ids, active_only: bool = False, presence: bool = True) -> list:
+        """The users in `user_ids` order, skipping ids that don't exist (or are inactive)."""
+        users = ProfileCardCache.get_many(user_ids, presence=presence)
+        return [
+            users[uid] for uid in user_ids
+            if uid in users and (users[uid].is_active or not active_only)
+        ]
+
+    @staticmethod
+    def attach(objects, *fields, presence: bool = True, emails: bool = False) -> None:
+        """Fill foreign keys to users (e.g. "sender") from the cache instead of select_related."""
+        objects = list(objects)
+        if not objects or not fields:
+            return
+
+        model_fields = [objects[0]._meta.get_field(name) for name in fields]
+        user_ids = [
+            getattr(obj, field.attname)
+            for obj in objects for field in model_fields
+            if getattr(obj, field.attname) is not None
+        ]
+        users = ProfileCardCache.get_many(user_ids, presence=presence, emails=emails)
+        for obj in objects:
+            for field in model_fields:
+                user = users.get(getattr(obj, field.attname))
+                if user is not None:
+                    field.set_cached_value(obj, user)
+
+    @staticmethod
+    def _backfill(user_ids) -> dict:
+        versions = REDIS.mget([version_key(uid) for uid in user_ids])
+
+        users = UserAuth.objects.only(*CARD_FIELDS).in_bulk(user_ids)
+        pop_images = {uid: [] for uid in users}
+        for pop in MakeYourProfilePop.objects.filter(user_id__in=list(users)).order_by("user_id", "position", "id"):
+            pop_images[pop.user_id].append(pop)
+
+        keys, args = [], [CARD_TTL]
+        loaded = {}
+        for user_id, version in zip(user_ids, versions):
+            user = users.get(user_id)
+            if user is None:
+                continue
+            payload = _dump(user, pop_images[user_id])
+            keys += [card_key(user_id), version_key(user_id)]
+            args += [version.decode() if version is not None else "0", payload]
+            # hand out the same instances a cache hit would produce
+            loaded[user_id] = _load(json.loads(payload))
+
+        if keys:
+            _BACKFILL(keys=keys, args=args)
+        return loaded
+
+    @staticmethod
+    def invalidate(*user_ids) -> None:
+        """Drop the users' cards once the current transaction commits."""
+        user_ids = [uid for uid in user_ids if uid is not None]
+        if user_ids:
+            transaction.on_commit(lambda: ProfileCardCache._invalidate_now(user_ids))
+
+    @staticmethod
+    def _invalidate_now(user_ids) -> None:
+        pipe = REDIS.pipeline(transaction=True)
+        for user_id in user_ids:
+            pipe.incr(version_key(user_id))
+            pipe.expire(version_key(user_id), CARD_VERSION_TTL)
+            pipe.delete(card_key(user_id))
+        pipe.execute()
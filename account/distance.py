@@ -0,0 +1,64 @@
+# account/distance.py
+"""
+Viewer -> many users distances for list responses.
+
+A whole page is measured in one NumPy pass (account.geo.haversine_km_array)
+from the stored latitude/longitude columns, so serializers neither need a
+PostGIS Distance annotation nor per-row float conversion and trig.
+
+Display modes trade precision for privacy:
+
+* "exact"  -> km rounded to 0.1
+* "round"  -> whole km, rounded up, never below 1
+* "bucket" -> upper bound of the DISTANCE_BUCKETS_KM bucket ("within 5 km")
+"""
+import numpy as np
+
+from .geo import haversine_km_array
+
+DISTANCE_MODES = ("exact", "round", "bucket")
+DEFAULT_DISTANCE_MODE = "exact"
+DISTANCE_BUCKETS_KM = np.array([1, 2, 5, 10, 25, 50, 100, 250, 500], dtype=np.float64)
+
+
+def _coordinates(users):
+    lats = np.full(len(users), np.nan)
+    lngs = np.full(len(users), np.nan)
+    for i, user in enumerate(users):
+        if user.latitude is not None and user.longitude is not None:
+            lats[i] = user.latitude
+            lngs[i] = user.longitude
+    return lats, lngs
+
+
+def display_km(km: np.ndarray, mode: str = DEFAULT_DISTANCE_MODE) -> list:
+    """Apply a display mode; NaN (unknown location) becomes None."""
+    if mode == "round":
+        shown = np.maximum(np.ceil(km), 1.0)
+    elif mode == "bucket":
+        index = np.searchsorted(DISTANCE_BUCKETS_KM, km, side="left")
+        # beyond the last bucket the exact figure reveals nothing useful
+        shown = np.where(
+            index < len(DISTANCE_BUCKETS_KM),
+            DISTANCE_BUCKETS_KM[np.minimum(index, len(DISTANCE_BUCKETS_KM) - 1)],
+            np.ceil(km),
+        )
+    elif mode == "exact":
+        shown = np.round(km, 1)
+    else:
+        raise ValueError(f"Unknown distance mode: {mode}")
+
+    return [None if np.isnan(value) else float(value) for value in shown]
+
+
+def distances_km(viewer, users, mode: str = DEFAULT_DISTANCE_MODE) -> dict:
+    """{user_id: km or None} from the viewer to every user in `users`."""
+    users = list(users)
+    if not users:
+        return {}
+    if viewer is None or viewer.latitude is None or viewer.longitude is None:
+        return {user.pk: None for user in users}
+
+    lats, lngs = _coordinates(users)
+    km = haversine_km_array(viewer.latitude, viewer.longitude, lats, lngs)
+    return dict(zip((user.pk for user in users), display_km(km, mode)))
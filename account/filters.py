@@ -0,0 +1,157 @@
+# account/filters.py
+"""
+Filter engine behind UserFilterAPIView.
+
+* gender is matched exactly on the normalized choice and age becomes a `dob`
+  range; the (is_active, [gender,] -created_at, -user_id) indexes return rows
+  already in keyset order and check dob from their INCLUDE column;
+* max_distance is a real radius: ST_DWithin against the viewer's point on the
+  geography GiST index (migration 0012);
+* brings / that / looking_for use the bitmask helpers of UserQuerySet.
+
+Result windows are cached per viewer and per normalized filter tuple. The key
+carries a per-viewer version that is bumped whenever the viewer's own
+location or preferences change (account.signals); other users' edits show up within
+FILTER_CACHE_TTL. Blocks and impressions are applied after the cache.
+"""
+import hashlib
+import json
+from datetime import date
+
+from django.core.cache import cache
+from rest_framework.exceptions import ValidationError
+
+from .geo import GeographyDWithin
+from .models import UserAuth as User
+
+FILTER_CACHE_TTL = 60
+RANKED_LIMIT = 200
+MAX_AGE = 120
+
+
+def _years_before(today: date, years: int) -> date:
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:  # Feb 29 -> Feb 28
+        return today.replace(year=today.year - years, day=28)
+
+
+def dob_range(min_age=None, max_age=None, today=None):
+    """(earliest dob, latest dob) for an inclusive age range."""
+    today = today or date.today()
+    latest = _years_before(today, min_age) if min_age is not None else None
+    earliest = None
+    if max_age is not None:
+        # still max_age until the day before turning max_age + 1
+        earliest = date.fromordinal(_years_before(today, max_age + 1).toordinal() + 1)
+    return earliest, latest
+
+
+class FilterParams:
+    def __init__(self, gender=None, min_age=None, max_age=None, max_distance=None,
+                 choices=None, match="any", sort=None):
+        self.gender = gender
+        self.min_age = min_age
+        self.max_age = max_age
+        self.max_distance = max_distance
+        self.choices = choices or {}
+        self.match = match
+        self.sort = sort
+
+    @classmethod
+    def from_query(cls, query_params) -> "FilterParams":
+        errors = {}
+
+        gender = (query_params.get("gender") or "").strip().upper() or None
+        if gender and gender not in dict(User.GENDER_CHOICES):
+            errors["gender"] = "Invalid gender."
+
+        def as_int(name, low, high):
+            raw = query_params.get(name)
+            if raw in (None, ""):
+                return None
+            try:
+                value = int(raw)
+            except (TypeError, ValueError):
+                errors[name] = "Must be an integer."
+                return None
+            if not low <= value <= high:
+                errors[name] = f"Must be between {low} and {high}."
+            return value
+
+        min_age = as_int("min_age", 0, MAX_AGE)
+        max_age = as_int("max_age", 0, MAX_AGE)
+        max_distance = as_int("max_distance", 1, 20000)  # km
+
+        match = query_params.get("match", "any")
+        if match not in ("any", "all"):
+            errors["match"] = "Must be 'any' or 'all'."
+
+        choices = {}
+        for field, (_mask_field, field_choices) in User.CHOICE_MASK_FIELDS.items():
+            raw = query_params.get(field)
+            if not raw:
+                continue
+            values = sorted({v.strip() for v in raw.split(",") if v.strip()})
+            if not set(values) <= {key for key, _label in field_choices}:
+                errors[field] = f"Invalid {field} value."
+            choices[field] = values
+
+        sort = query_params.get("sort") or None
+        if sort not in (None, "compatibility"):
+            errors["sort"] = "Unknown sort."
+
+        if errors:
+            raise ValidationError(errors)
+        return cls(gender, min_age, max_age, max_distance, choices, match, sort)
+
+    def normalized(self) -> dict:
+        return {
+            "gender": self.gender,
+            "min_age": self.min_age,
+            "max_age": self.max_age,
+            "max_distance": self.max_distance,
+            "choices": self.choices,
+            "match": self.match if self.choices else None,
+            "sort": self.sort,
+        }
+
+
+def filter_queryset(viewer, params: FilterParams):
+    qs = User.objects.filter(is_active=True).exclude(pk=viewer.pk)
+
+    if params.gender:
+        qs = qs.filter(gender=params.gender)
+
+    earliest, latest = dob_range(params.min_age, params.max_age)
+    if earliest:
+        qs = qs.filter(dob__gte=earliest)
+    if latest:
+        qs = qs.filter(dob__lte=latest)
+
+    if params.max_distance:
+        qs = qs.filter(GeographyDWithin("geo_location", viewer.geo_location, params.max_distance * 1000))
+
+    for field, values in params.choices.items():
+        if params.match == "all":
+            qs = qs.has_all_choice(field, values)
+        else:
+            qs = qs.has_any_choice(field, values)
+    return qs
+
+
+def filter_version_key(user_id: int) -> str:
+    return f"user_filter:version:{user_id}"
+
+
+def bump_filter_version(user_id: int) -> None:
+    key = filter_version_key(user_id)
+    if not cache.add(key, 1, None):
+        cache.incr(key)
+
+
+def filter_cache_key(viewer, params: FilterParams, cursor=None) -> str:
+    version = cache.get(filter_version_key(viewer.pk)) or 0
+    raw = json.dumps([params.normalized(), cursor], sort_keys=True, default=str)
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f"user_filter:{viewer.pk}:v{version}:{digest}"
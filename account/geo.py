@@ -0,0 +1,72 @@
+# account/geo.py
+"""
+PostGIS helpers for location based discovery.
+
+`geo_location` is a geometry(Point, 4326) column. Distances in metres need the
+geography type, so every expression here casts the column to geography; the
+matching GiST index is created in migration 0012 on `(geo_location::geography)`
+so both the KNN ordering and the radius filter stay index scans.
+"""
+import numpy as np
+from django.db.models import BooleanField, FloatField, Func, Value
+
+EARTH_RADIUS_KM = 6371.0
+
+
+class GeographyKNN(Func):
+    """
+    `geo_location::geography <-> point::geography` (metres).
+
+    Used in ORDER BY this is served straight from the GiST index (nearest
+    first), so the query never sorts the whole users table.
+    """
+    output_field = FloatField()
+
+    def __init__(self, expression, point, **extra):
+        super().__init__(expression, Value(float(point.x)), Value(float(point.y)), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        geom, x, y = (compiler.compile(e) for e in self.get_source_expressions())
+        sql = (
+            f"({geom[0]})::geography <-> "
+            f"ST_SetSRID(ST_MakePoint({x[0]}, {y[0]}), 4326)::geography"
+        )
+        return sql, (*geom[1], *x[1], *y[1])
+
+
+class GeographyDWithin(Func):
+    """`ST_DWithin(geo_location::geography, point::geography, metres)` as a filter expression."""
+    output_field = BooleanField()
+
+    def __init__(self, expression, point, distance_m, **extra):
+        super().__init__(
+            expression,
+            Value(float(point.x)),
+            Value(float(point.y)),
+            Value(float(distance_m)),
+            **extra,
+        )
+
+    def as_sql(self, compiler, connection, **extra_context):
+        geom, x, y, dist = (compiler.compile(e) for e in self.get_source_expressions())
+        sql = (
+            f"ST_DWithin(({geom[0]})::geography, "
+            f"ST_SetSRID(ST_MakePoint({x[0]}, {y[0]}), 4326)::geography, {dist[0]})"
+        )
+        return sql, (*geom[1], *x[1], *y[1], *dist[1])
+
+
+def haversine_km_array(lat, lng, lats, lngs) -> np.ndarray:
+    """
+    Great-circle distance (km) from one point to many, in a single NumPy pass.
+
+    `lats`/`lngs` may contain NaN for users without a location; their
+    distance comes back as NaN.
+    """
+    phi1 = np.radians(float(lat))
+    phi2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.asarray(lngs, dtype=np.float64) - float(lng))
+
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
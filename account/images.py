@@ -0,0 +1,163 @@
+# account/images.py
+"""
+Image derivatives for profile pictures and pop images.
+
+Uploads are only checked by their header in the request (utils.validate_image).
+After commit a Celery task on the `images` queue (a prefork pool, so the
+Pillow work runs in parallel processes) decodes the original once and writes
+fixed-size WebP and JPEG renditions with EXIF removed (orientation applied
+first). The result is recorded on the row:
+
+    {"source": <original name>, "width": W, "height": H,
+     "sizes": {"thumb": {"width": .., "height": .., "webp": <name>, "jpeg": <name>}, ...}}
+
+Serializers pick a rendition with `derivative_url`. Uploaded originals are
+never served, since they still carry their EXIF (GPS included): until the task
+has run, or when the original has changed since, the URL is None. An original
+Pillow can't decode (or a decompression bomb) is recorded as
+{"source": <original name>, "failed": True} and stays None. Only the shared
+default profile picture is served as is.
+"""
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# longest edge in pixels
+DERIVATIVE_SIZES = {
+    "thumb": 160,
+    "card": 480,
+    "full": 1080,
+}
+DERIVATIVE_FORMATS = ("webp", "jpeg")
+DEFAULT_FORMAT = "webp"
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# shipped with the app, not uploaded: no renditions, served as is
+DEFAULT_PROFILE_PIC = "profile/profile.png"
+
+# retrying won't help: the upload itself is bad
+UNREADABLE_IMAGE_ERRORS = (UnidentifiedImageError, Image.DecompressionBombError)
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "webp":
+        image.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+    else:
+        image.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def build_derivatives(field_file, prefix: str) -> dict:
+    """Decode `field_file` once and store every size/format under `prefix`."""
+    field_file.open("rb")
+    try:
+        with Image.open(field_file) as original:
+            original.seek(0)  # first frame of animated GIFs
+            # bake the EXIF orientation in; the encoders below write no metadata
+            image = ImageOps.exif_transpose(original).convert("RGB")
+    finally:
+        field_file.close()
+
+    stem = os.path.splitext(os.path.basename(field_file.name))[0]
+    sizes = {}
+    for size, edge in DERIVATIVE_SIZES.items():
+        rendition = image.copy()
+        rendition.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        entry = {"width": rendition.width, "height": rendition.height}
+        for fmt in DERIVATIVE_FORMATS:
+            name = f"derivatives/{prefix}/{stem}_{size}.{'jpg' if fmt == 'jpeg' else fmt}"
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            entry[fmt] = default_storage.save(name, ContentFile(_encode(rendition, fmt)))
+        sizes[size] = entry
+
+    return {"source": field_file.name, "width": image.width, "height": image.height, "sizes": sizes}
+
+
+def failed_derivatives(field_file) -> dict:
+    return {"source": field_file.name, "failed": True}
+
+
+def _names(variants: dict) -> set:
+    return {
+        entry[fmt]
+        for entry in (variants or {}).get("sizes", {}).values()
+        for fmt in DERIVATIVE_FORMATS
+        if entry.get(fmt)
+    }
+
+
+def delete_derivatives(variants: dict, keep: dict = None) -> None:
+    """Remove the rendition files of `variants`, except those also used by `keep`."""
+    for name in _names(variants) - _names(keep):
+        default_storage.delete(name)
+
+
+def delete_derivative_dir(kind: str, pk: int) -> None:
+    """Remove everything stored under derivatives/{kind}/{pk}/ (the row is gone)."""
+    directory = f"derivatives/{kind}/{pk}"
+    try:
+        _dirs, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        default_storage.delete(f"{directory}/{name}")
+
+
+def schedule_derivatives(kind: str, pk: int) -> None:
+    """kind: "profile_pic" or "pop_image". Runs after the current transaction commits."""
+    from .tasks import generate_image_derivatives  # tasks imports this module
+    transaction.on_commit(lambda: generate_image_derivatives.delay(kind, pk))
+
+
+def schedule_derivatives_batch(kind: str, pks) -> None:
+    """One task per image, so a batch upload fans out over the images pool."""
+    from celery import group
+    from .tasks import generate_image_derivatives
+
+    pks = list(pks)
+    if pks:
+        transaction.on_commit(
+            lambda: group(generate_image_derivatives.s(kind, pk) for pk in pks).apply_async()
+        )
+
+
+def is_current(variants: dict, field_file) -> bool:
+    return bool(field_file) and (variants or {}).get("source") == field_file.name
+
+
+def requested_size(request, default: str) -> str:
+    size = request.GET.get("image_size") if request is not None else None
+    return size if size in DERIVATIVE_SIZES else default
+
+
+def requested_format(request) -> str:
+    fmt = request.GET.get("image_format") if request is not None else None
+    return fmt if fmt in DERIVATIVE_FORMATS else DEFAULT_FORMAT
+
+
+def derivative_url(field_file, variants: dict, request=None, default_size: str = "card"):
+    """URL of the requested rendition (?image_size, ?image_format); None while there is none."""
+    if not field_file:
+        return None
+
+    if field_file.name == DEFAULT_PROFILE_PIC:
+        url = field_file.url
+    else:
+        if not is_current(variants, field_file) or variants.get("failed"):
+            return None
+        entry = variants["sizes"].get(requested_size(request, default_size))
+        if not entry:
+            return None
+        url = default_storage.url(entry[requested_format(request)])
+
+    return request.build_absolute_uri(url) if request is not None else url
@@ -0,0 +1,99 @@
+# account/impressions.py
+"""
+"Already seen" tracking for discovery.
+
+Each viewer has a Bloom filter over user ids stored as a plain Redis string
+(BLOOM_BITS bits = 8 KB). Filters rotate every EPOCH_DAYS: impressions go to
+the current generation, lookups check the current and previous one, and each
+generation expires after two epochs. Memory per viewer is therefore capped at
+two filters and old impressions decay out on their own.
+
+Lookups fetch both filters with one GET each and test every candidate in a
+single NumPy pass, so filtering thousands of ids costs one round trip.
+False positives (an unseen profile treated as seen) stay well under 1% for a
+few thousand impressions per epoch; there are no false negatives.
+"""
+import numpy as np
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+REDIS = get_redis_connection("default")
+
+BLOOM_BITS_LOG2 = 16
+BLOOM_BITS = 1 << BLOOM_BITS_LOG2
+EPOCH_DAYS = 7
+
+# multiply-shift hash family: h_i(x) = (a_i * x + b_i) mod 2^64 >> (64 - log2(bits))
+_HASH_A = np.array(
+    [0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93],
+    dtype=np.uint64,
+)
+_HASH_B = np.array(
+    [0x632BE59BD9B4E019, 0x85EBCA77C2B2AE63, 0x27D4EB2F165667C5, 0xFF51AFD7ED558CCD],
+    dtype=np.uint64,
+)
+_SHIFT = np.uint64(64 - BLOOM_BITS_LOG2)
+
+
+def current_epoch() -> int:
+    return int(timezone.now().timestamp() // (EPOCH_DAYS * 86400))
+
+
+def filter_key(viewer_id: int, epoch: int) -> str:
+    return f"seen:{viewer_id}:{epoch}"
+
+
+def bit_offsets(user_ids) -> np.ndarray:
+    """(n, k) array of Bloom bit offsets for each id."""
+    ids = np.asarray(list(user_ids), dtype=np.uint64).reshape(-1, 1)
+    with np.errstate(over="ignore"):
+        return ((ids * _HASH_A + _HASH_B) >> _SHIFT).astype(np.int64)
+
+
+def _as_bits(raw) -> np.ndarray:
+    """Redis string -> flat array of BLOOM_BITS bits (bit 0 = MSB of byte 0, as SETBIT)."""
+    buf = np.zeros(BLOOM_BITS // 8, dtype=np.uint8)
+    if raw:
+        data = np.frombuffer(raw, dtype=np.uint8)[: buf.size]
+        buf[: data.size] = data
+    return np.unpackbits(buf)
+
+
+class ImpressionFilter:
+    @staticmethod
+    def seen_mask(viewer_id: int, user_ids) -> np.ndarray:
+        """Boolean array, True where the id was (probably) already shown."""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return np.zeros(0, dtype=bool)
+
+        epoch = current_epoch()
+        current, previous = REDIS.mget([filter_key(viewer_id, epoch), filter_key(viewer_id, epoch - 1)])
+        bits = _as_bits(current) | _as_bits(previous)
+
+        return bits[bit_offsets(user_ids)].all(axis=1)
+
+    @staticmethod
+    def filter_unseen(viewer_id: int, user_ids) -> list:
+        user_ids = list(user_ids)
+        mask = ImpressionFilter.seen_mask(viewer_id, user_ids)
+        return [uid for uid, seen in zip(user_ids, mask) if not seen]
+
+    @staticmethod
+    def record(viewer_id: int, user_ids) -> None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+
+        epoch = current_epoch()
+        key = filter_key(viewer_id, epoch)
+
+        # one BITFIELD call sets every bit of every id
+        args = []
+        for offset in np.unique(bit_offsets(user_ids)).tolist():
+            args += ["SET", "u1", offset, 1]
+
+        pipe = REDIS.pipeline(transaction=False)
+        pipe.execute_command("BITFIELD", key, *args)
+        pipe.expire(key, 2 * EPOCH_DAYS * 86400)
+        pipe.execute()
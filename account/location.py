@@ -0,0 +1,145 @@
+# account/location.py
+"""
+Buffered location updates.
+
+    location:current     GEO set user_id -> last accepted point
+    location:updated_at  ZSET user_id -> unix time of that point (last writer wins)
+    location:dirty       SET of user ids whose point is not in Postgres yet
+
+The ingest endpoint only touches Redis: stale fixes (older than the stored
+one) and moves shorter than LOCATION_MIN_MOVE_METERS are dropped inside one
+Lua call. `flush_locations` (Celery beat) writes the changed points to the
+users table with one `UPDATE ... FROM (VALUES ...)` per batch, bypassing
+UserAuth.save(), and then does what the profile signals would have done.
+"""
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from .models import UserAuth
+
+logger = logging.getLogger(__name__)
+
+REDIS = get_redis_connection("default")
+
+MIN_MOVE_METERS = getattr(settings, "LOCATION_MIN_MOVE_METERS", 50)
+# Redis GEO cells stop at the Web Mercator limit; GEOADD rejects anything beyond
+MAX_LATITUDE = 85.05112878
+FLUSH_BATCH_SIZE = 1000
+
+CURRENT_KEY = "location:current"
+UPDATED_AT_KEY = "location:updated_at"
+DIRTY_KEY = "location:dirty"
+
+# KEYS: current, updated_at, dirty   ARGV: user_id, lng, lat, unix time, min move (m)
+# returns 1 if the point was buffered, 0 if it was stale or too small a move
+_INGEST = REDIS.register_script("""
+local prev_ts = redis.call('ZSCORE', KEYS[2], ARGV[1])
+if prev_ts and tonumber(prev_ts) >= tonumber(ARGV[4]) then
+    return 0
+end
+
+local prev = redis.call('GEOPOS', KEYS[1], ARGV[1])[1]
+if prev then
+    local rad = math.pi / 180
+    local lng1, lat1 = tonumber(prev[1]) * rad, tonumber(prev[2]) * rad
+    local lng2, lat2 = tonumber(ARGV[2]) * rad, tonumber(ARGV[3]) * rad
+    local a = math.sin((lat2 - lat1) / 2) ^ 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ^ 2
+    local metres = 2 * 6371000 * math.asin(math.sqrt(math.min(a, 1)))
+    if metres < tonumber(ARGV[5]) then
+        return 0
+    end
+end
+
+redis.call('GEOADD', KEYS[1], ARGV[2], ARGV[3], ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[1])
+redis.call('SADD', KEYS[3], ARGV[1])
+return 1
+""")
+
+
+def ingest(user_id: int, latitude, longitude, recorded_at=None) -> bool:
+    """Buffer a location fix. Returns False when it was dropped."""
+    recorded_at = recorded_at or timezone.now()
+    accepted = _INGEST(
+        keys=[CURRENT_KEY, UPDATED_AT_KEY, DIRTY_KEY],
+        args=[user_id, float(longitude), float(latitude), recorded_at.timestamp(), MIN_MOVE_METERS],
+    )
+    return bool(accepted)
+
+
+def _update_locations(rows) -> list:
+    """rows: (user_id, lat, lng, datetime). Returns the ids actually updated."""
+    table = UserAuth._meta.db_table
+    values = ", ".join(["(%s::bigint, %s::numeric, %s::numeric, %s::timestamptz)"] * len(rows))
+    sql = f"""
+        UPDATE {table} AS u
+        SET latitude = round(v.lat, 6),
+            longitude = round(v.lng, 6),
+            geo_location = ST_SetSRID(ST_MakePoint(v.lng::float8, v.lat::float8), 4326),
+            location_updated_at = v.ts,
+            profile_version = u.profile_version + 1
+        FROM (VALUES {values}) AS v(user_id, lat, lng, ts)
+        WHERE u.user_id = v.user_id
+          AND (u.location_updated_at IS NULL OR u.location_updated_at < v.ts)
+        RETURNING u.user_id
+    """
+    params = [value for row in rows for value in row]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [user_id for (user_id,) in cursor.fetchall()]
+
+
+def _after_location_change(user_ids) -> None:
+    # the raw UPDATE skips post_save, so refresh what the profile signals would
+    from .cards import ProfileCardCache
+    from .filters import bump_filter_version
+    from .recommendations import RecommendationQueue
+
+    for user_id in user_ids:
+        bump_filter_version(user_id)
+        RecommendationQueue.schedule_refresh(user_id)
+    ProfileCardCache.invalidate(*user_ids)
+
+
+def flush_locations(batch_size: int = FLUSH_BATCH_SIZE) -> int:
+    """Write buffered points to the DB, one UPDATE ... FROM (VALUES ...) per batch."""
+    flushed = 0
+
+    while True:
+        raw_ids = REDIS.spop(DIRTY_KEY, batch_size)
+        if not raw_ids:
+            break
+        user_ids = [int(uid) for uid in raw_ids]
+
+        pipe = REDIS.pipeline(transaction=False)
+        pipe.geopos(CURRENT_KEY, *user_ids)
+        pipe.zmscore(UPDATED_AT_KEY, user_ids)
+        positions, scores = pipe.execute()
+
+        rows = [
+            (uid, f"{pos[1]:.6f}", f"{pos[0]:.6f}", datetime.fromtimestamp(score, tz=dt_timezone.utc))
+            for uid, pos, score in zip(user_ids, positions, scores)
+            if pos and score
+        ]
+        try:
+            with transaction.atomic():
+                updated = _update_locations(rows) if rows else []
+                transaction.on_commit(lambda ids=updated: _after_location_change(ids))
+        except Exception:
+            # put them back so the next run retries
+            REDIS.sadd(DIRTY_KEY, *user_ids)
+            raise
+        flushed += len(updated)
+
+        if len(raw_ids) < batch_size:
+            break
+
+    if flushed:
+        logger.info("Locations flushed: %s users", flushed)
+    return flushed
@@ -0,0 +1,173 @@
+# account/mailer.py
+"""
+Outbound transactional email.
+
+The API only inserts an OutboundEmail row and, after commit, nudges the
+`deliver_outbound_emails` Celery task. Each worker process keeps one SMTP
+connection open and hands each batch of due messages to one
+send_messages() call, so there is no connect/STARTTLS/AUTH handshake per
+email. A failed message is retried with exponential backoff; after
+EMAIL_MAX_ATTEMPTS it is marked FAILED.
+
+Bodies can hold one-time codes, so a row's body is cleared as soon as it is
+sent or given up on, and `purge_old_emails` deletes finished rows after
+EMAIL_RETENTION_DAYS.
+"""
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+EMAIL_BATCH_SIZE = 50
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_RETRY_BASE_SECONDS = 30    # 30s, 60s, 120s, ...
+EMAIL_RETENTION_DAYS = 7
+
+_connection = None  # per worker process
+
+
+def enqueue_email(to_email: str, subject: str, body: str, from_email: str) -> OutboundEmail:
+    """Queue a message; it is handed to Celery once the current transaction commits."""
+    email = OutboundEmail.objects.create(
+        to_email=to_email, from_email=from_email, subject=subject, body=body,
+    )
+    from .tasks import deliver_outbound_emails  # tasks imports this module
+    transaction.on_commit(lambda: deliver_outbound_emails.delay())
+    return email
+
+
+def smtp_connection():
+    """The worker's open SMTP connection, (re)opened on demand."""
+    global _connection
+    if _connection is None:
+        _connection = get_connection(fail_silently=False)
+    if getattr(_connection, "connection", None) is None:
+        _connection.open()
+    return _connection
+
+
+def close_smtp_connection() -> None:
+    global _connection
+    if _connection is not None:
+        try:
+            _connection.close()
+        except Exception:
+            pass
+        _connection = None
+
+
+def _send(messages: list) -> None:
+    try:
+        smtp_connection().send_messages(messages)
+    except smtplib.SMTPServerDisconnected:
+        # idle connections get dropped by the server: reconnect once
+        close_smtp_connection()
+        smtp_connection().send_messages(messages)
+
+
+def _claim_due(batch_size: int) -> list:
+    """Lock a batch of due messages; concurrent workers skip each other's rows."""
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.STATUS_QUEUED, next_attempt_at__lte=timezone.now())
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        # park them while they are being sent so another worker can't pick them up
+        OutboundEmail.objects.filter(pk__in=[e.pk for e in emails]).update(
+            next_attempt_at=timezone.now() + timedelta(minutes=10)
+        )
+    return emails
+
+
+def _message(email: OutboundEmail) -> EmailMessage:
+    return EmailMessage(email.subject, email.body, email.from_email, [email.to_email])
+
+
+def _mark_sent(email: OutboundEmail) -> None:
+    email.attempts += 1
+    email.status = OutboundEmail.STATUS_SENT
+    email.sent_at = timezone.now()
+    email.body = ""
+
+
+def _mark_failed(email: OutboundEmail, exc: Exception) -> None:
+    email.attempts += 1
+    email.last_error = str(exc)[:1000]
+    if email.attempts >= EMAIL_MAX_ATTEMPTS:
+        email.status = OutboundEmail.STATUS_FAILED
+        email.body = ""
+        logger.error("Giving up on email %s to %s: %s", email.pk, email.to_email, exc)
+    else:
+        delay = EMAIL_RETRY_BASE_SECONDS * 2 ** (email.attempts - 1)
+        email.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+
+
+def _deliver(emails: list) -> tuple:
+    """(sent, failed). The batch goes out in one send_messages() call."""
+    try:
+        _send([_message(email) for email in emails])
+    except Exception:
+        # the backend stops at the first bad message without saying which one:
+        # redo the batch one by one (messages before it may go out twice)
+        logger.warning("Batch send of %s emails failed, retrying one by one", len(emails), exc_info=True)
+        close_smtp_connection()
+    else:
+        for email in emails:
+            _mark_sent(email)
+        return emails, []
+
+    sent, failed = [], []
+    for email in emails:
+        try:
+            _send([_message(email)])
+        except Exception as exc:
+            _mark_failed(email, exc)
+            failed.append(email)
+            if isinstance(exc, smtplib.SMTPException):
+                close_smtp_connection()
+        else:
+            _mark_sent(email)
+            sent.append(email)
+    return sent, failed
+
+
+def deliver_due_emails(batch_size: int = EMAIL_BATCH_SIZE) -> int:
+    """Send due messages over the worker's connection. Returns how many were sent."""
+    sent_total = 0
+
+    while True:
+        emails = _claim_due(batch_size)
+        if not emails:
+            break
+
+        sent, failed = _deliver(emails)
+
+        OutboundEmail.objects.bulk_update(sent, ["status", "attempts", "sent_at", "body"])
+        OutboundEmail.objects.bulk_update(failed, ["status", "attempts", "last_error", "next_attempt_at", "body"])
+        sent_total += len(sent)
+
+        if len(emails) < batch_size:
+            break
+
+    if sent_total:
+        logger.info("Outbound emails sent: %s", sent_total)
+    return sent_total
+
+
+def purge_old_emails(days: int = EMAIL_RETENTION_DAYS) -> int:
+    """Delete sent / failed rows older than `days`. Returns how many were deleted."""
+    deleted, _ = OutboundEmail.objects.filter(
+        status__in=[OutboundEmail.STATUS_SENT, OutboundEmail.STATUS_FAILED],
+        created_at__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+    if deleted:
+        logger.info("Outbound emails purged: %s", deleted)
+    return deleted
@@ -0,0 +1,87 @@
+# account/management/commands/benchmark_login_lookup.py
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from account.models import UserAuth
+
+# any valid hash will do, the benchmark never checks passwords
+PASSWORD_HASH = "pbkdf2_sha256$870000$benchmark$YmVuY2htYXJrYmVuY2htYXJrYmVuY2htYXJrYmVuY2g="
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the old OR/iexact login lookup with by_login_identifier on N "
+        "synthetic users. Everything runs in one transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1_000_000)
+        parser.add_argument("--lookups", type=int, default=500)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Rolled back benchmark data.")
+
+    def run(self, options):
+        total = options["users"]
+        self.stdout.write(f"Inserting {total} users...")
+        start = time.perf_counter()
+        for offset in range(0, total, options["batch_size"]):
+            UserAuth.objects.bulk_create(
+                [
+                    UserAuth(
+                        email=f"Bench.User{i}@Example.com",
+                        username=f"BenchUser{i}",
+                        phone=f"+1{i:010d}",
+                        password=PASSWORD_HASH,
+                    )
+                    for i in range(offset, min(offset + options["batch_size"], total))
+                ]
+            )
+        self.stdout.write(f"  done in {time.perf_counter() - start:.1f}s")
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {UserAuth._meta.db_table}")
+
+        sample = random.sample(range(total), min(options["lookups"], total))
+        identifiers = {
+            "email": [f"bench.user{i}@example.com" for i in sample],
+            "phone": [f"+1{i:010d}" for i in sample],
+            "username": [f"benchuser{i}" for i in sample],
+        }
+
+        def old_lookup(value):
+            return UserAuth.objects.filter(
+                Q(email__iexact=value) | Q(phone=value) | Q(username__iexact=value)
+            ).order_by()
+
+        def new_lookup(value):
+            return UserAuth.objects.by_login_identifier(value).order_by()
+
+        for kind, values in identifiers.items():
+            for label, lookup in (("or/iexact", old_lookup), ("by_login_identifier", new_lookup)):
+                timings = []
+                for value in values:
+                    t0 = time.perf_counter()
+                    list(lookup(value).values_list("pk", flat=True)[:2])
+                    timings.append((time.perf_counter() - t0) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f"{kind:9} {label:20} mean={statistics.mean(timings):8.3f}ms "
+                    f"p95={timings[int(len(timings) * 0.95) - 1]:8.3f}ms"
+                )
+            self.stdout.write(f"  plan: {new_lookup(values[0]).explain().splitlines()[0]}")
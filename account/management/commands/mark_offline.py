@@ -1,20 +1,30 @@
 # users/management/commands/mark_offline.py
-from django.core.management.base import BaseCommand
-from django.utils import timezone
 from datetime import timedelta
+
 from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from account.presence import mark_expired_offline
 
 User = get_user_model()
 
-OFFLINE_CUTOFF_MINUTES = 25  # ✅ must be > cron interval and > touch throttle
 
 class Command(BaseCommand):
+    help = "Mark users whose presence heartbeat expired as offline."
+
+    def add_arguments(self, parser):
+        # one-off cleanup for rows flagged online before presence moved to Redis
+        parser.add_argument("--stale-minutes", type=int, default=None)
+
     def handle(self, *args, **options):
-        cutoff = timezone.now() - timedelta(minutes=OFFLINE_CUTOFF_MINUTES)
+        updated = mark_expired_offline()
 
-        updated = User.objects.filter(
-            is_online=True,
-            last_activity__lt=cutoff
-        ).update(is_online=False)
+        if options["stale_minutes"]:
+            cutoff = timezone.now() - timedelta(minutes=options["stale_minutes"])
+            updated += User.objects.filter(
+                is_online=True,
+                last_activity__lt=cutoff
+            ).update(is_online=False)
 
         self.stdout.write(f"Marked offline: {updated}")
\ No newline at end of file
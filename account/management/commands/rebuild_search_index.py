@@ -0,0 +1,24 @@
+# account/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from account.models import UserAuth
+from account.search import PrefixIndex
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Redis prefix index used for people-search autocomplete."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        users = UserAuth.objects.only(
+            "user_id", "search_text", "is_active", "last_activity", "created_at"
+        ).iterator(chunk_size=options["chunk_size"])
+
+        indexed = 0
+        for user in users:
+            PrefixIndex.index(user)
+            indexed += 1
+
+        self.stdout.write(f"Indexed: {indexed}")
\ No newline at end of file
@@ -1,7 +1,86 @@
+import re
+
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Lower
 from django.utils.translation import gettext_lazy as _
 
-class UserManager(BaseUserManager):
+from .utils import encode_choices
+
+# choice sets this small are matched by listing every qualifying mask, which
+# turns the predicate into `mask IN (...)` and keeps the btree index usable.
+# Larger sets (`that`, 20 choices) fall back to `mask & x`, which no index on
+# the mask column can serve: those filters are applied to the rows the other
+# predicates (is_active / gender / dob index) select, never on their own.
+ENUMERATE_MASKS_MAX_BITS = 8
+
+# same shape as UserAuth.phone's validator
+PHONE_RE = re.compile(r"^\+?\d{9,15}$")
+
+
+class UserQuerySet(models.QuerySet):
+    def by_email(self, email):
+        """Case-insensitive email match served by the lower(email) index."""
+        return self.alias(_email_lower=Lower("email")).filter(_email_lower=email.strip().lower())
+
+    def by_login_identifier(self, identifier):
+        """
+        Users matching a login identifier (email, phone or username).
+
+        The identifier's shape picks the column, so the lookup is a single probe
+        of lower(email), phone or lower(username) instead of an OR over all
+        three. Only phone-shaped input also checks usernames, as an all-digit
+        username is legal.
+        """
+        identifier = identifier.strip()
+        if "@" in identifier:
+            return self.by_email(identifier)
+
+        qs = self.alias(_username_lower=Lower("username"))
+        if PHONE_RE.match(identifier):
+            return qs.filter(Q(phone=identifier) | Q(_username_lower=identifier.lower()))
+        return qs.filter(_username_lower=identifier.lower())
+
+    def _choice_mask(self, field, values):
+        mask_field, choices = self.model.CHOICE_MASK_FIELDS[field]
+        return mask_field, len(choices), encode_choices(values, choices)
+
+    def has_any_choice(self, field, values):
+        """
+        Users whose `field` (brings / that / looking_for) shares at least one of
+        `values`. Index-backed only for choice sets up to ENUMERATE_MASKS_MAX_BITS.
+        """
+        if not values:
+            return self
+        mask_field, bits, mask = self._choice_mask(field, values)
+        if not mask:
+            return self.none()
+
+        if bits <= ENUMERATE_MASKS_MAX_BITS:
+            matches = [m for m in range(1, 1 << bits) if m & mask]
+            return self.filter(**{f"{mask_field}__in": matches})
+        return self.alias(**{f"_{mask_field}_hit": F(mask_field).bitand(mask)}).filter(
+            **{f"_{mask_field}_hit__gt": 0}
+        )
+
+    def has_all_choice(self, field, values):
+        """Users whose `field` contains every one of `values` (same index caveat)."""
+        if not values:
+            return self
+        mask_field, bits, mask = self._choice_mask(field, values)
+        if not mask:
+            return self.none()
+
+        if bits <= ENUMERATE_MASKS_MAX_BITS:
+            matches = [m for m in range(mask, 1 << bits) if m & mask == mask]
+            return self.filter(**{f"{mask_field}__in": matches})
+        return self.alias(**{f"_{mask_field}_hit": F(mask_field).bitand(mask)}).filter(
+            **{f"_{mask_field}_hit": mask}
+        )
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def _create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError(_("The Email field must be set"))
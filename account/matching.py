@@ -0,0 +1,150 @@
+# account/matching.py
+"""
+Compatibility scoring for candidate ranking.
+
+Every profile is reduced to a handful of 64-bit masks:
+
+* brings / that / looking_for -> exact bitmask over the model's *_CHOICES,
+  read straight from the `*_mask` columns kept in sync by UserAuth.save()
+* interests / hobbies / lifestyle / professional_field -> free-form lists,
+  hashed into 64 buckets (a tiny Bloom-style sparse vector)
+
+A whole candidate pool is scored in one NumPy pass: per-field Jaccard overlap
+on the masks (popcount of AND over popcount of OR), a distance decay from the
+viewer's location and a recency boost from `last_activity`.
+"""
+import zlib
+
+import numpy as np
+from django.db.models import F
+from django.utils import timezone
+
+from .geo import haversine_km_array
+from .models import UserAuth
+
+# choice field -> its bitmask column
+CHOICE_FIELDS = {
+    field: mask_field for field, (mask_field, _choices) in UserAuth.CHOICE_MASK_FIELDS.items()
+}
+LIST_FIELDS = ("interests", "hobbies", "lifestyle", "professional_field")
+MASK_FIELDS = (*CHOICE_FIELDS, *LIST_FIELDS)
+
+PROFILE_VECTOR_FIELDS = (
+    "user_id", *CHOICE_FIELDS.values(), *LIST_FIELDS, "latitude", "longitude", "last_activity",
+)
+
+WEIGHTS = {
+    "brings": 1.5,
+    "that": 1.0,
+    "looking_for": 2.0,
+    "interests": 1.0,
+    "hobbies": 1.0,
+    "lifestyle": 0.75,
+    "professional_field": 0.5,
+    "distance": 2.0,
+    "recency": 1.0,
+}
+DISTANCE_DECAY_KM = 25.0        # score halves roughly every 17 km
+RECENCY_HALF_LIFE_HOURS = 72.0
+CANDIDATE_POOL_SIZE = 20000     # most recently active users considered per ranking
+
+
+def hash_tokens(values) -> int:
+    """Hash a free-form list of strings into a 64-bucket bitmask."""
+    mask = 0
+    for value in values or []:
+        token = str(value).strip().lower()
+        if token:
+            mask |= 1 << (zlib.crc32(token.encode()) % 64)
+    return mask
+
+
+def profile_masks(values: dict) -> dict:
+    """Feature masks for one profile, from a {column: value} mapping."""
+    masks = {field: values.get(mask_field) or 0 for field, mask_field in CHOICE_FIELDS.items()}
+    masks.update({field: hash_tokens(values.get(field)) for field in LIST_FIELDS})
+    return masks
+
+
+class FeatureMatrix:
+    """Column-oriented feature vectors for a candidate pool."""
+
+    def __init__(self, rows):
+        rows = list(rows)
+        count = len(rows)
+
+        self.user_ids = np.empty(count, dtype=np.int64)
+        self.masks = {field: np.zeros(count, dtype=np.uint64) for field in MASK_FIELDS}
+        self.lats = np.full(count, np.nan)
+        self.lngs = np.full(count, np.nan)
+        self.activity = np.full(count, np.nan)  # unix seconds
+
+        for i, row in enumerate(rows):
+            values = dict(zip(PROFILE_VECTOR_FIELDS, row))
+            self.user_ids[i] = values["user_id"]
+            for field, mask in profile_masks(values).items():
+                self.masks[field][i] = mask
+            if values["latitude"] is not None and values["longitude"] is not None:
+                self.lats[i] = float(values["latitude"])
+                self.lngs[i] = float(values["longitude"])
+            if values["last_activity"] is not None:
+                self.activity[i] = values["last_activity"].timestamp()
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    @classmethod
+    def from_queryset(cls, queryset, limit: int = CANDIDATE_POOL_SIZE):
+        return cls(queryset.values_list(*PROFILE_VECTOR_FIELDS)[:limit])
+
+
+class CompatibilityScorer:
+    def __init__(self, viewer):
+        self.viewer = viewer
+        self.viewer_masks = {
+            field: np.uint64(mask)
+            for field, mask in profile_masks(
+                {column: getattr(viewer, column) for column in PROFILE_VECTOR_FIELDS}
+            ).items()
+        }
+
+    def score(self, matrix: FeatureMatrix) -> np.ndarray:
+        total = np.zeros(len(matrix))
+
+        for field in MASK_FIELDS:
+            mine = self.viewer_masks[field]
+            theirs = matrix.masks[field]
+            inter = np.bitwise_count(theirs & mine)
+            union = np.bitwise_count(theirs | mine)
+            overlap = np.divide(
+                inter, union, out=np.zeros(len(matrix)), where=union > 0
+            )
+            total += WEIGHTS[field] * overlap
+
+        if self.viewer.latitude is not None and self.viewer.longitude is not None:
+            km = haversine_km_array(
+                self.viewer.latitude, self.viewer.longitude, matrix.lats, matrix.lngs
+            )
+            total += WEIGHTS["distance"] * np.nan_to_num(np.exp(-km / DISTANCE_DECAY_KM))
+
+        age_hours = (timezone.now().timestamp() - matrix.activity) / 3600.0
+        recency = np.power(0.5, np.clip(age_hours, 0, None) / RECENCY_HALF_LIFE_HOURS)
+        total += WEIGHTS["recency"] * np.nan_to_num(recency)
+
+        return total
+
+    def rank(self, queryset, limit: int = CANDIDATE_POOL_SIZE):
+        """
+        Score the (already filtered) candidate queryset.
+        Returns (user_ids, scores), best match first.
+        """
+        matrix = FeatureMatrix.from_queryset(
+            queryset.exclude(pk=self.viewer.pk).order_by(F("last_activity").desc(nulls_last=True)),
+            limit=limit,
+        )
+        if not len(matrix):
+            return [], []
+
+        scores = self.score(matrix)
+        order = np.argsort(-scores, kind="stable")
+        return matrix.user_ids[order].tolist(), scores[order].tolist()
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0011_remove_userauth_onesignal_player_id'),
+    ]
+
+    operations = [
+        # KNN (<->) ordering and ST_DWithin in metres both run on the geography
+        # cast, which the plain geometry index on geo_location cannot serve.
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX IF NOT EXISTS account_userauth_geo_geog_gist "
+                "ON account_userauth USING GIST ((geo_location::geography));"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS account_userauth_geo_geog_gist;",
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-16 09:00
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+MASK_FIELDS = {
+    "brings": "brings_mask",
+    "that": "that_mask",
+    "looking_for": "looking_for_mask",
+}
+
+
+def encode(values, choices):
+    if not values:
+        return 0
+    if isinstance(values, str):
+        values = values.split(",")
+    selected = set(values)
+    return sum(1 << bit for bit, (key, _label) in enumerate(choices) if key in selected)
+
+
+def backfill_choice_masks(apps, schema_editor):
+    UserAuth = apps.get_model("account", "UserAuth")
+    choices = {field: UserAuth._meta.get_field(field).choices for field in MASK_FIELDS}
+
+    batch = []
+    for user in UserAuth.objects.only("pk", *MASK_FIELDS).iterator(chunk_size=BATCH_SIZE):
+        for field, mask_field in MASK_FIELDS.items():
+            setattr(user, mask_field, encode(getattr(user, field), choices[field]))
+        batch.append(user)
+        if len(batch) >= BATCH_SIZE:
+            UserAuth.objects.bulk_update(batch, list(MASK_FIELDS.values()))
+            batch = []
+    if batch:
+        UserAuth.objects.bulk_update(batch, list(MASK_FIELDS.values()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0012_userauth_geo_location_geography_gist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userauth',
+            name='brings_mask',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='userauth',
+            name='that_mask',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='userauth',
+            name='looking_for_mask',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill_choice_masks, migrations.RunPython.noop),
+    ]
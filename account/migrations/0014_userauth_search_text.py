@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-16 10:00
+
+import unicodedata
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def normalize(*parts):
+    text = " ".join(str(p) for p in parts if p)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def backfill_search_text(apps, schema_editor):
+    UserAuth = apps.get_model("account", "UserAuth")
+
+    batch = []
+    for user in UserAuth.objects.only("pk", "username", "full_name").iterator(chunk_size=BATCH_SIZE):
+        user.search_text = normalize(user.username, user.full_name)
+        batch.append(user)
+        if len(batch) >= BATCH_SIZE:
+            UserAuth.objects.bulk_update(batch, ["search_text"])
+            batch = []
+    if batch:
+        UserAuth.objects.bulk_update(batch, ["search_text"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0013_userauth_choice_masks'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='userauth',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='userauth',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='account_user_search_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
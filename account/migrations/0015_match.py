@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-16 11:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_matches(apps, schema_editor):
+    UserLike = apps.get_model("account", "UserLike")
+    Match = apps.get_model("account", "Match")
+
+    reciprocal = UserLike.objects.filter(
+        user_from_id=models.OuterRef("user_to_id"),
+        user_to_id=models.OuterRef("user_from_id"),
+    )
+    likes = (
+        UserLike.objects.annotate(liked_back_at=models.Subquery(reciprocal.values("created_at")[:1]))
+        .filter(liked_back_at__isnull=False)
+        .values_list("user_from_id", "user_to_id", "created_at", "liked_back_at")
+        .iterator(chunk_size=2000)
+    )
+
+    batch = []
+    for user_from_id, user_to_id, liked_at, liked_back_at in likes:
+        # the match happened when the second like arrived
+        batch.append(Match(
+            user_id=user_from_id,
+            matched_user_id=user_to_id,
+            created_at=max(liked_at, liked_back_at),
+        ))
+        if len(batch) >= 2000:
+            Match.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        Match.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0014_userauth_search_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Match',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('matched_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at', '-id'], name='account_match_user_recent')],
+                'unique_together': {('user', 'matched_user')},
+            },
+        ),
+        migrations.RunPython(backfill_matches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-16 12:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_like_counters(apps, schema_editor):
+    UserAuth = apps.get_model("account", "UserAuth")
+    UserLike = apps.get_model("account", "UserLike")
+
+    received = (
+        UserLike.objects.filter(user_to_id=OuterRef("pk"))
+        .order_by().values("user_to_id")
+        .annotate(c=Count("pk")).values("c")
+    )
+    given = (
+        UserLike.objects.filter(user_from_id=OuterRef("pk"))
+        .order_by().values("user_from_id")
+        .annotate(c=Count("pk")).values("c")
+    )
+
+    UserAuth.objects.update(
+        likes_received_count=Coalesce(Subquery(received), 0),
+        likes_given_count=Coalesce(Subquery(given), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0015_match'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userauth',
+            name='likes_given_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userauth',
+            name='likes_received_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_like_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0016_userauth_like_counters"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="userauth",
+            index=models.Index(fields=["is_active", "gender", "dob"], name="account_user_active_gender_dob"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-16 12:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0017_userauth_active_gender_dob_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboundEmail",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("to_email", models.EmailField(max_length=254)),
+                ("from_email", models.EmailField(max_length=254)),
+                ("subject", models.CharField(max_length=255)),
+                ("body", models.TextField()),
+                ("status", models.CharField(choices=[("QUEUED", "QUEUED"), ("SENT", "SENT"), ("FAILED", "FAILED")], default="QUEUED", max_length=10)),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("next_attempt_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "QUEUED")),
+                        fields=["next_attempt_at"],
+                        name="account_outbound_email_due",
+                    ),
+                ],
+            },
+        ),
+    ]
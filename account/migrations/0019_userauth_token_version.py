@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0018_outboundemail"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userauth",
+            name="token_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-16 12:00
+
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction; the users
+    # table stays writable while the indexes build
+    atomic = False
+
+    dependencies = [
+        ("account", "0019_userauth_token_version"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="userauth",
+            index=models.Index(django.db.models.functions.text.Lower("email"), name="account_user_email_lower"),
+        ),
+        AddIndexConcurrently(
+            model_name="userauth",
+            index=models.Index(django.db.models.functions.text.Lower("username"), name="account_user_username_lower"),
+        ),
+    ]
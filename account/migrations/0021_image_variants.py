@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0020_userauth_login_identifier_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userauth",
+            name="profile_pic_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="makeyourprofilepop",
+            name="variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-16 12:00
+
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+
+def backfill_positions(apps, schema_editor):
+    """Number every gallery in the order the feed showed it so far (newest edit first)."""
+    MakeYourProfilePop = apps.get_model("account", "MakeYourProfilePop")
+    rows = MakeYourProfilePop.objects.annotate(
+        rn=Window(
+            expression=RowNumber(),
+            partition_by=[F("user_id")],
+            order_by=[F("updated_at").desc(), F("id").desc()],
+        )
+    ).values_list("id", "rn")
+
+    batch = []
+    for pk, rn in rows.iterator(chunk_size=2000):
+        batch.append(MakeYourProfilePop(id=pk, position=rn - 1))
+        if len(batch) >= 2000:
+            MakeYourProfilePop.objects.bulk_update(batch, ["position"])
+            batch = []
+    if batch:
+        MakeYourProfilePop.objects.bulk_update(batch, ["position"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0021_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="makeyourprofilepop",
+            name="position",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterModelOptions(
+            name="makeyourprofilepop",
+            options={"ordering": ["position", "id"]},
+        ),
+        migrations.AddIndex(
+            model_name="makeyourprofilepop",
+            index=models.Index(fields=["user", "position"], name="account_pop_user_position"),
+        ),
+        migrations.RunPython(backfill_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-16 12:00
+
+from django.db import migrations
+
+
+def clear_finished_bodies(apps, schema_editor):
+    """Bodies can hold one-time codes; finished rows no longer need them."""
+    OutboundEmail = apps.get_model("account", "OutboundEmail")
+    OutboundEmail.objects.filter(status__in=["SENT", "FAILED"]).exclude(body="").update(body="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0022_makeyourprofilepop_position"),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_finished_bodies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0024_userauth_profile_version"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="userauth",
+            name="account_user_active_gender_dob",
+        ),
+        migrations.AddIndex(
+            model_name="userauth",
+            index=models.Index(
+                fields=["is_active", "gender", "-created_at", "-user_id"],
+                include=["dob"],
+                name="account_user_gender_recent",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userauth",
+            index=models.Index(
+                fields=["is_active", "-created_at", "-user_id"],
+                include=["gender", "dob"],
+                name="account_user_active_recent",
+            ),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-16 12:00
+
+import multiselectfield.db.fields
+from django.db import migrations
+from django.db.models import Value
+from django.db.models.functions import Replace
+
+# old key -> new key; the old ones contained commas, so MultiSelectField split
+# them apart on read and encode_choices never matched them
+RENAMED_KEYS = {
+    "Fun, casual dates": "Fun casual dates",
+    "intimaIntimacy, without commitmentcy": "Intimacy without commitment",
+}
+BATCH_SIZE = 2000
+
+
+def encode(values, choices):
+    if not values:
+        return 0
+    if isinstance(values, str):
+        values = values.split(",")
+    selected = set(values)
+    return sum(1 << bit for bit, (key, _label) in enumerate(choices) if key in selected)
+
+
+def rename_keys(apps, schema_editor, renames):
+    UserAuth = apps.get_model("account", "UserAuth")
+    choices = UserAuth._meta.get_field("looking_for").choices
+
+    touched = set()
+    for old, new in renames.items():
+        rows = UserAuth.objects.filter(looking_for__contains=old)
+        touched.update(rows.values_list("pk", flat=True))
+        rows.update(looking_for=Replace("looking_for", Value(old), Value(new)))
+
+    # the mask of these rows never had the renamed choices' bits
+    batch = []
+    for user in UserAuth.objects.filter(pk__in=touched).only("pk", "looking_for").iterator(chunk_size=BATCH_SIZE):
+        user.looking_for_mask = encode(user.looking_for, choices)
+        batch.append(user)
+        if len(batch) >= BATCH_SIZE:
+            UserAuth.objects.bulk_update(batch, ["looking_for_mask"])
+            batch = []
+    if batch:
+        UserAuth.objects.bulk_update(batch, ["looking_for_mask"])
+
+
+def forwards(apps, schema_editor):
+    rename_keys(apps, schema_editor, RENAMED_KEYS)
+
+
+def backwards(apps, schema_editor):
+    rename_keys(apps, schema_editor, {new: old for old, new in RENAMED_KEYS.items()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0025_userauth_filter_recent_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="userauth",
+            name="looking_for",
+            field=multiselectfield.db.fields.MultiSelectField(
+                blank=True,
+                choices=[
+                    ("A long-term relationship", "A long-term relationship"),
+                    ("A life partner", "A life partner"),
+                    ("Fun casual dates", "Fun, casual dates"),
+                    ("Intimacy without commitment", "Intimacy, without commitment"),
+                    ("Marriage", "Marriage"),
+                    ("Ethical non-monogamy", "Ethical non-monogamy"),
+                ],
+                max_length=255,
+                null=True,
+            ),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
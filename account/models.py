@@ -1,5 +1,6 @@
 from .managers import UserManager
-from .utils import generate_otp, get_otp_expiry, validate_image
+from .utils import validate_image, encode_choices, normalize_search_text
+from .images import DEFAULT_PROFILE_PIC
 from multiselectfield import MultiSelectField
 from django.conf import settings
 from datetime import date
@@ -11,12 +12,33 @@ from django.core.validators import RegexValidator
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.gis.db import models as gis_models
 from django.contrib.gis.geos import Point
+from django.contrib.postgres.indexes import GinIndex
+from django.db.models.functions import Lower
 
 class UserAuth(AbstractBaseUser, PermissionsMixin):
     class Meta:
         verbose_name = "User"
         verbose_name_plural = "Users"
         ordering = ["-created_at"]
+        indexes = [
+            # serves both LIKE '%q%' and trigram similarity on the search column
+            GinIndex(fields=["search_text"], name="account_user_search_trgm", opclasses=["gin_trgm_ops"]),
+            # UserFilterAPIView: active users newest first (keyset on created_at, user_id),
+            # with or without an exact gender; the dob range is checked from the index
+            models.Index(
+                fields=["is_active", "gender", "-created_at", "-user_id"],
+                include=["dob"],
+                name="account_user_gender_recent",
+            ),
+            models.Index(
+                fields=["is_active", "-created_at", "-user_id"],
+                include=["gender", "dob"],
+                name="account_user_active_recent",
+            ),
+            # case-insensitive login lookups (UserQuerySet.by_login_identifier)
+            models.Index(Lower("email"), name="account_user_email_lower"),
+            models.Index(Lower("username"), name="account_user_username_lower"),
+        ]
     
     GENDER_CHOICES = [
         ('MALE', 'MALE'),
@@ -32,11 +54,13 @@ class UserAuth(AbstractBaseUser, PermissionsMixin):
         ('ADVENTURE PARTNER', 'ADVENTURE PARTNER'),
     ]
     
+    # keys are stored comma-joined (MultiSelectField) and encoded into
+    # looking_for_mask, so they must not contain commas; labels may
     LOOKING_FOR_CHOICES = [
         ('A long-term relationship', 'A long-term relationship'),
         ('A life partner', 'A life partner'),
-        ('Fun, casual dates', 'Fun, casual dates'),
-        ('intimaIntimacy, without commitmentcy', 'Intimacy, without commitment'),
+        ('Fun casual dates', 'Fun, casual dates'),
+        ('Intimacy without commitment', 'Intimacy, without commitment'),
         ('Marriage', 'Marriage'),
         ('Ethical non-monogamy', 'Ethical non-monogamy'),
     ]
@@ -78,12 +102,15 @@ class UserAuth(AbstractBaseUser, PermissionsMixin):
 
     profile_pic = models.ImageField(
         upload_to="profile/",
-        default="profile/profile.png",
+        default=DEFAULT_PROFILE_PIC,
         null=True,
         blank=True,
         validators=[validate_image],
     )
+    # resized WebP/JPEG renditions of profile_pic, see account/images.py
+    profile_pic_variants = models.JSONField(default=dict, blank=True, editable=False)
 
+    # retired: OTPs live in Redis (account.otp); nothing reads or writes these
     otp = models.CharField(max_length=6, blank=True, null=True)
     otp_expired = models.DateTimeField(blank=True, null=True)
 
@@ -91,12 +118,28 @@ class UserAuth(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
+    # bumped to revoke every issued JWT (checked against the token's `ver` claim)
+    token_version = models.PositiveIntegerField(default=0)
+    # bumped by every write that changes the profile body; the profile ETag reads it
+    profile_version = models.PositiveIntegerField(default=0, editable=False)
     
 
     gender = models.CharField(max_length=20, choices=GENDER_CHOICES, blank=True, null=True)
     brings = MultiSelectField(max_length=255, choices=BRINGS_CHOICES, blank=True, null=True)
     that = MultiSelectField(max_length=255, choices=THAT_CHOICES, blank=True, null=True)
     looking_for = MultiSelectField(max_length=255, choices=LOOKING_FOR_CHOICES, blank=True, null=True)
+
+    # bitmask mirrors of the MultiSelectFields (bit i = i-th choice), kept in sync in save()
+    brings_mask = models.PositiveIntegerField(default=0, db_index=True)
+    that_mask = models.PositiveIntegerField(default=0, db_index=True)
+    looking_for_mask = models.PositiveIntegerField(default=0, db_index=True)
+
+    # denormalized UserLike counts, maintained by UserLikeService
+    likes_received_count = models.PositiveIntegerField(default=0)
+    likes_given_count = models.PositiveIntegerField(default=0)
+
+    # normalized "username full_name" for people search (see account/search.py)
+    search_text = models.TextField(blank=True, default="", editable=False)
     
     professional_field = models.JSONField(default=list, blank=True, null=True)
     interests = models.JSONField(default=list, blank=True, null=True)
@@ -147,6 +190,13 @@ class UserAuth(AbstractBaseUser, PermissionsMixin):
     
     
 
+    # MultiSelectField -> (mask column, choices)
+    CHOICE_MASK_FIELDS = {
+        "brings": ("brings_mask", BRINGS_CHOICES),
+        "that": ("that_mask", THAT_CHOICES),
+        "looking_for": ("looking_for_mask", LOOKING_FOR_CHOICES),
+    }
+
     # Required by Django
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["full_name"] # Fields required when creating superuser 
@@ -159,13 +209,15 @@ class UserAuth(AbstractBaseUser, PermissionsMixin):
     def get_full_name(self):
         return self.full_name
 
-    def set_otp(self, otp: str = None, expiry_minutes: int = 30) -> None:
-        self.otp = otp or generate_otp()
-        self.otp_expired = get_otp_expiry(expiry_minutes)
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # request.user is built from a cached principal with everything but the
+        # auth flags deferred (account.authentication): the first deferred
+        # attribute a view touches loads all of them in one query, not one each
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
 
-    def is_otp_valid(self, otp: str) -> bool:
-        return self.otp == otp and self.otp_expired and timezone.now() <= self.otp_expired
-    
     def height_display(self):
         return f"{self.height_feet}′ {self.height_inches}″"
 
@@ -202,7 +254,28 @@ class UserAuth(AbstractBaseUser, PermissionsMixin):
             "lng": float(self.longitude),
         }
         
+    def sync_choice_masks(self) -> None:
+        for field, (mask_field, choices) in self.CHOICE_MASK_FIELDS.items():
+            setattr(self, mask_field, encode_choices(getattr(self, field), choices))
+
     def save(self, *args, **kwargs):
+        self.sync_choice_masks()
+        self.search_text = normalize_search_text(self.username, self.full_name)
+
+        # targeted saves must also write the columns derived here
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            for field, (mask_field, _choices) in self.CHOICE_MASK_FIELDS.items():
+                if field in update_fields:
+                    update_fields.add(mask_field)
+            if update_fields & {"username", "full_name"}:
+                update_fields.add("search_text")
+            if update_fields & {"latitude", "longitude"}:
+                update_fields |= {"geo_location", "location_updated_at"}
+            update_fields.add("profile_version")
+            kwargs["update_fields"] = update_fields
+
         lat = self.latitude
         lng = self.longitude
 
@@ -212,10 +285,19 @@ class UserAuth(AbstractBaseUser, PermissionsMixin):
             # only update if changed (or geo_location is empty)
             if self.geo_location is None or self.geo_location.x != new_point.x or self.geo_location.y != new_point.y:
                 self.geo_location = new_point
+                self.location_updated_at = timezone.now()
         else:
             self.geo_location = None
 
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        if not adding:
+            self.profile_version = models.F("profile_version") + 1
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            if not adding:
+                # leave it deferred instead of holding the expression
+                self.__dict__.pop("profile_version", None)
     
     
     
@@ -223,6 +305,8 @@ class UserAuth(AbstractBaseUser, PermissionsMixin):
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
+MAX_POP_IMAGES = 7
+
 class MakeYourProfilePop(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="pop_images")
     image = models.ImageField(
@@ -230,21 +314,38 @@ class MakeYourProfilePop(models.Model):
         validators=[validate_image],
     )
     image_url = models.URLField(max_length=200, blank=True, null=True)
+    # resized WebP/JPEG renditions of image, see account/images.py
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+    position = models.PositiveSmallIntegerField(default=0)  # gallery order, set by the reorder endpoint
 
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("user", "image")  # optional, prevent duplicates
+        ordering = ["position", "id"]
+        indexes = [
+            models.Index(fields=["user", "position"], name="account_pop_user_position"),
+        ]
 
     def __str__(self):
         return f"PopImage-{self.pk} for User-{self.user.user_id}"
 
     def save(self, *args, **kwargs):
-        # Limit a user to 4 images
-        if self.user.pop_images.count() >= 7 and not self.pk:
-            raise ValueError("You can upload a maximum of 7 pop-up images.")
+        # Limit a user to MAX_POP_IMAGES images (updates skip the count)
+        if self._state.adding and self.user.pop_images.count() >= MAX_POP_IMAGES:
+            raise ValueError(f"You can upload a maximum of {MAX_POP_IMAGES} pop-up images.")
         super().save(*args, **kwargs)
+
+
+def touch_profile(user_id) -> None:
+    """
+    Bump the user's profile_version after a write that doesn't go through
+    UserAuth.save() (pop images, rendered derivatives), so the profile ETag
+    (core.conditional) changes too. updated_at is left alone: the recent
+    feed is ordered by it.
+    """
+    UserAuth.objects.filter(pk=user_id).update(profile_version=models.F("profile_version") + 1)
         
         
         
@@ -267,3 +368,73 @@ class UserLike(models.Model):
 
     def __str__(self):
         return f"{self.user_from} liked {self.user_to}"
+
+
+class Match(models.Model):
+    """
+    Mutual like. Stored once per side (user -> matched_user and back) so
+    "my matches, newest first" is a single range scan on (user, -created_at).
+    Maintained by UserLikeService; removed on unlike or block.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="matches"
+    )
+    matched_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ("user", "matched_user")
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="account_match_user_recent"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} matched {self.matched_user}"
+
+
+class OutboundEmail(models.Model):
+    """
+    Transactional email queued by the API and delivered by Celery
+    (account.mailer), so requests never wait on SMTP.
+    """
+    STATUS_QUEUED = "QUEUED"
+    STATUS_SENT = "SENT"
+    STATUS_FAILED = "FAILED"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "QUEUED"),
+        (STATUS_SENT, "SENT"),
+        (STATUS_FAILED, "FAILED"),
+    ]
+
+    to_email = models.EmailField()
+    from_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the delivery task only ever reads due, queued rows
+            models.Index(
+                fields=["next_attempt_at"],
+                name="account_outbound_email_due",
+                condition=models.Q(status="QUEUED"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.to_email}: {self.subject} ({self.status})"
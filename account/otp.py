@@ -0,0 +1,110 @@
+# account/otp.py
+"""
+One-time passwords in Redis, keyed by (purpose, identifier).
+
+    otp:{purpose}:{identifier}           HASH code (HMAC of the code), attempts; TTL = OTP_TTL_SECONDS
+    otp:cooldown:{purpose}:{identifier}  exists while a new code may not be sent yet
+
+Verification is one Lua call on one key (compare, count the attempt, consume),
+so the users table is neither scanned for a code nor rewritten to store one.
+"""
+import logging
+
+from django.utils.crypto import salted_hmac
+from django_redis import get_redis_connection
+
+from .utils import generate_otp
+
+logger = logging.getLogger(__name__)
+
+REDIS = get_redis_connection("default")
+
+OTP_TTL_SECONDS = 30 * 60
+OTP_MAX_ATTEMPTS = 5
+OTP_RESEND_COOLDOWN_SECONDS = 60
+
+PURPOSE_REGISTRATION = "registration"
+PURPOSE_PASSWORD_RESET = "password_reset"
+
+# verify results
+OTP_VALID = "valid"
+OTP_INVALID = "invalid"
+OTP_EXPIRED = "expired"
+OTP_LOCKED = "locked"
+
+# KEYS: otp key   ARGV: code hash, max attempts
+# 1 valid (consumed), 2 wrong code, 0 no code, -1 too many attempts (consumed)
+_VERIFY = REDIS.register_script("""
+local stored = redis.call('HGET', KEYS[1], 'code')
+if not stored then
+    return 0
+end
+local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+if attempts > tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+    return -1
+end
+if stored == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+return 2
+""")
+_VERIFY_RESULTS = {1: OTP_VALID, 2: OTP_INVALID, 0: OTP_EXPIRED, -1: OTP_LOCKED}
+
+
+class OTPThrottled(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Please wait {retry_after} seconds before requesting a new code.")
+        self.retry_after = retry_after
+
+
+def _identifier(identifier: str) -> str:
+    return identifier.strip().lower()
+
+
+def otp_key(purpose: str, identifier: str) -> str:
+    return f"otp:{purpose}:{_identifier(identifier)}"
+
+
+def cooldown_key(purpose: str, identifier: str) -> str:
+    return f"otp:cooldown:{purpose}:{_identifier(identifier)}"
+
+
+def _hash(purpose: str, identifier: str, code: str) -> str:
+    return salted_hmac("account.otp", f"{purpose}:{_identifier(identifier)}:{code}").hexdigest()
+
+
+class OTPStore:
+    @staticmethod
+    def issue(purpose: str, identifier: str, ttl: int = OTP_TTL_SECONDS) -> str:
+        """
+        Create a fresh code (replacing any pending one) and return it.
+        Raises OTPThrottled while the resend cooldown is running.
+        """
+        if not REDIS.set(cooldown_key(purpose, identifier), 1, nx=True, ex=OTP_RESEND_COOLDOWN_SECONDS):
+            raise OTPThrottled(max(REDIS.ttl(cooldown_key(purpose, identifier)), 1))
+
+        code = generate_otp()
+        key = otp_key(purpose, identifier)
+        pipe = REDIS.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, mapping={"code": _hash(purpose, identifier, code), "attempts": 0})
+        pipe.expire(key, ttl)
+        pipe.execute()
+        return code
+
+    @staticmethod
+    def verify(purpose: str, identifier: str, code: str) -> str:
+        """One of OTP_VALID / OTP_INVALID / OTP_EXPIRED / OTP_LOCKED. A valid code is consumed."""
+        result = _VERIFY(
+            keys=[otp_key(purpose, identifier)],
+            args=[_hash(purpose, identifier, code), OTP_MAX_ATTEMPTS],
+        )
+        if result == -1:
+            logger.warning("OTP locked after too many attempts: purpose=%s", purpose)
+        return _VERIFY_RESULTS[result]
+
+    @staticmethod
+    def discard(purpose: str, identifier: str) -> None:
+        REDIS.delete(otp_key(purpose, identifier))
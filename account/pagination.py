@@ -0,0 +1,98 @@
+# account/pagination.py
+import base64
+import json
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(*values) -> str:
+    """Pack keyset values into an opaque, url-safe token."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> list:
+    """Inverse of encode_cursor. Raises ValidationError on anything malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValidationError({"cursor": "Invalid cursor."})
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValidationError({"cursor": "Invalid cursor."})
+    return values
+
+
+class KeysetPagination:
+    """
+    Cursor pagination over an already ordered queryset.
+
+    No COUNT(*) and no OFFSET: the caller filters the queryset past the cursor
+    values itself (the keyset predicate depends on the ordering), this class
+    only slices page_size + 1 rows to know whether another page exists and
+    builds the opaque `next` link from the last row.
+    """
+    cursor_query_param = "cursor"
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 50
+    scan_factor = 3  # rows scanned per page when a `keep` filter drops some
+
+    def __init__(self, request, key_func):
+        self.request = request
+        self.key_func = key_func  # row -> tuple of keyset values
+        self.next_cursor = None
+
+    def get_page_size(self) -> int:
+        try:
+            size = int(self.request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_cursor(self, size: int):
+        token = self.request.query_params.get(self.cursor_query_param)
+        return decode_cursor(token, size) if token else None
+
+    def paginate(self, queryset, keep=None) -> list:
+        """
+        `keep(rows) -> rows` optionally drops rows after the fetch (e.g. already
+        seen profiles). Up to page_size * scan_factor rows are scanned then, and
+        the cursor points at the last row consumed, so dropped rows never come
+        back on the next page.
+        """
+        page_size = self.get_page_size()
+        if keep is None:
+            rows = list(queryset[: page_size + 1])
+            if len(rows) > page_size:
+                rows = rows[:page_size]
+                self.next_cursor = encode_cursor(*self.key_func(rows[-1]))
+            return rows
+
+        scan_size = page_size * self.scan_factor
+        scanned = list(queryset[: scan_size + 1])
+        has_more = len(scanned) > scan_size
+        scanned = scanned[:scan_size]
+
+        rows = keep(scanned)
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_cursor = encode_cursor(*self.key_func(rows[-1]))
+        elif has_more:
+            self.next_cursor = encode_cursor(*self.key_func(scanned[-1]))
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_data(self, data) -> dict:
+        return {
+            "next": self.get_next_link(),
+            "previous": None,
+            "results": data,
+        }
@@ -1,26 +1,221 @@
-# users/presence_config.py
-PRESENCE_TOUCH_THROTTLE_SECONDS = 300  # touch at most once per 5 minutes
-OFFLINE_CUTOFF_MINUTES = 12            # must be > 5 to avoid flicker
+# account/presence.py
+"""
+Redis presence, shared by chat, calls and the feed.
 
+    presence:hb:{user_id}   heartbeat key; the user is online while it exists
+    presence:last_seen      ZSET user_id -> unix time of last activity
+    presence:online         ZSET user_id -> unix time the heartbeat expires
+    presence:dirty          SET of user ids whose last_activity is not in Postgres yet
 
-# account/presence.py
+Requests and websocket frames only touch Redis. `flush_last_activity` (Celery
+beat, every minute) copies the timestamps to `UserAuth.last_activity` in
+batches, so the users table is no longer written on every chat request.
+`mark_expired_offline` pops only the heartbeats that have expired from
+presence:online, so going offline costs one UPDATE for exactly those users.
+The offline event goes to the `user_{id}` groups of the users' matches and
+chat partners (blocked pairs excluded), not to every connected socket.
+"""
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.core.cache import cache
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+REDIS = get_redis_connection("default")
+
+PRESENCE_TTL_SECONDS = 120      # no heartbeat for this long -> offline
+FLUSH_BATCH_SIZE = 1000
+
+LAST_SEEN_KEY = "presence:last_seen"
+ONLINE_KEY = "presence:online"
+DIRTY_KEY = "presence:dirty"
+
+# atomically take up to ARGV[2] members whose expiry (score) is <= ARGV[1]
+_POP_EXPIRED = REDIS.register_script(
+    "local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2]) "
+    "if #ids > 0 then redis.call('ZREM', KEYS[1], unpack(ids)) end "
+    "return ids"
+)
+
+
+def heartbeat_key(user_id: int) -> str:
+    return f"presence:hb:{user_id}"
+
+
+def heartbeat(user_id: int, ttl: int = PRESENCE_TTL_SECONDS) -> None:
+    """Mark the user online for `ttl` seconds and record the activity time."""
+    now = timezone.now().timestamp()
+    pipe = REDIS.pipeline(transaction=False)
+    pipe.set(heartbeat_key(user_id), int(now), ex=ttl)
+    pipe.zadd(LAST_SEEN_KEY, {user_id: now})
+    pipe.zadd(ONLINE_KEY, {user_id: now + ttl})
+    pipe.sadd(DIRTY_KEY, user_id)
+    pipe.execute()
+
+
+def set_offline(user_id: int) -> None:
+    pipe = REDIS.pipeline(transaction=False)
+    pipe.delete(heartbeat_key(user_id))
+    pipe.zadd(ONLINE_KEY, {user_id: 0})  # picked up by the next sweep
+    pipe.execute()
+
+
+def is_online(user_id: int) -> bool:
+    return REDIS.exists(heartbeat_key(user_id)) == 1
+
+
+def get_presence(user_ids) -> dict:
+    """
+    {user_id: {"is_online": bool, "last_seen": datetime | None}} for many users
+    in one round trip (MGET on the heartbeat keys + ZMSCORE on last_seen).
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+
+    pipe = REDIS.pipeline(transaction=False)
+    pipe.mget([heartbeat_key(uid) for uid in user_ids])
+    pipe.zmscore(LAST_SEEN_KEY, user_ids)
+    beats, scores = pipe.execute()
+
+    return {
+        uid: {
+            "is_online": beat is not None,
+            "last_seen": datetime.fromtimestamp(score, tz=dt_timezone.utc) if score else None,
+        }
+        for uid, beat, score in zip(user_ids, beats, scores)
+    }
+
 
 def touch_chat_presence(user) -> None:
     if not user or not user.is_authenticated:
         return
+    heartbeat(user.pk)
 
-    key = f"presence:chat_touch:{user.pk}"
-    if cache.get(key):
+
+def flush_last_activity(batch_size: int = FLUSH_BATCH_SIZE) -> int:
+    """Write buffered last-activity timestamps to the DB, one bulk UPDATE per batch."""
+    User = get_user_model()
+    flushed = 0
+
+    while True:
+        raw_ids = REDIS.spop(DIRTY_KEY, batch_size)
+        if not raw_ids:
+            break
+        user_ids = [int(uid) for uid in raw_ids]
+        scores = REDIS.zmscore(LAST_SEEN_KEY, user_ids)
+        now = timezone.now().timestamp()
+
+        users = [
+            User(
+                pk=uid,
+                last_activity=datetime.fromtimestamp(score, tz=dt_timezone.utc),
+                is_online=now - score < PRESENCE_TTL_SECONDS,
+            )
+            for uid, score in zip(user_ids, scores)
+            if score
+        ]
+        try:
+            User.objects.bulk_update(users, ["last_activity", "is_online"])
+        except Exception:
+            # put them back so the next run retries
+            REDIS.sadd(DIRTY_KEY, *user_ids)
+            raise
+        flushed += len(users)
+
+        if len(raw_ids) < batch_size:
+            break
+
+    if flushed:
+        logger.info("Presence flushed: %s users", flushed)
+    return flushed
+
+def user_group(user_id: int) -> str:
+    """Channel layer group of the user's call sockets (call.consumers)."""
+    return f"user_{user_id}"
+
+
+def interested_peers(user_ids) -> dict:
+    """
+    {peer_id: [user_id, ...]}: who should hear about these users' presence.
+    Peers are matches and chat partners; blocked pairs are left out.
+    """
+    from django.db.models import Q
+
+    from account.models import Match
+    from chat.models import ChatThread
+    from mutual_system.services import BlockGraph
+
+    user_ids = list(user_ids)
+    peers = {uid: set() for uid in user_ids}
+    for user_id, peer_id in Match.objects.filter(user_id__in=user_ids).values_list("user_id", "matched_user_id"):
+        peers[user_id].add(peer_id)
+    threads = ChatThread.objects.filter(Q(user_a_id__in=user_ids) | Q(user_b_id__in=user_ids))
+    for a, b in threads.values_list("user_a_id", "user_b_id"):
+        if a in peers:
+            peers[a].add(b)
+        if b in peers:
+            peers[b].add(a)
+
+    # one pipeline for the whole batch, not a round trip per user
+    visible = BlockGraph.exclude_blocked_many({uid: sorted(ids) for uid, ids in peers.items()})
+    audience = {}
+    for user_id in user_ids:
+        for peer_id in visible[user_id]:
+            audience.setdefault(peer_id, []).append(user_id)
+    return audience
+
+
+def _notify_offline(channel_layer, offline_ids) -> None:
+    audience = interested_peers(offline_ids)
+    if not audience:
         return
 
-    now = timezone.now()
+    async def send_all():
+        for peer_id, user_ids in audience.items():
+            await channel_layer.group_send(
+                user_group(peer_id), {"type": "presence_offline", "user_ids": user_ids}
+            )
+
+    async_to_sync(send_all)()
+
+
+def mark_expired_offline(batch_size: int = FLUSH_BATCH_SIZE) -> int:
+    """
+    Mark users whose heartbeat expired as offline.
+
+    Only the expired members of presence:online are touched: each batch is one
+    UPDATE on those ids and one `presence_offline` event per interested peer.
+    """
+    User = get_user_model()
+    channel_layer = get_channel_layer()
+    total = 0
+
+    while True:
+        now = timezone.now().timestamp()
+        raw_ids = _POP_EXPIRED(keys=[ONLINE_KEY], args=[now, batch_size])
+        if not raw_ids:
+            break
+        user_ids = [int(uid) for uid in raw_ids]
+
+        # a heartbeat may have landed between the expiry and the pop
+        beats = REDIS.mget([heartbeat_key(uid) for uid in user_ids])
+        offline_ids = [uid for uid, beat in zip(user_ids, beats) if beat is None]
+
+        if offline_ids:
+            User.objects.filter(pk__in=offline_ids, is_online=True).update(is_online=False)
+            if channel_layer is not None:
+                _notify_offline(channel_layer, offline_ids)
+            total += len(offline_ids)
 
-    # lightweight update (no model save)
-    type(user).objects.filter(pk=user.pk).update(
-        is_online=True,
-        last_activity=now,
-    )
+        if len(raw_ids) < batch_size:
+            break
 
-    cache.set(key, 1, PRESENCE_TOUCH_THROTTLE_SECONDS)
\ No newline at end of file
+    if total:
+        logger.info("Presence: %s users went offline", total)
+    return total
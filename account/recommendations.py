@@ -0,0 +1,132 @@
+# account/recommendations.py
+"""
+Precomputed per-user recommendation queues.
+
+Each active user gets a Redis sorted set `reco:queue:{user_id}` of candidate
+ids scored by account.matching. Celery builds the queues in the background;
+the feed only pops the best entries, so a feed request costs O(page size)
+instead of ranking the whole pool.
+
+`reco:built:{user_id}` records that a build ran (same TTL as the queue).
+Redis drops the queue key once its last member is popped, and users with no
+candidates never get one, so only a missing marker means a first visit that
+is worth ranking inline; everything else is refilled in the background.
+"""
+import logging
+
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from mutual_system.services import BlockGraph
+
+from .geo import GeographyDWithin
+from .impressions import ImpressionFilter
+from .matching import CompatibilityScorer
+from .models import UserAuth as User, UserLike
+
+logger = logging.getLogger(__name__)
+
+REDIS = get_redis_connection("default")
+
+QUEUE_SIZE = 500
+QUEUE_LOW_WATERMARK = 50          # refill once fewer candidates than this remain
+QUEUE_TTL = 60 * 60 * 24          # idle users' queues simply expire
+REFRESH_DEBOUNCE_SECONDS = 60     # at most one rebuild per user per minute
+
+# profile fields that change who a user should be shown
+RECOMMENDATION_FIELDS = {
+    "brings", "that", "looking_for",
+    "interests", "hobbies", "lifestyle", "professional_field",
+    "latitude", "longitude", "geo_location", "location_updated_at",
+    "distance", "gender", "dob", "is_active",
+}
+
+
+def queue_key(user_id: int) -> str:
+    return f"reco:queue:{user_id}"
+
+
+def built_key(user_id: int) -> str:
+    return f"reco:built:{user_id}"
+
+
+class RecommendationQueue:
+    @staticmethod
+    def candidates(user):
+        """Active users minus the viewer's likes and blocks (either direction)."""
+        qs = (
+            User.objects.filter(is_active=True)
+            .exclude(pk=user.pk)
+            .exclude(user_id__in=UserLike.objects.filter(user_from=user).values("user_to_id"))
+        )
+        qs = BlockGraph.exclude_from(user, qs)
+        if user.geo_location is not None and user.distance:
+            qs = qs.filter(GeographyDWithin("geo_location", user.geo_location, user.distance * 1000))
+        return qs
+
+    @staticmethod
+    def build(user) -> int:
+        """Rank the candidate pool and atomically replace the user's queue."""
+        ranked_ids, scores = CompatibilityScorer(user).rank(RecommendationQueue.candidates(user))
+
+        # profiles the user has already been shown don't re-enter the queue
+        seen = ImpressionFilter.seen_mask(user.pk, ranked_ids)
+        fresh = [(uid, score) for uid, score, was_seen in zip(ranked_ids, scores, seen) if not was_seen]
+        mapping = dict(fresh[:QUEUE_SIZE])
+
+        key = queue_key(user.pk)
+        pipe = REDIS.pipeline(transaction=True)
+        pipe.delete(key)
+        if mapping:
+            pipe.zadd(key, mapping)
+            pipe.expire(key, QUEUE_TTL)
+        pipe.set(built_key(user.pk), 1, ex=QUEUE_TTL)
+        pipe.execute()
+
+        logger.info("Recommendation queue built: user=%s size=%s", user.pk, len(mapping))
+        return len(mapping)
+
+    @staticmethod
+    def pop(user, count: int) -> list[tuple[int, float]]:
+        """Take the `count` best candidates off the queue, refilling in the background when low."""
+        key = queue_key(user.pk)
+
+        pipe = REDIS.pipeline(transaction=True)
+        pipe.exists(built_key(user.pk))
+        pipe.zpopmax(key, count)
+        pipe.zcard(key)
+        built, popped, remaining = pipe.execute()
+
+        if not built:
+            # first visit (or idle past QUEUE_TTL): build inline once; an empty or
+            # drained queue is left to the background refill below
+            RecommendationQueue.build(user)
+            popped = REDIS.zpopmax(key, count)
+            remaining = REDIS.zcard(key)
+
+        if remaining < QUEUE_LOW_WATERMARK:
+            RecommendationQueue.schedule_refresh(user.pk)
+
+        return [(int(member), score) for member, score in popped]
+
+    @staticmethod
+    def remove(user_id: int, candidate_ids) -> None:
+        candidate_ids = list(candidate_ids)
+        if candidate_ids:
+            REDIS.zrem(queue_key(user_id), *candidate_ids)
+
+    @staticmethod
+    def length(user_ids) -> dict:
+        pipe = REDIS.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zcard(queue_key(user_id))
+        return dict(zip(user_ids, pipe.execute()))
+
+    @staticmethod
+    def schedule_refresh(user_id: int) -> None:
+        """Debounced async rebuild, fired after the current transaction commits."""
+        if not REDIS.set(f"reco:refreshing:{user_id}", 1, nx=True, ex=REFRESH_DEBOUNCE_SECONDS):
+            return
+
+        from .tasks import refresh_recommendation_queue  # tasks imports this module
+        transaction.on_commit(lambda: refresh_recommendation_queue.delay(user_id))
@@ -0,0 +1,71 @@
+# account/relationships.py
+"""
+The viewer's relationship to a page of users, resolved in one query.
+
+Serializers used to ask "did the viewer like this profile?" per object. Views
+(or the serializer itself, on first use) now load a RelationshipContext for
+the whole page and put it in the serializer context under "relationships".
+"""
+from django.db.models import Q
+
+from mutual_system.services import BlockGraph
+
+from .models import UserLike
+
+
+class RelationshipContext:
+    def __init__(self, liked=(), liked_by=(), blocked=()):
+        self.liked = set(liked)          # viewer -> user
+        self.liked_by = set(liked_by)    # user -> viewer
+        self.blocked = set(blocked)      # either direction
+
+    @classmethod
+    def load(cls, viewer, user_ids) -> "RelationshipContext":
+        user_ids = {uid for uid in user_ids if uid is not None}
+        if viewer is None or not viewer.is_authenticated or not user_ids:
+            return cls()
+
+        # one query for both like directions
+        rows = UserLike.objects.filter(
+            Q(user_from=viewer, user_to_id__in=user_ids)
+            | Q(user_to=viewer, user_from_id__in=user_ids)
+        ).values_list("user_from_id", "user_to_id")
+
+        liked, liked_by = set(), set()
+        for user_from_id, user_to_id in rows:
+            if user_from_id == viewer.pk:
+                liked.add(user_to_id)
+            else:
+                liked_by.add(user_from_id)
+
+        # blocks come from the Redis block graph, no SQL
+        blocked = BlockGraph.blocked_ids(viewer) & user_ids
+        return cls(liked, liked_by, blocked)
+
+    def is_liked(self, user_id) -> bool:
+        return user_id in self.liked
+
+    def liked_you(self, user_id) -> bool:
+        return user_id in self.liked_by
+
+    def is_match(self, user_id) -> bool:
+        return user_id in self.liked and user_id in self.liked_by
+
+    def is_blocked(self, user_id) -> bool:
+        return user_id in self.blocked
+
+    def as_dict(self, user_id) -> dict:
+        return {
+            "is_liked": self.is_liked(user_id),
+            "liked_you": self.liked_you(user_id),
+            "is_match": self.is_match(user_id),
+        }
+
+
+def relationship_context(request, users) -> dict:
+    """Serializer context for a page of users: {"request", "relationships"}."""
+    viewer = getattr(request, "user", None)
+    return {
+        "request": request,
+        "relationships": RelationshipContext.load(viewer, [u.pk for u in users]),
+    }
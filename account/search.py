@@ -0,0 +1,98 @@
+# account/search.py
+"""
+People search.
+
+* Short queries (autocomplete, up to PREFIX_MAX_LEN characters) are answered
+  from Redis: every word of a user's normalized username / full name is
+  indexed under `search:prefix:{p}` for each of its first few prefixes.
+  Each set is capped at PREFIX_CAP members, most recently active first, so a
+  lookup is a single bounded ZREVRANGE however many users share the prefix.
+* Longer queries go to Postgres. `search_text` carries a pg_trgm GIN index
+  that serves both the substring match and the fuzzy (word similarity)
+  match; results are ranked by similarity and keyset paginated.
+
+Email is never indexed.
+"""
+import logging
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from django_redis import get_redis_connection
+
+from .models import UserAuth as User
+
+logger = logging.getLogger(__name__)
+
+REDIS = get_redis_connection("default")
+
+PREFIX_MAX_LEN = 3
+PREFIX_CAP = 500
+AUTOCOMPLETE_LIMIT = 20
+
+# profile fields that change what the user is found by
+SEARCH_FIELDS = {"username", "full_name", "search_text", "is_active"}
+
+
+def prefix_key(prefix: str) -> str:
+    return f"search:prefix:{prefix}"
+
+
+def user_prefixes_key(user_id: int) -> str:
+    return f"search:prefixes:{user_id}"
+
+
+def prefixes(search_text: str) -> set:
+    return {
+        word[:n]
+        for word in (search_text or "").split()
+        for n in range(1, min(len(word), PREFIX_MAX_LEN) + 1)
+    }
+
+
+class PrefixIndex:
+    @staticmethod
+    def index(user) -> None:
+        """(Re)index one user, dropping prefixes their new name no longer has."""
+        new = prefixes(user.search_text) if user.is_active else set()
+        old = {p.decode() for p in REDIS.smembers(user_prefixes_key(user.pk))}
+
+        activity = user.last_activity or user.created_at
+        score = activity.timestamp() if activity else 0
+
+        pipe = REDIS.pipeline(transaction=True)
+        for prefix in old - new:
+            pipe.zrem(prefix_key(prefix), user.pk)
+        for prefix in new:
+            pipe.zadd(prefix_key(prefix), {user.pk: score})
+            pipe.zremrangebyrank(prefix_key(prefix), 0, -(PREFIX_CAP + 1))
+        pipe.delete(user_prefixes_key(user.pk))
+        if new:
+            pipe.sadd(user_prefixes_key(user.pk), *new)
+        pipe.execute()
+
+    @staticmethod
+    def remove(user_id: int) -> None:
+        old = REDIS.smembers(user_prefixes_key(user_id))
+        pipe = REDIS.pipeline(transaction=True)
+        for prefix in old:
+            pipe.zrem(prefix_key(prefix.decode()), user_id)
+        pipe.delete(user_prefixes_key(user_id))
+        pipe.execute()
+
+    @staticmethod
+    def lookup(prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> list:
+        return [int(uid) for uid in REDIS.zrevrange(prefix_key(prefix), 0, limit - 1)]
+
+
+def is_prefix_query(query: str) -> bool:
+    return len(query) <= PREFIX_MAX_LEN and " " not in query
+
+
+def trigram_search(query: str):
+    """Active users whose search_text contains or closely resembles `query`, best first."""
+    return (
+        User.objects.filter(is_active=True)
+        .filter(Q(search_text__contains=query) | Q(search_text__trigram_word_similar=query))
+        .annotate(rank=TrigramWordSimilarity(query, "search_text"))
+        .order_by("-rank", "user_id")
+    )
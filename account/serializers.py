@@ -2,34 +2,115 @@ from account.models import UserAuth, MakeYourProfilePop
 from rest_framework import serializers
 from django.contrib.auth.hashers import make_password
 from django.utils import timezone
-from .utils import generate_username, send_otp_email, generate_tokens_for_user, generate_otp, get_otp_expiry
+from .utils import generate_username, send_otp_email, generate_tokens_for_user
 from .models import UserLike
+from .relationships import RelationshipContext
+from .distance import distances_km, DEFAULT_DISTANCE_MODE
+from .authentication import revoke_tokens
+from .images import derivative_url
+from .location import MAX_LATITUDE
+from .utils import validate_image
+from .otp import (
+    OTPStore, OTPThrottled, OTP_VALID, OTP_LOCKED,
+    PURPOSE_REGISTRATION, PURPOSE_PASSWORD_RESET,
+)
 from django.contrib.auth import get_user_model
 User = get_user_model()
 from django.conf import settings
+from core.fieldsets import SparseFieldsMixin
+
+
+class RelationshipContextMixin:
+    """
+    Relationship lookups for user serializers.
+
+    Uses context["relationships"] when the view loaded it for the page,
+    otherwise builds it once for the whole instance list on first use.
+    """
+
+    def relationships(self) -> RelationshipContext:
+        ctx = self.context.get("relationships")
+        if ctx is not None:
+            return ctx
+        if hasattr(self, "_cached_relationships"):
+            return self._cached_relationships
+
+        request = self.context.get("request")
+        instance = self.instance
+        users = instance if hasattr(instance, "__iter__") else [instance]
+        user_ids = [u.pk for u in users] if instance is not None else []
+
+        self._cached_relationships = RelationshipContext.load(
+            getattr(request, "user", None), user_ids
+        )
+        return self._cached_relationships
+
+
+class DistanceContextMixin:
+    """
+    Viewer -> user distances for list serializers, computed once per page.
+
+    Uses context["distances"] when the view already has them, otherwise
+    measures the whole instance list in one pass on first use;
+    context["distance_mode"] picks the display mode (see account.distance).
+    """
+
+    def distances(self) -> dict:
+        ctx = self.context.get("distances")
+        if ctx is not None:
+            return ctx
+        if hasattr(self, "_cached_distances"):
+            return self._cached_distances
+
+        request = self.context.get("request")
+        instance = self.instance
+        users = instance if hasattr(instance, "__iter__") else [instance]
+
+        self._cached_distances = distances_km(
+            getattr(request, "user", None),
+            users if instance is not None else [],
+            self.context.get("distance_mode", DEFAULT_DISTANCE_MODE),
+        )
+        return self._cached_distances
 
 
 # profile pop up image serializer
 class MakeYourProfilePopSerializer(serializers.ModelSerializer):
+    # FileField, not ImageField: the upload is checked by its header only and
+    # decoded later by the derivative task. Input only: the original keeps its
+    # EXIF, responses carry the rendition in image_url
+    image = serializers.FileField(validators=[validate_image], write_only=True)
     image_url = serializers.SerializerMethodField()
+    dimensions = serializers.SerializerMethodField()
 
     class Meta:
         model = MakeYourProfilePop
-        fields = ["id", "user", "image", "image_url", "created_at", "updated_at"]
+        fields = ["id", "user", "image", "image_url", "dimensions", "created_at", "updated_at"]
         read_only_fields = ["id", "user", "created_at", "updated_at"]
 
     def get_image_url(self, obj):
-        request = self.context.get("request")
-        return request.build_absolute_uri(obj.image.url) if request else obj.image.url
+        # ?image_size=thumb|card|full, ?image_format=webp|jpeg
+        return derivative_url(obj.image, obj.variants, self.context.get("request"), default_size="card")
 
-    def validate(self, attrs):
-        user = self.context["request"].user
-        if self.instance is None and user.pop_images.count() >= 7:
-            raise serializers.ValidationError("You can upload a maximum of 7 pop-up images.")
-        return attrs
+    def get_dimensions(self, obj):
+        variants = obj.variants or {}
+        if "width" not in variants:
+            return None
+        return {"width": variants["width"], "height": variants["height"]}
+    # the MAX_POP_IMAGES limit is enforced once per batch by PopImageListCreateAPIView
+
+
+class PopImageReorderSerializer(serializers.Serializer):
+    order = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
 
-class UserSerializer(serializers.ModelSerializer):
+    def validate_order(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("Duplicate image ids.")
+        return value
+
+class UserSerializer(SparseFieldsMixin, RelationshipContextMixin, serializers.ModelSerializer):
     pop_images = MakeYourProfilePopSerializer(many=True, read_only=True)
+    profile_pic = serializers.SerializerMethodField()  # the rendition, never the original upload
     profile_pic_url = serializers.SerializerMethodField()
     height = serializers.SerializerMethodField()
     height_inches_total = serializers.SerializerMethodField()
@@ -93,6 +174,26 @@ class UserSerializer(serializers.ModelSerializer):
             "is_liked_profile",
         ]
 
+        # ?view=card|full or ?fields=... (core.fieldsets)
+        views = {
+            "card": [
+                "user_id", "username", "full_name", "profile_pic_url", "age",
+                "location", "is_verified", "is_online",
+            ],
+            "full": None,
+        }
+        field_columns = {
+            "profile_pic": ("profile_pic", "profile_pic_variants"),
+            "profile_pic_url": ("profile_pic", "profile_pic_variants"),
+            "height": ("height_feet", "height_inches"),
+            "height_inches_total": ("height_feet", "height_inches"),
+            "age": ("dob",),
+            "geo": ("latitude", "longitude"),
+            "profile_link": ("username",),
+            "pop_images": (),
+            "is_liked_profile": (),
+        }
+
         read_only_fields = [
             "user_id",
             "is_active",
@@ -106,13 +207,15 @@ class UserSerializer(serializers.ModelSerializer):
             "geo",
         ]
 
+    def get_profile_pic(self, obj):
+        return derivative_url(obj.profile_pic, obj.profile_pic_variants, self.context.get("request"), default_size="full")
+
     def get_profile_pic_url(self, obj):
-        if obj.profile_pic:
-            request = self.context.get("request")
-            if request:
-                return request.build_absolute_uri(obj.profile_pic.url)
-            return f"{settings.SITE_BASE_URL}{obj.profile_pic.url}"
-        return None
+        request = self.context.get("request")
+        url = derivative_url(obj.profile_pic, obj.profile_pic_variants, request, default_size="full")
+        if url is None or request:
+            return url
+        return f"{settings.SITE_BASE_URL}{url}"
 
     def get_height(self, obj):
         if obj.height_feet or obj.height_inches:
@@ -131,7 +234,7 @@ class UserSerializer(serializers.ModelSerializer):
         if request.user.pk == obj.pk:
             return False
 
-        return UserLike.objects.filter(user_from=request.user, user_to=obj).exists()
+        return self.relationships().is_liked(obj.pk)
 
         
 class SignupSerialzier(serializers.Serializer):
@@ -156,42 +259,50 @@ class SignupSerialzier(serializers.Serializer):
 
         user = User(**validated_data)
         user.password = make_password(password)
-
-        # Generate OTP
-        user.otp = generate_otp()
-        user.otp_expired = get_otp_expiry()
         user.save()
 
         # Send OTP via email/SMS
-        message = f"Your verification code is {user.otp}. It expires in 30 minutes."
+        try:
+            otp = OTPStore.issue(PURPOSE_REGISTRATION, user.email)
+        except OTPThrottled:
+            # a code for this address went out moments ago; the user can resend
+            return user
+        message = f"Your verification code is {otp}. It expires in 30 minutes."
         send_otp_email(user.email, message)
 
         return user
+
+
+def check_otp(purpose: str, email: str, otp: str) -> None:
+    """Raise a ValidationError unless `otp` is the pending code for (purpose, email)."""
+    result = OTPStore.verify(purpose, email, otp)
+    if result == OTP_LOCKED:
+        raise serializers.ValidationError({"otp": "Too many attempts. Please request a new OTP."})
+    if result != OTP_VALID:
+        raise serializers.ValidationError({"otp": "Invalid or expired OTP."})
     
     
 class VerifyOTPSerializer(serializers.Serializer):
+    email = serializers.EmailField(required=True)
     otp = serializers.CharField(max_length=6, write_only=True)
 
     def validate(self, data):
-        try:
-            user = User.objects.get(otp=data["otp"], otp_expired__gte=timezone.now())
-        except User.DoesNotExist:
+        user = User.objects.by_email(data["email"]).first()
+        if user is None:
             raise serializers.ValidationError({"otp": "Invalid or expired OTP."})
 
         if user.is_verified:
             raise serializers.ValidationError({"otp": "User already verified."})
 
+        check_otp(PURPOSE_REGISTRATION, data["email"], data["otp"])
+
         data["user"] = user
         return data
 
     def save(self, **kwargs):
         user = self.validated_data["user"]
-        from django.db import transaction
-        with transaction.atomic():
-            user.is_verified = True
-            user.otp = None
-            user.otp_expired = None
-            user.save(update_fields=["is_verified", "otp", "otp_expired"])
+        user.is_verified = True
+        user.save(update_fields=["is_verified"])
         return user
     
     
@@ -215,12 +326,13 @@ class ResendVerifyOTPSerializer(serializers.Serializer):
         user = self.validated_data["user"]
 
         # Generate new OTP
-        user.otp = generate_otp()
-        user.otp_expired = get_otp_expiry()
-        user.save(update_fields=["otp", "otp_expired"])
+        try:
+            otp = OTPStore.issue(PURPOSE_REGISTRATION, user.email)
+        except OTPThrottled as exc:
+            raise serializers.ValidationError({"email": str(exc)})
 
         # Send SMS
-        message = f"Your new verification code is {user.otp}. It expires in 30 minutes."
+        message = f"Your new verification code is {otp}. It expires in 30 minutes."
         send_otp_email(user.email, message)
 
         return user
@@ -240,7 +352,7 @@ class LoginSerializer(serializers.Serializer):
                 "password": "Password is required."
             })
 
-        user = User.objects.filter(email__iexact=email).first()
+        user = User.objects.by_email(email).first()
         if not user or not user.check_password(password):
             raise serializers.ValidationError({"detail": "Invalid credentials."})
 
@@ -257,7 +369,7 @@ class ForgetPasswordSerializer(serializers.Serializer):
 
     def validate_email(self, value):
         try:
-            user = User.objects.only('email', 'otp', 'otp_expired').get(email=value)
+            user = User.objects.only('user_id', 'email').get(email=value)
         except User.DoesNotExist:
             raise serializers.ValidationError("user account not found.")
 
@@ -266,31 +378,30 @@ class ForgetPasswordSerializer(serializers.Serializer):
 
     def save(self):
         user = self.context['user']
-        user.set_otp()
-        user.save(update_fields=['otp', 'otp_expired'])
-        send_otp_email(user.email, user.otp)
+        try:
+            otp = OTPStore.issue(PURPOSE_PASSWORD_RESET, user.email)
+        except OTPThrottled as exc:
+            raise serializers.ValidationError({"email": str(exc)})
+        send_otp_email(user.email, otp)
         return user
 
 
 class VerifyForgetPasswordOTPSerializer(serializers.Serializer):
+    email = serializers.EmailField(required=True)
     otp = serializers.CharField(max_length=6, write_only=True)
 
-    def validate_otp(self, value):
-        try:
-            user = User.objects.only(
-                'user_id', 'email', 'otp', 'otp_expired', 'is_verified'
-            ).get(otp=value)
-        except User.DoesNotExist:
-            raise serializers.ValidationError("Invalid or expired OTP.")
+    def validate(self, attrs):
+        user = User.objects.only('user_id', 'email', 'is_verified').by_email(attrs["email"]).first()
+        if user is None:
+            raise serializers.ValidationError({"otp": "Invalid or expired OTP."})
 
         if not user.is_verified:
-            raise serializers.ValidationError("user account is not verified. Please, verify your email first.")
+            raise serializers.ValidationError({"otp": "user account is not verified. Please, verify your email first."})
 
-        if user.otp_expired is None or user.otp_expired < timezone.now():
-            raise serializers.ValidationError("OTP has expired.")
+        check_otp(PURPOSE_PASSWORD_RESET, attrs["email"], attrs["otp"])
 
         self.context['user'] = user
-        return value
+        return attrs
 
     def create_access_token(self):
         user = self.context['user']
@@ -333,7 +444,20 @@ class ResetPasswordSerializer(serializers.Serializer):
         user = self.validated_data["user"]
         user.set_password(self.validated_data["new_password"])
         user.save(update_fields=["password"])
+        # sign out every device holding a token issued with the old password
+        revoke_tokens(user)
         return user
+
+
+# location ingest serializer
+class LocationUpdateSerializer(serializers.Serializer):
+    latitude = serializers.FloatField(min_value=-MAX_LATITUDE, max_value=MAX_LATITUDE)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+    recorded_at = serializers.DateTimeField(required=False)  # when the device took the fix
+
+    def validate_recorded_at(self, value):
+        # clock skew: a fix can't be newer than now
+        return min(value, timezone.now())
     
 
 # multiselect field serializer
@@ -353,6 +477,8 @@ class MultiSelectFieldSerializer(serializers.ListField):
 
 # profile update serializer
 class UserProfileUpdateSerializer(serializers.ModelSerializer):
+    # input only, like MakeYourProfilePopSerializer.image
+    profile_pic = serializers.FileField(required=False, allow_null=True, validators=[validate_image], write_only=True)
     brings = MultiSelectFieldSerializer(required=False)
     that = MultiSelectFieldSerializer(required=False)
     looking_for = MultiSelectFieldSerializer(required=False)
@@ -395,12 +521,21 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
 
 
 # who liked user serializer
-class WhoLikedUserSerializer(serializers.ModelSerializer):
+class WhoLikedUserSerializer(SparseFieldsMixin, RelationshipContextMixin, DistanceContextMixin, serializers.ModelSerializer):
     profile_pic = serializers.SerializerMethodField()
     distance = serializers.SerializerMethodField()
+    relationship = serializers.SerializerMethodField()
     class Meta:
         model = UserAuth
-        fields = ["user_id", "username", "full_name", "is_online", "profile_pic", "hobbies", 'distance']
+        fields = ["user_id", "username", "full_name", "is_online", "profile_pic", "hobbies", 'distance', "relationship"]
+        # rows come from ProfileCardCache, so only the serialized keys are trimmed
+        views = {
+            "card": ["user_id", "username", "full_name", "is_online", "profile_pic"],
+            "full": None,
+        }
+
+    def get_relationship(self, obj):
+        return self.relationships().as_dict(obj.pk)
 
     def get_profile_pic(self, obj):
 
@@ -411,22 +546,14 @@ class WhoLikedUserSerializer(serializers.ModelSerializer):
         if not pic:
             return None
         try:
-            url = pic.url
+            # list rows get the thumbnail rendition unless ?image_size says otherwise
+            return derivative_url(pic, obj.profile_pic_variants, request, default_size="thumb")
         except Exception:
             # File may not exist on storage
             return None
-        if request is None:
-        # relative URL
-            return url
-        return request.build_absolute_uri(url)
 
     def get_distance(self, obj):
-        dm = getattr(obj, "distance_m", None)
-        if dm is None:
-            return None
-
-        # GeoDjango returns a Distance object
-        return round(float(dm.km), 1)  # km
+        return self.distances().get(obj.pk)  # km
 
 # google serializer for google login
 from .utils import validate_google_token
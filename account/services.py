@@ -1,13 +1,68 @@
 from django.db import transaction
 from django.core.exceptions import ObjectDoesNotExist
-from .models import UserAuth as User, UserLike
+from .models import UserAuth as User, UserLike, Match
 import logging
 from django.contrib.gis.db.models.functions import Distance
 from django.contrib.gis.measure import D
 from django.contrib.gis.geos import Point
-from django.db.models import Subquery
+from django.db.models import F, Q, Subquery
+from django.utils import timezone
+from django_redis import get_redis_connection
+from mutual_system.services import BlockGraph, create_notification
+from .recommendations import RecommendationQueue
 logger = logging.getLogger(__name__)
 
+REDIS = get_redis_connection("default")
+
+
+class LikerIndex:
+    """
+    `likers:{user_id}`: sorted set of the users who liked `user_id`, scored by
+    like time. Written through from like/unlike and account deletion; rebuilt
+    from UserLike when its size disagrees with the user's likes_received_count
+    (cold cache, eviction), which also writes the recount back to the counter.
+    """
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"likers:{user_id}"
+
+    @staticmethod
+    def add(user_id: int, liker_id: int, liked_at) -> None:
+        REDIS.zadd(LikerIndex.key(user_id), {liker_id: liked_at.timestamp()})
+
+    @staticmethod
+    def remove(user_id: int, liker_id: int) -> None:
+        REDIS.zrem(LikerIndex.key(user_id), liker_id)
+
+    @staticmethod
+    def rebuild(user_id: int) -> int:
+        likers = {
+            liker_id: liked_at.timestamp()
+            for liker_id, liked_at in UserLike.objects.filter(user_to_id=user_id)
+            .values_list("user_from_id", "created_at")
+        }
+        key = LikerIndex.key(user_id)
+        pipe = REDIS.pipeline(transaction=True)
+        pipe.delete(key)
+        if likers:
+            pipe.zadd(key, likers)
+        pipe.execute()
+        # a drifted counter would otherwise force a rebuild on every request
+        User.objects.filter(pk=user_id).exclude(likes_received_count=len(likers)).update(
+            likes_received_count=len(likers)
+        )
+        return len(likers)
+
+    @staticmethod
+    def page(user: User, offset: int, limit: int) -> list:
+        """Liker ids, newest like first."""
+        key = LikerIndex.key(user.user_id)
+        if REDIS.zcard(key) != user.likes_received_count:
+            user.likes_received_count = LikerIndex.rebuild(user.user_id)
+        return [int(uid) for uid in REDIS.zrevrange(key, offset, offset + limit - 1)]
+
+
 class UserLikeService:
     @staticmethod
     @transaction.atomic
@@ -20,10 +75,32 @@ class UserLikeService:
         except User.DoesNotExist:
             raise ValueError("User not found.")
 
+        if BlockGraph.is_blocked(user_from, user_to):
+            raise ValueError("User not found.")
+
+        # lock both users in pk order: two reciprocal likes serialize here,
+        # so exactly one of them sees the other and creates the match
+        list(
+            User.objects.select_for_update()
+            .filter(user_id__in=[user_from.user_id, user_to.user_id])
+            .order_by("user_id")
+            .values_list("user_id", flat=True)
+        )
+
         obj, created = UserLike.objects.get_or_create(user_from=user_from, user_to=user_to)
         if not created:
             raise ValueError("You have already liked this user.")
 
+        User.objects.filter(pk=user_from.pk).update(likes_given_count=F("likes_given_count") + 1)
+        User.objects.filter(pk=user_to.pk).update(likes_received_count=F("likes_received_count") + 1)
+        transaction.on_commit(lambda: LikerIndex.add(user_to.user_id, user_from.user_id, obj.created_at))
+
+        if UserLike.objects.filter(user_from=user_to, user_to=user_from).exists():
+            MatchService.create_match(user_from, user_to)
+
+        # liked users never come back through the recommendation queue
+        transaction.on_commit(lambda: RecommendationQueue.remove(user_from.user_id, [user_to.user_id]))
+
         return obj
 
     @staticmethod
@@ -35,6 +112,44 @@ class UserLikeService:
         except UserLike.DoesNotExist:
             raise ValueError("You haven't liked this user.")
 
+        User.objects.filter(pk=user_from.pk, likes_given_count__gt=0).update(
+            likes_given_count=F("likes_given_count") - 1
+        )
+        User.objects.filter(pk=user_to_id, likes_received_count__gt=0).update(
+            likes_received_count=F("likes_received_count") - 1
+        )
+        transaction.on_commit(lambda: LikerIndex.remove(int(user_to_id), user_from.user_id))
+
+        MatchService.remove_match(user_from.user_id, user_to_id)
+
+    @staticmethod
+    def forget_user(user_id: int) -> None:
+        """
+        Undo a deleted account's likes on the other side: the UserLike rows
+        cascade away without going through unlike_user, so the counters and
+        likers sets of the people involved are fixed here, before the delete.
+        """
+        liked_ids = list(UserLike.objects.filter(user_from_id=user_id).values_list("user_to_id", flat=True))
+        liker_ids = list(UserLike.objects.filter(user_to_id=user_id).values_list("user_from_id", flat=True))
+
+        if liked_ids:
+            User.objects.filter(pk__in=liked_ids, likes_received_count__gt=0).update(
+                likes_received_count=F("likes_received_count") - 1
+            )
+        if liker_ids:
+            User.objects.filter(pk__in=liker_ids, likes_given_count__gt=0).update(
+                likes_given_count=F("likes_given_count") - 1
+            )
+
+        def drop_from_indexes():
+            pipe = REDIS.pipeline(transaction=False)
+            for liked_id in liked_ids:
+                pipe.zrem(LikerIndex.key(liked_id), user_id)
+            pipe.delete(LikerIndex.key(user_id))
+            pipe.execute()
+
+        transaction.on_commit(drop_from_indexes)
+
     # @staticmethod
     # def who_liked_user(user_id: int):
     #     qs = (
@@ -49,6 +164,7 @@ class UserLikeService:
     def who_liked_user(user, radius_km=None):
         liker_ids = UserLike.objects.filter(user_to=user).values("user_from_id")
         qs = User.objects.filter(user_id__in=Subquery(liker_ids)).distinct()
+        qs = BlockGraph.exclude_from(user, qs)
 
         # If current user has no location: can't compute distances, return list
         if user.latitude is None or user.longitude is None:
@@ -66,4 +182,42 @@ class UserLikeService:
         if radius_km:
             qs = qs.filter(geo_location__distance_lte=(user_point, D(km=radius_km)))
 
-        return qs.order_by("distance_m")  # nulls first/last depends; acceptable
\ No newline at end of file
+        return qs.order_by("distance_m")  # nulls first/last depends; acceptable
+
+
+class MatchService:
+    @staticmethod
+    def create_match(user_a: User, user_b: User) -> bool:
+        """
+        Store the match for both sides. Callers hold row locks on both users,
+        so the existence check cannot race. Notifies once per new match.
+        """
+        if Match.objects.filter(user=user_a, matched_user=user_b).exists():
+            return False
+
+        now = timezone.now()
+        Match.objects.bulk_create([
+            Match(user=user_a, matched_user=user_b, created_at=now),
+            Match(user=user_b, matched_user=user_a, created_at=now),
+        ], ignore_conflicts=True)
+
+        def notify():
+            for recipient, other in ((user_a, user_b), (user_b, user_a)):
+                create_notification(
+                    recipient=recipient,
+                    sender=other,
+                    type="MATCH",
+                    message=f"You and {other.username} liked each other.",
+                    metadata={"matched_user_id": other.user_id},
+                )
+
+        transaction.on_commit(notify)
+        return True
+
+    @staticmethod
+    def remove_match(user_a_id: int, user_b_id: int) -> int:
+        deleted, _ = Match.objects.filter(
+            Q(user_id=user_a_id, matched_user_id=user_b_id)
+            | Q(user_id=user_b_id, matched_user_id=user_a_id)
+        ).delete()
+        return deleted
@@ -0,0 +1,116 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .authentication import PrincipalCache, PRINCIPAL_FIELDS
+from .cards import CARD_FIELDS, ProfileCardCache
+from .filters import bump_filter_version
+from .images import (
+    DEFAULT_PROFILE_PIC, delete_derivative_dir, delete_derivatives, is_current, schedule_derivatives,
+)
+from .models import MakeYourProfilePop, UserAuth, touch_profile
+from .recommendations import RecommendationQueue, RECOMMENDATION_FIELDS
+from .search import PrefixIndex, SEARCH_FIELDS
+from .services import UserLikeService
+
+# the viewer's own columns that cached filter windows depend on: the point
+# max_distance is measured from, and the preferences ?sort=compatibility scores
+FILTER_VIEWER_FIELDS = {
+    "latitude", "longitude", "geo_location",
+    "brings", "that", "looking_for", "interests", "hobbies", "lifestyle", "professional_field",
+    "gender", "distance",
+}
+
+
+@receiver(post_save, sender=UserAuth)
+def refresh_recommendations_on_profile_change(sender, instance: UserAuth, created: bool, update_fields=None, **kwargs):
+    # targeted saves (last_login, otp, ...) don't change who the user should see
+    if update_fields is not None and not RECOMMENDATION_FIELDS.intersection(update_fields):
+        return
+    if not instance.is_active:
+        return
+    RecommendationQueue.schedule_refresh(instance.pk)
+
+
+@receiver(post_save, sender=UserAuth)
+def invalidate_filter_cache_on_viewer_change(sender, instance: UserAuth, created: bool, update_fields=None, **kwargs):
+    # cached filter windows are relative to the viewer's own point and preferences
+    if created or (update_fields is not None and not FILTER_VIEWER_FIELDS.intersection(update_fields)):
+        return
+    bump_filter_version(instance.pk)
+
+
+@receiver(post_save, sender=UserAuth)
+def reindex_search_on_profile_change(sender, instance: UserAuth, created: bool, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    transaction.on_commit(lambda: PrefixIndex.index(instance))
+
+
+@receiver(post_save, sender=UserAuth)
+def invalidate_principal_on_change(sender, instance: UserAuth, created: bool, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not set(PRINCIPAL_FIELDS).intersection(update_fields)):
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: PrincipalCache.invalidate(user_id))
+
+
+@receiver(post_save, sender=UserAuth)
+def invalidate_profile_card_on_change(sender, instance: UserAuth, created: bool, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not set(CARD_FIELDS).intersection(update_fields)):
+        return
+    ProfileCardCache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=UserAuth)
+def render_profile_pic_on_change(sender, instance: UserAuth, created: bool, update_fields=None, **kwargs):
+    if update_fields is not None and "profile_pic" not in update_fields:
+        return
+    pic = instance.profile_pic
+    # the shared default picture is served as is
+    if not pic or pic.name == DEFAULT_PROFILE_PIC:
+        return
+    if not is_current(instance.profile_pic_variants, pic):
+        schedule_derivatives("profile_pic", instance.pk)
+
+
+@receiver(post_save, sender=MakeYourProfilePop)
+def render_pop_image_on_change(sender, instance: MakeYourProfilePop, created: bool, **kwargs):
+    if instance.image and not is_current(instance.variants, instance.image):
+        schedule_derivatives("pop_image", instance.pk)
+    touch_profile(instance.user_id)
+    ProfileCardCache.invalidate(instance.user_id)
+
+
+@receiver(post_delete, sender=MakeYourProfilePop)
+def delete_pop_image_derivatives(sender, instance: MakeYourProfilePop, **kwargs):
+    variants = instance.variants
+    transaction.on_commit(lambda: delete_derivatives(variants))
+    touch_profile(instance.user_id)
+    ProfileCardCache.invalidate(instance.user_id)
+
+
+@receiver(pre_delete, sender=UserAuth)
+def release_likes_on_delete(sender, instance: UserAuth, **kwargs):
+    # must run while the UserLike rows still exist; the cascade skips unlike_user
+    UserLikeService.forget_user(instance.pk)
+
+
+@receiver(post_delete, sender=UserAuth)
+def invalidate_principal_on_delete(sender, instance: UserAuth, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: PrincipalCache.invalidate(user_id))
+    ProfileCardCache.invalidate(user_id)
+
+
+@receiver(post_delete, sender=UserAuth)
+def delete_profile_pic_derivatives(sender, instance: UserAuth, **kwargs):
+    # the renditions live under the user's pk, so no need to load the variants
+    user_id = instance.pk
+    transaction.on_commit(lambda: delete_derivative_dir("profile_pic", user_id))
+
+
+@receiver(post_delete, sender=UserAuth)
+def remove_from_search_on_delete(sender, instance: UserAuth, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: PrefixIndex.remove(user_id))
@@ -0,0 +1,213 @@
+# account/social_auth.py
+"""
+Social login token verification.
+
+Google ID tokens are verified locally: the RS256 signature is checked against
+Google's published JWKS, and iss / aud / exp are checked too. The key set is
+kept in memory and on disk (GOOGLE_JWKS_CACHE_PATH) and refreshed by a Celery
+beat task, so a login only reaches Google when it sees a `kid` that is not
+cached yet. Tests can pass a GoogleKeySet built from fixture keys.
+
+Facebook has no offline verification. Those calls share one pooled
+requests.Session with strict timeouts.
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import jwt
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+FACEBOOK_ME_URL = "https://graph.facebook.com/me"
+
+HTTP_TIMEOUT = (3.05, 5)            # (connect, read) seconds
+JWKS_DEFAULT_MAX_AGE = 60 * 60      # when Google sends no Cache-Control
+JWKS_MIN_FETCH_INTERVAL = 60        # unknown kids can't trigger a fetch storm
+TOKEN_LEEWAY_SECONDS = 30
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    """Process-wide pooled session (keep-alive, bounded retries on connect errors)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                retry = Retry(total=2, connect=2, read=0, backoff_factor=0.2, allowed_methods=["GET"])
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def _max_age(cache_control: str) -> int:
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return int(match.group(1)) if match else JWKS_DEFAULT_MAX_AGE
+
+
+class GoogleKeySet:
+    """Google's signing keys by `kid`, cached in memory and on disk."""
+
+    def __init__(self, jwks: Optional[dict] = None, expires_at: float = float("inf"), cache_path=None):
+        self.cache_path = cache_path
+        self.refreshable = jwks is None
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._expires_at = 0.0
+        self._last_fetch = 0.0
+        if jwks is not None:
+            self._load(jwks, expires_at)
+
+    @classmethod
+    def from_jwks(cls, jwks: dict) -> "GoogleKeySet":
+        """Static key set that never refreshes, e.g. for tests with fixture keys."""
+        return cls(jwks)
+
+    def _load(self, jwks: dict, expires_at: float) -> None:
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            try:
+                keys[jwk["kid"]] = jwt.PyJWK(jwk).key
+            except (KeyError, jwt.PyJWTError):
+                logger.warning("Skipping unusable Google JWK %s", jwk.get("kid"))
+        self._keys = keys
+        self._expires_at = expires_at
+
+    def _load_from_disk(self) -> bool:
+        if not self.cache_path:
+            return False
+        try:
+            with open(self.cache_path) as fh:
+                cached = json.load(fh)
+        except (OSError, ValueError):
+            return False
+        if cached.get("expires_at", 0) <= time.time():
+            return False
+        self._load(cached["jwks"], cached["expires_at"])
+        return True
+
+    def _write_to_disk(self, jwks: dict, expires_at: float) -> None:
+        if not self.cache_path:
+            return
+        directory = os.path.dirname(self.cache_path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as fh:
+                json.dump({"jwks": jwks, "expires_at": expires_at}, fh)
+            os.replace(tmp_path, self.cache_path)  # readers never see a partial file
+        except OSError:
+            logger.warning("Could not write Google JWKS cache to %s", self.cache_path, exc_info=True)
+
+    def refresh(self) -> None:
+        """Fetch the current key set from Google and update both caches."""
+        self._last_fetch = time.time()
+        response = http_session().get(GOOGLE_CERTS_URL, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        jwks = response.json()
+        expires_at = time.time() + _max_age(response.headers.get("Cache-Control"))
+        self._load(jwks, expires_at)
+        self._write_to_disk(jwks, expires_at)
+        logger.info("Google JWKS refreshed: %s keys", len(self._keys))
+
+    def get_key(self, kid: str):
+        if not self.refreshable or (time.time() < self._expires_at and kid in self._keys):
+            return self._keys.get(kid)
+
+        with self._lock:
+            if time.time() >= self._expires_at or kid not in self._keys:
+                if not self._load_from_disk() or kid not in self._keys:
+                    if time.time() - self._last_fetch >= JWKS_MIN_FETCH_INTERVAL:
+                        try:
+                            self.refresh()
+                        except (requests.RequestException, ValueError):
+                            # keep serving the stale keys, Google rotates slowly
+                            logger.warning("Google JWKS refresh failed", exc_info=True)
+        return self._keys.get(kid)
+
+
+def _default_cache_path() -> str:
+    return getattr(settings, "GOOGLE_JWKS_CACHE_PATH", None) or os.path.join(
+        tempfile.gettempdir(), "google_jwks.json"
+    )
+
+
+_google_keys = None
+
+
+def google_key_set() -> GoogleKeySet:
+    global _google_keys
+    if _google_keys is None:
+        _google_keys = GoogleKeySet(cache_path=_default_cache_path())
+    return _google_keys
+
+
+def verify_google_id_token(token: str, key_set: Optional[GoogleKeySet] = None,
+                           audience=None) -> Optional[Dict[str, Any]]:
+    """Claims of a valid Google ID token, or None."""
+    key_set = key_set or google_key_set()
+    audience = audience if audience is not None else getattr(settings, "GOOGLE_CLIENT_IDS", None)
+    if not audience:
+        # without our client ids any app's Google token would log in: fail closed
+        logger.error("Google ID token rejected: GOOGLE_CLIENT_IDS is not configured")
+        return None
+
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = key_set.get_key(kid) if kid else None
+        if key is None:
+            logger.info("Google ID token rejected: unknown key id")
+            return None
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=["RS256"],
+            audience=list(audience),
+            issuer=GOOGLE_ISSUERS,
+            leeway=TOKEN_LEEWAY_SECONDS,
+            options={"require": ["exp", "iat", "iss", "sub", "aud"]},
+        )
+    except jwt.PyJWTError as exc:
+        logger.info("Google ID token rejected: %s", exc)
+        return None
+
+    if not claims.get("email") or claims.get("email_verified") is False:
+        return None
+    claims.setdefault("profile_pic", claims.get("picture", ""))
+    return claims
+
+
+def fetch_facebook_profile(access_token: str) -> Optional[Dict[str, Any]]:
+    """id / name / email for a Facebook access token, or None."""
+    try:
+        response = http_session().get(
+            FACEBOOK_ME_URL,
+            params={"fields": "id,name,email", "access_token": access_token},
+            timeout=HTTP_TIMEOUT,
+        )
+        data = response.json()
+    except (requests.RequestException, ValueError) as exc:
+        logger.warning("Facebook token validation failed: %s", exc)
+        return None
+
+    if "error" in data:
+        logger.info("Facebook token rejected: %s", data["error"].get("message"))
+        return None
+    return data
@@ -1,6 +1,129 @@
+import logging
+
 from celery import shared_task
-from django.core.management import call_command
+from celery.signals import worker_process_shutdown
+from django.utils import timezone
+from datetime import timedelta
+
+from .cards import ProfileCardCache
+from .images import (
+    UNREADABLE_IMAGE_ERRORS, build_derivatives, delete_derivatives, failed_derivatives, is_current,
+)
+from .models import MakeYourProfilePop, UserAuth, touch_profile
+from .location import flush_locations
+from .mailer import close_smtp_connection, deliver_due_emails, purge_old_emails
+from .social_auth import google_key_set
+from .presence import flush_last_activity, mark_expired_offline
+from .recommendations import RecommendationQueue, QUEUE_LOW_WATERMARK
+
+logger = logging.getLogger(__name__)
 
 @shared_task
 def mark_offline_task():
-    call_command("mark_offline")
\ No newline at end of file
+    return mark_expired_offline()
+
+
+@shared_task
+def flush_presence_task():
+    return flush_last_activity()
+
+
+@shared_task(ignore_result=True)
+def deliver_outbound_emails():
+    return deliver_due_emails()
+
+
+@shared_task(ignore_result=True)
+def purge_outbound_emails():
+    return purge_old_emails()
+
+
+@worker_process_shutdown.connect
+def _close_smtp_connection(**kwargs):
+    close_smtp_connection()
+
+
+@shared_task(acks_late=True, autoretry_for=(OSError,), retry_backoff=True, max_retries=3)
+def generate_image_derivatives(kind: str, pk: int):
+    """Resize/re-encode a profile_pic ("profile_pic") or pop image ("pop_image")."""
+    if kind == "profile_pic":
+        model, file_field, variants_field = UserAuth, "profile_pic", "profile_pic_variants"
+    else:
+        model, file_field, variants_field = MakeYourProfilePop, "image", "variants"
+
+    owner_field = "pk" if kind == "profile_pic" else "user_id"
+    instance = model.objects.filter(pk=pk).only("pk", owner_field, file_field, variants_field).first()
+    if instance is None:
+        return None
+    field_file = getattr(instance, file_field)
+    old_variants = getattr(instance, variants_field)
+    if not field_file or is_current(old_variants, field_file):
+        return None
+
+    try:
+        variants = build_derivatives(field_file, prefix=f"{kind}/{pk}")
+    except UNREADABLE_IMAGE_ERRORS:
+        # these are OSErrors too; record the failure instead of retrying
+        logger.warning("Undecodable %s %s: %s", kind, pk, field_file.name, exc_info=True)
+        variants = failed_derivatives(field_file)
+    # only if the original wasn't replaced meanwhile; .update() skips the save signals
+    updated = model.objects.filter(pk=pk, **{file_field: field_file.name}).update(**{variants_field: variants})
+    if updated:
+        delete_derivatives(old_variants, keep=variants)
+        touch_profile(getattr(instance, owner_field))
+        ProfileCardCache.invalidate(getattr(instance, owner_field))
+    return updated
+
+
+@shared_task
+def flush_locations_task():
+    return flush_locations()
+
+
+@shared_task
+def refresh_google_jwks_task():
+    """Keep the on-disk Google key set warm so logins never wait for Google."""
+    google_key_set().refresh()
+
+
+@shared_task
+def refresh_recommendation_queue(user_id: int):
+    user = UserAuth.objects.filter(pk=user_id, is_active=True).first()
+    if user is None:
+        return 0
+    return RecommendationQueue.build(user)
+
+
+@shared_task
+def refresh_stale_recommendation_queues(active_days: int = 7, chunk_size: int = 1000):
+    """
+    Refill the queues of recently active users that are missing or running low.
+    Users with healthy queues are skipped, so each run only touches what changed.
+    """
+    since = timezone.now() - timedelta(days=active_days)
+    user_ids = (
+        UserAuth.objects.filter(is_active=True, last_activity__gte=since)
+        .values_list("user_id", flat=True)
+        .iterator(chunk_size=chunk_size)
+    )
+
+    scheduled = 0
+    chunk = []
+    for user_id in user_ids:
+        chunk.append(user_id)
+        if len(chunk) >= chunk_size:
+            scheduled += _schedule_low_queues(chunk)
+            chunk = []
+    if chunk:
+        scheduled += _schedule_low_queues(chunk)
+
+    logger.info(f"Scheduled {scheduled} recommendation queue refreshes.")
+    return scheduled
+
+
+def _schedule_low_queues(user_ids) -> int:
+    lengths = RecommendationQueue.length(user_ids)
+    low = [user_id for user_id, size in lengths.items() if size < QUEUE_LOW_WATERMARK]
+    for user_id in low:
+        RecommendationQueue.schedule_refresh(user_id)
+    return len(low)
@@ -1,3 +1,433 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from chat.models import ChatThread
+from mutual_system.services import BlockGraph, UserBlockService
+
+from .authentication import REDIS as AUTH_REDIS, PrincipalCache, principal_key, revoke_tokens
+from .cards import REDIS as CARDS_REDIS, ProfileCardCache, card_key
+from .filters import filter_version_key
+from .images import derivative_url
+from .impressions import REDIS as IMPRESSIONS_REDIS, current_epoch, filter_key
+from .mailer import deliver_due_emails, enqueue_email, purge_old_emails
+from .models import MAX_POP_IMAGES, MakeYourProfilePop, Match, OutboundEmail, UserAuth, touch_profile
+from .otp import (
+    OTP_EXPIRED, OTP_INVALID, OTP_LOCKED, OTP_MAX_ATTEMPTS, PURPOSE_REGISTRATION,
+    OTPStore, cooldown_key, REDIS as OTP_REDIS,
+)
+from .presence import interested_peers
+from .recommendations import REDIS as RECO_REDIS, RecommendationQueue, built_key, queue_key
+from .serializers import MakeYourProfilePopSerializer, UserSerializer
+from .services import REDIS as LIKES_REDIS, LikerIndex, UserLikeService
+from .social_auth import GoogleKeySet, verify_google_id_token
+from .tasks import generate_image_derivatives
+
+
+class OutboundEmailTests(TestCase):
+    def test_batch_is_sent_and_bodies_cleared(self):
+        for i in range(3):
+            enqueue_email(f"user{i}@example.com", "Your code", "Your OTP is 123456", "noreply@example.com")
+
+        self.assertEqual(deliver_due_emails(), 3)
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].body, "Your OTP is 123456")
+        for email in OutboundEmail.objects.all():
+            self.assertEqual(email.status, OutboundEmail.STATUS_SENT)
+            self.assertEqual(email.body, "")
+
+    def test_purge_keeps_queued_and_recent_rows(self):
+        old = timezone.now() - timedelta(days=30)
+        sent = OutboundEmail.objects.create(
+            to_email="a@example.com", from_email="noreply@example.com", subject="s", body="",
+            status=OutboundEmail.STATUS_SENT,
+        )
+        queued = OutboundEmail.objects.create(
+            to_email="b@example.com", from_email="noreply@example.com", subject="s", body="b",
+        )
+        recent = OutboundEmail.objects.create(
+            to_email="c@example.com", from_email="noreply@example.com", subject="s", body="",
+            status=OutboundEmail.STATUS_FAILED,
+        )
+        # created_at is auto_now_add
+        OutboundEmail.objects.filter(pk__in=[sent.pk, queued.pk]).update(created_at=old)
+
+        self.assertEqual(purge_old_emails(), 1)
+        self.assertEqual(
+            set(OutboundEmail.objects.values_list("pk", flat=True)), {queued.pk, recent.pk}
+        )
+
+
+class GoogleIdTokenTests(TestCase):
+    CLIENT_ID = "our-app.apps.googleusercontent.com"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(cls.private_key.public_key()))
+        jwk.update(kid="test-kid", alg="RS256", use="sig")
+        cls.key_set = GoogleKeySet.from_jwks({"keys": [jwk]})
+
+    def token(self, aud):
+        now = int(timezone.now().timestamp())
+        claims = {
+            "iss": "https://accounts.google.com", "sub": "1", "aud": aud, "iat": now, "exp": now + 600,
+            "email": "someone@example.com", "email_verified": True,
+        }
+        return jwt.encode(claims, self.private_key, algorithm="RS256", headers={"kid": "test-kid"})
+
+    def verify(self, token, audience):
+        return verify_google_id_token(token, key_set=self.key_set, audience=audience)
+
+    def test_token_for_our_client_is_accepted(self):
+        claims = self.verify(self.token(self.CLIENT_ID), [self.CLIENT_ID])
+        self.assertEqual(claims["email"], "someone@example.com")
+
+    def test_token_for_another_app_is_rejected(self):
+        self.assertIsNone(self.verify(self.token("other-app"), [self.CLIENT_ID]))
+
+    def test_rejected_when_no_client_ids_are_configured(self):
+        self.assertIsNone(self.verify(self.token(self.CLIENT_ID), []))
+
+
+class ProfileConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = UserAuth.objects.create_user(email="me@example.com", password="x", username="me")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("profile-get")
+
+    def etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_unchanged_profile_is_answered_with_304(self):
+        etag = self.etag()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_targeted_save_changes_the_etag(self):
+        etag = self.etag()
+        self.user.is_verified = True
+        self.user.save(update_fields=["is_verified"])
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_touch_profile_changes_the_etag_but_not_updated_at(self):
+        etag = self.etag()
+        updated_at = UserAuth.objects.values_list("updated_at", flat=True).get(pk=self.user.pk)
+
+        touch_profile(self.user.pk)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(UserAuth.objects.values_list("updated_at", flat=True).get(pk=self.user.pk), updated_at)
+
+
+class LocationUpdateTests(TestCase):
+    def setUp(self):
+        self.user = UserAuth.objects.create_user(email="geo@example.com", password="x", username="geo")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("profile-location")
+
+    def test_latitude_outside_the_geo_range_is_rejected(self):
+        response = self.client.post(self.url, {"latitude": 89.9, "longitude": 10.0}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+
+
+class SeenProfilesTests(TestCase):
+    def setUp(self):
+        self.viewer = UserAuth.objects.create_user(email="viewer@example.com", password="x", username="viewer")
+        self.other = UserAuth.objects.create_user(email="other@example.com", password="x", username="other")
+        epoch = current_epoch()
+        IMPRESSIONS_REDIS.delete(filter_key(self.viewer.pk, epoch), filter_key(self.viewer.pk, epoch - 1))
+        BlockGraph.load(self.viewer.pk)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def feed_ids(self, **params):
+        response = self.client.get(reverse("global-feed"), params)
+        self.assertEqual(response.status_code, 200)
+        return [card["user_id"] for card in response.data["data"]["results"]]
+
+    def test_refetching_a_feed_page_returns_the_same_profiles(self):
+        self.assertEqual(self.feed_ids(), [self.other.pk])
+        self.assertEqual(self.feed_ids(), [self.other.pk])
+
+    def test_exclude_seen_skips_profiles_already_shown(self):
+        self.feed_ids()
+
+        self.assertEqual(self.feed_ids(exclude_seen="true"), [])
+
+    def test_pass_on_unknown_or_inactive_user_is_404(self):
+        self.other.is_active = False
+        self.other.save(update_fields=["is_active"])
+
+        for user_id in (self.other.pk, self.other.pk + 1000):
+            response = self.client.post(reverse("pass-user", kwargs={"user_id": user_id}))
+            self.assertEqual(response.status_code, 404)
+
+
+class PresenceAudienceTests(TestCase):
+    def test_offline_events_go_to_matches_and_chat_partners_only(self):
+        me, match, partner, blocked, stranger = [
+            UserAuth.objects.create_user(email=f"{name}@example.com", password="x", username=name)
+            for name in ("me", "match", "partner", "blocked", "stranger")
+        ]
+        BlockGraph.load(me.pk)
+        Match.objects.create(user=me, matched_user=match)
+        Match.objects.create(user=match, matched_user=me)
+        ChatThread.get_or_create_thread(me, partner)
+        ChatThread.get_or_create_thread(me, blocked)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserBlockService.block_user(me, blocked.pk)
+
+        self.assertEqual(interested_peers([me.pk]), {match.pk: [me.pk], partner.pk: [me.pk]})
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = UserAuth.objects.create_user(email="pics@example.com", password="x", username="pics")
+
+    def test_undecodable_upload_is_marked_failed_and_not_served(self):
+        # right magic bytes, garbage after them: passes validate_image, fails in Pillow
+        upload = SimpleUploadedFile("bad.png", b"\x89PNG\r\n\x1a\n" + b"not really a png" * 8)
+        pop = MakeYourProfilePop.objects.create(user=self.user, image=upload)
+
+        generate_image_derivatives("pop_image", pop.pk)
+
+        pop.refresh_from_db()
+        self.assertEqual(pop.variants, {"source": pop.image.name, "failed": True})
+        self.assertIsNone(derivative_url(pop.image, pop.variants))
+
+    def test_original_upload_is_never_serialized(self):
+        pop = MakeYourProfilePop.objects.create(user=self.user, image=png_upload())
+        self.user.profile_pic = png_upload("me.png")
+        self.user.save()
+
+        # renditions not built yet: no URL at all rather than the EXIF-carrying original
+        data = MakeYourProfilePopSerializer(pop).data
+        self.assertNotIn("image", data)
+        self.assertIsNone(data["image_url"])
+        profile = UserSerializer(self.user).data
+        self.assertIsNone(profile["profile_pic"])
+        self.assertIsNone(profile["profile_pic_url"])
+
+        generate_image_derivatives("pop_image", pop.pk)
+        pop.refresh_from_db()
+        self.assertTrue(MakeYourProfilePopSerializer(pop).data["image_url"].endswith("_card.webp"))
+
+    def test_deleting_a_user_removes_profile_pic_derivatives(self):
+        name = default_storage.save(f"derivatives/profile_pic/{self.user.pk}/pic_thumb.webp", ContentFile(b"x"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        self.assertFalse(default_storage.exists(name))
+
+
+class ProfileCardCacheTests(TestCase):
+    def setUp(self):
+        self.user = UserAuth.objects.create_user(email="card@example.com", password="x", username="card")
+        CARDS_REDIS.delete(card_key(self.user.pk))
+
+    def test_email_is_not_cached_and_only_loaded_on_request(self):
+        card = ProfileCardCache.get_many([self.user.pk], presence=False)[self.user.pk]
+
+        self.assertIn("email", card.get_deferred_fields())
+        self.assertNotIn(b"card@example.com", CARDS_REDIS.get(card_key(self.user.pk)))
+
+        with self.assertNumQueries(1):
+            card = ProfileCardCache.get_many([self.user.pk], presence=False, emails=True)[self.user.pk]
+        self.assertEqual(card.email, "card@example.com")
+
+
+class OTPLockoutTests(TestCase):
+    IDENTIFIER = "locked@example.com"
+
+    def setUp(self):
+        OTP_REDIS.delete(cooldown_key(PURPOSE_REGISTRATION, self.IDENTIFIER))
+        self.code = OTPStore.issue(PURPOSE_REGISTRATION, self.IDENTIFIER)
+        self.wrong = "000000" if self.code != "000000" else "111111"
+
+    def test_code_is_burned_after_too_many_wrong_attempts(self):
+        for _ in range(OTP_MAX_ATTEMPTS):
+            self.assertEqual(OTPStore.verify(PURPOSE_REGISTRATION, self.IDENTIFIER, self.wrong), OTP_INVALID)
+
+        self.assertEqual(OTPStore.verify(PURPOSE_REGISTRATION, self.IDENTIFIER, self.code), OTP_LOCKED)
+        # the code was consumed by the lockout, so even the right one no longer works
+        self.assertEqual(OTPStore.verify(PURPOSE_REGISTRATION, self.IDENTIFIER, self.code), OTP_EXPIRED)
+
+
+def png_upload(name="pop.png"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), "red").save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class PopImageBatchUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = UserAuth.objects.create_user(email="pops@example.com", password="x", username="pops")
+        for i in range(MAX_POP_IMAGES - 2):
+            MakeYourProfilePop.objects.create(user=self.user, image=png_upload(f"old{i}.png"), position=i)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("pop-image-list-create")
+
+    def upload(self, count):
+        files = [png_upload(f"new{i}.png") for i in range(count)]
+        return self.client.post(self.url, {"image": files}, format="multipart")
+
+    def test_batch_past_the_limit_is_rejected_whole(self):
+        response = self.upload(3)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(MakeYourProfilePop.objects.filter(user=self.user).count(), MAX_POP_IMAGES - 2)
+
+    def test_batch_up_to_the_limit_is_stored_in_order(self):
+        response = self.upload(2)
+
+        self.assertEqual(response.status_code, 201)
+        positions = list(MakeYourProfilePop.objects.filter(user=self.user).values_list("position", flat=True))
+        self.assertEqual(positions, list(range(MAX_POP_IMAGES)))
+
+
+class LikeCounterTests(TestCase):
+    def setUp(self):
+        self.liker = UserAuth.objects.create_user(email="liker@example.com", password="x", username="liker")
+        self.liked = UserAuth.objects.create_user(email="liked@example.com", password="x", username="liked")
+        LIKES_REDIS.delete(LikerIndex.key(self.liked.pk))
+        BlockGraph.load(self.liker.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserLikeService.like_user(self.liker, self.liked.pk)
+
+    def test_deleting_a_liker_releases_their_like(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.liker.delete()
+
+        self.liked.refresh_from_db()
+        self.assertEqual(self.liked.likes_received_count, 0)
+        self.assertEqual(LIKES_REDIS.zcard(LikerIndex.key(self.liked.pk)), 0)
+
+    def test_rebuild_writes_the_recount_back(self):
+        UserAuth.objects.filter(pk=self.liked.pk).update(likes_received_count=5)
+        self.liked.refresh_from_db()
+
+        self.assertEqual(LikerIndex.page(self.liked, 0, 20), [self.liker.pk])
+        self.assertEqual(self.liked.likes_received_count, 1)
+        self.assertEqual(UserAuth.objects.get(pk=self.liked.pk).likes_received_count, 1)
+
+
+class RecommendationQueueTests(TestCase):
+    def setUp(self):
+        self.user = UserAuth.objects.create_user(email="lonely@example.com", password="x", username="lonely")
+        RECO_REDIS.delete(queue_key(self.user.pk), built_key(self.user.pk), f"reco:refreshing:{self.user.pk}")
+        BlockGraph.load(self.user.pk)
+
+    def test_only_the_first_visit_builds_inline(self):
+        with mock.patch.object(RecommendationQueue, "build", wraps=RecommendationQueue.build) as build:
+            # nobody else exists: the queue stays empty, so Redis never creates its key
+            self.assertEqual(RecommendationQueue.pop(self.user, 10), [])
+            self.assertEqual(RecommendationQueue.pop(self.user, 10), [])
+
+        self.assertEqual(build.call_count, 1)
+
+
+
+class PrincipalCacheTests(TestCase):
+    def setUp(self):
+        self.user = UserAuth.objects.create_user(email="principal@example.com", password="x", username="principal")
+        PrincipalCache.invalidate(self.user.pk)
+
+    def test_read_racing_an_invalidation_is_not_cached(self):
+        real_mget = AUTH_REDIS.mget
+
+        def mget_then_invalidate(keys):
+            values = real_mget(keys)
+            # another request invalidates between our version read and our write-back
+            PrincipalCache.invalidate(self.user.pk)
+            return values
+
+        with mock.patch.object(AUTH_REDIS, "mget", side_effect=mget_then_invalidate):
+            self.assertIsNotNone(PrincipalCache.get(self.user.pk))
+
+        self.assertIsNone(AUTH_REDIS.get(principal_key(self.user.pk)))
+
+    def test_revocation_is_seen_by_the_next_read(self):
+        PrincipalCache.get(self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            revoke_tokens(self.user)
+
+        self.assertEqual(PrincipalCache.get(self.user.pk)["token_version"], 1)
+
+
+class FilterCacheVersionTests(TestCase):
+    def setUp(self):
+        self.user = UserAuth.objects.create_user(email="filter@example.com", password="x", username="filter")
+        cache.delete(filter_version_key(self.user.pk))
+
+    def test_preference_edit_invalidates_cached_windows(self):
+        self.user.hobbies = ["chess"]
+        self.user.save(update_fields=["hobbies"])
+
+        self.assertEqual(cache.get(filter_version_key(self.user.pk)), 1)
+
+    def test_unrelated_edit_keeps_them(self):
+        self.user.bio = "hello"
+        self.user.save(update_fields=["bio"])
+
+        self.assertIsNone(cache.get(filter_version_key(self.user.pk)))
+
+
+class ChoiceMaskTests(TestCase):
+    def test_every_looking_for_choice_can_be_encoded_and_filtered(self):
+        for n, (key, _label) in enumerate(UserAuth.LOOKING_FOR_CHOICES):
+            self.assertNotIn(",", key)
+            user = UserAuth.objects.create_user(
+                email=f"choice{n}@example.com", password="x", username=f"choice{n}", looking_for=[key],
+            )
+            user.refresh_from_db()
+            self.assertEqual(user.looking_for_mask, 1 << n)
+            self.assertTrue(UserAuth.objects.has_any_choice("looking_for", [key]).filter(pk=user.pk).exists())
@@ -3,7 +3,8 @@ from .views import (
     RegisterAPIView, VerifyOTPAPIView, ResendVerifyOTPAPIView, LoginView, ForgetPasswordView, 
     VerifyForgetPasswordOTPView, ResetPasswordView, UserProfileUpdateAPIView, 
     UserProfileAPIView, UserProfileHardDeleteAPIView, PopImageListCreateAPIView, PopImageRetrieveUpdateDeleteAPIView,
-    GlobalFeedAPIView, UserDetailsProfileAPIView, LikeUserAPIView, UnlikeUserAPIView, WhoLikedUserAPIView, UserSearchAPIView, UserFilterAPIView, GoogleLoginAPIView)
+    GlobalFeedAPIView, UserDetailsProfileAPIView, LikeUserAPIView, UnlikeUserAPIView, WhoLikedUserAPIView, UserSearchAPIView, UserFilterAPIView, GoogleLoginAPIView,
+    MatchListAPIView, PassUserAPIView, LocationUpdateAPIView, PopImageReorderAPIView)
 
 urlpatterns = [
     path("signup/", RegisterAPIView.as_view(), name="user-register"),
@@ -20,9 +21,12 @@ urlpatterns = [
     path("profile/details/", UserProfileAPIView.as_view(), name="profile-get"),
     # delete profile
     path("profile/delete/", UserProfileHardDeleteAPIView.as_view(), name="profile-delete"),
+    # location ingest
+    path("profile/location/", LocationUpdateAPIView.as_view(), name="profile-location"),
     
     # pop image urls
     path("pop-images/", PopImageListCreateAPIView.as_view(), name="pop-image-list-create"),
+    path("pop-images/reorder/", PopImageReorderAPIView.as_view(), name="pop-image-reorder"),
     path("pop-images/<int:pk>/", PopImageRetrieveUpdateDeleteAPIView.as_view(), name="pop-image-detail"),
     
     # global feed
@@ -34,7 +38,9 @@ urlpatterns = [
     #liked and unliked
     path('user/<int:user_id>/like/', LikeUserAPIView.as_view(), name='like-user'),
     path('user/<int:user_id>/unlike/', UnlikeUserAPIView.as_view(), name='unlike-user'),
+    path('user/<int:user_id>/pass/', PassUserAPIView.as_view(), name='pass-user'),
     path("who-liked-me/", WhoLikedUserAPIView.as_view(), name="who-liked-me"),
+    path("matches/", MatchListAPIView.as_view(), name="matches"),
     
     # search and filter
     path("users/search/", UserSearchAPIView.as_view(), name="user-search"),
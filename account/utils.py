@@ -1,15 +1,12 @@
 import random
+import secrets
 import string
 import logging
 import math
-from datetime import timedelta
+import unicodedata
 
-import requests
-from PIL import Image
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured, ValidationError
-from django.core.mail import send_mail, BadHeaderError
-from django.utils import timezone
 
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.response import Response
@@ -28,16 +25,11 @@ def generate_otp(length: int = 6) -> str:
     """Generate a numeric OTP of specified length."""
     range_start = 10**(length - 1)
     range_end = (10**length) - 1
-    return str(random.randint(range_start, range_end))
-
-
-def get_otp_expiry(minutes: int = 30):
-    """Return expiry timestamp for OTP."""
-    return timezone.now() + timedelta(minutes=minutes)
+    return str(range_start + secrets.randbelow(range_end - range_start + 1))
 
 
 def send_otp_email(recipient_email: str, otp: str) -> None:
-    """Send an OTP to the user's email."""
+    """Queue an OTP email; Celery delivers it (account.mailer)."""
     from_email = getattr(settings, "EMAIL_HOST_USER", None) or getattr(
         settings, "DEFAULT_FROM_EMAIL", None
     )
@@ -49,19 +41,43 @@ def send_otp_email(recipient_email: str, otp: str) -> None:
     subject = "Verify Your Email"
     message = f"Your One-Time Password (OTP) is: {otp}"
 
+    from .mailer import enqueue_email  # mailer -> models -> utils
     try:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=from_email,
-            recipient_list=[recipient_email],
-            fail_silently=False,
-        )
-        logger.info(f"OTP email sent to {recipient_email}")
-    except BadHeaderError:
-        logger.error("Invalid header found while sending email.")
+        enqueue_email(recipient_email, subject, message, from_email)
+        logger.info(f"OTP email queued for {recipient_email}")
     except Exception as e:
-        logger.exception(f"Error sending OTP email to {recipient_email}: {e}")
+        logger.exception(f"Error queueing OTP email to {recipient_email}: {e}")
+
+
+# ---------------------------
+# Choice-set Utilities
+# ---------------------------
+def encode_choices(values, choices) -> int:
+    """
+    Encode a MultiSelectField value as an integer bitmask.
+
+    Bit i is set when the i-th entry of `choices` is selected, so the order of
+    a model's *_CHOICES list is part of the encoding: only append new choices.
+    """
+    if not values:
+        return 0
+    if isinstance(values, str):
+        values = values.split(",")
+
+    selected = set(values)
+    mask = 0
+    for bit, (key, _label) in enumerate(choices):
+        if key in selected:
+            mask |= 1 << bit
+    return mask
+
+
+def normalize_search_text(*parts) -> str:
+    """Lowercase, accent-free, single-spaced text for the people-search index."""
+    text = " ".join(str(p) for p in parts if p)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
 
 
 # ---------------------------
@@ -70,23 +86,47 @@ def send_otp_email(recipient_email: str, otp: str) -> None:
 def generate_tokens_for_user(user) -> Dict[str, str]:
     """Generates access and refresh tokens for a user."""
     refresh = RefreshToken.for_user(user)
+    # copied into the access token; see account.authentication.revoke_tokens
+    refresh["ver"] = user.token_version
     return {"access": str(refresh.access_token), "refresh": str(refresh)}
 
 
 # ---------------------------
 # Image Utilities
 # ---------------------------
+# leading bytes of the formats accepted for upload
+IMAGE_SIGNATURES = {
+    "JPEG": (b"\xff\xd8\xff",),
+    "PNG": (b"\x89PNG\r\n\x1a\n",),
+    "GIF": (b"GIF87a", b"GIF89a"),
+}
+
+
+def sniff_image_format(image) -> Optional[str]:
+    """Format name from the file's magic bytes, without decoding anything."""
+    position = image.tell() if hasattr(image, "tell") else 0
+    image.seek(0)
+    head = image.read(16)
+    image.seek(position)
+    for fmt, signatures in IMAGE_SIGNATURES.items():
+        if head.startswith(signatures):
+            return fmt
+    return None
+
+
 def validate_image(image) -> None:
-    """Validate image size and format."""
+    """
+    Validate image size and format from the header only; decoding, resizing and
+    EXIF stripping happen later in Celery (account.images).
+    """
     if image:
         max_size = 3 * 1024 * 1024  # 3MB
-        allowed_formats = ["JPEG", "PNG", "GIF"]
+        allowed_formats = list(IMAGE_SIGNATURES)
         if image.size > max_size:
             raise ValidationError("Image file too large (max 3MB).")
-        img = Image.open(image)
-        if img.format not in allowed_formats:
+        if sniff_image_format(image) is None:
             raise ValidationError(
-                f"Unsupported image format: {img.format}. "
+                f"Unsupported image format. "
                 f"Allowed formats: {allowed_formats}"
             )
 
@@ -107,33 +147,14 @@ def generate_username(email: str) -> str:
 # ---------------------------
 def validate_facebook_token(access_token: str) -> Optional[Dict[str, Any]]:
     """Validate Facebook access token and return user info."""
-    try:
-        url = f"https://graph.facebook.com/me?fields=id,name,email&access_token={access_token}"
-        response = requests.get(url)
-        data = response.json()
-        print("Facebook response:", data)
-        if "error" in data:
-            return None
-        return data
-    except Exception as e:
-        print("Facebook token validation failed:", str(e))
-        return None
+    from .social_auth import fetch_facebook_profile
+    return fetch_facebook_profile(access_token)
 
 
-def validate_google_token(id_token: str) -> Optional[Dict[str, Any]]:
-    """Validate Google ID token and return user info."""
-    try:
-        response = requests.get(
-            f"https://www.googleapis.com/oauth2/v3/tokeninfo?id_token={id_token}"
-        )
-        data = response.json()
-        print("Google response:", data)
-        if "error_description" in data or "email" not in data:
-            return None
-        return data
-    except Exception as e:
-        print("Google token validation failed:", str(e))
-        return None
+def validate_google_token(id_token: str, key_set=None) -> Optional[Dict[str, Any]]:
+    """Verify a Google ID token offline (cached JWKS) and return its claims."""
+    from .social_auth import verify_google_id_token
+    return verify_google_id_token(id_token, key_set=key_set)
 
 
 #distance calculation using Haversine formula
@@ -4,10 +4,10 @@ from typing import Dict
 # Django
 from django.shortcuts import render, get_object_or_404
 from django.core.cache import cache
-from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.db.models import Q, Prefetch
+from django.db.models import Q
 from django.contrib.auth import get_user_model
+from redis.exceptions import ResponseError
 from django.db.models import Q
 from datetime import date
 
@@ -19,6 +19,7 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 
 # Local
 from .serializers import (
@@ -29,9 +30,11 @@ from .serializers import (
     ForgetPasswordSerializer,
     VerifyForgetPasswordOTPSerializer,
     ResetPasswordSerializer,
-    UserSerializer, UserProfileUpdateSerializer, WhoLikedUserSerializer, GoogleAuthSerializer
+    UserSerializer, UserProfileUpdateSerializer, WhoLikedUserSerializer, GoogleAuthSerializer,
+    LocationUpdateSerializer,
 )
 from account.utils import generate_tokens_for_user
+from .location import ingest as ingest_location
 
 
 logger = logging.getLogger(__name__)
@@ -229,17 +232,70 @@ class UserProfileUpdateAPIView(APIView):
             },
             status=status.HTTP_200_OK,
         )
+
+
+# location ingest: buffered in Redis, flushed to the users table by Celery
+class LocationUpdateAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = LocationUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return ResponseHandler.bad_request(message="Invalid location.", errors=serializer.errors)
+
+        try:
+            data = serializer.validated_data
+            accepted = ingest_location(
+                request.user.pk, data["latitude"], data["longitude"], data.get("recorded_at")
+            )
+        except ResponseError as e:
+            # the GEO set refused the point
+            return ResponseHandler.bad_request(message="Invalid location.", errors={"detail": str(e)})
+        except Exception as e:
+            logger.exception("Error buffering location update")
+            return ResponseHandler.generic_error(exception=e)
+
+        if not accepted:
+            # stale fix or a move below LOCATION_MIN_MOVE_METERS
+            return ResponseHandler.success(message="Location unchanged.", data={"accepted": False})
+        return ResponseHandler.success(
+            message="Location update accepted.", data={"accepted": True}, status_code=status.HTTP_202_ACCEPTED
+        )
         
 # get user profile
 class UserProfileAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        serializer = UserSerializer(request.user, context={"request": request})
-        return Response({
-            'success': True,
-            'message': 'User profile fetched successfully',
-            "data": serializer.data}, status=status.HTTP_200_OK)
+        try:
+            fields = UserSerializer.select(request)  # ?fields= / ?view=card|full
+        except ValidationError as exc:
+            return ResponseHandler.bad_request(message="Invalid fields.", errors=exc.detail)
+
+        # conditional GET: answer from the version columns before loading the profile
+        # profile_version moves on every write to the profile; updated_at is only for Last-Modified
+        profile_version, online, updated_at = (
+            User.objects.filter(pk=request.user.pk)
+            .values_list("profile_version", "is_online", "updated_at")
+            .get()
+        )
+        etag = make_etag(request, request.user.pk, profile_version, online)
+        cached = not_modified(request, etag, updated_at, etag_only=True)
+        if cached is not None:
+            return cached
+
+        user = request.user
+        if fields is not None:
+            # request.user only has the auth columns; load just what the fields read
+            user = User.objects.only(*UserSerializer.columns(fields)).get(pk=user.pk)
+
+        serializer = UserSerializer(user, context={"request": request, "fields": fields})
+        response = ResponseHandler.success(
+            message="User profile fetched successfully",
+            data=serializer.data,
+            compact=wants_compact(request),
+        )
+        return set_validators(response, etag, updated_at)
         
 #delete profile
 class UserProfileHardDeleteAPIView(APIView):
@@ -253,26 +309,33 @@ class UserProfileHardDeleteAPIView(APIView):
 
 
 # pop image view
-from .serializers import MakeYourProfilePopSerializer
-from account.models import MakeYourProfilePop
+from .serializers import MakeYourProfilePopSerializer, PopImageReorderSerializer
+from account.models import MakeYourProfilePop, MAX_POP_IMAGES, touch_profile
+from .images import schedule_derivatives_batch
+from .cards import ProfileCardCache
+
+
+def pop_gallery(request):
+    images = MakeYourProfilePop.objects.filter(user=request.user).order_by("position", "id")
+    return MakeYourProfilePopSerializer(images, many=True, context={"request": request}).data
+
+
 class PopImageListCreateAPIView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
     def get(self, request):
-        images = MakeYourProfilePop.objects.filter(user=request.user)
-        serializer = MakeYourProfilePopSerializer(images, many=True)
         return Response(
             {   "success": True,
                 "message": "Pop images fetched successfully",
-                "data": serializer.data
+                "data": pop_gallery(request)
             },
             status=status.HTTP_200_OK
         )
 
     def post(self, request):
+        """Batch upload: validate all files, then one locked count and one INSERT."""
         images = request.FILES.getlist("image")  # multiple files
-        saved_images = []
 
         if not images:
             return Response(
@@ -280,30 +343,87 @@ class PopImageListCreateAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if request.user.pop_images.count() + len(images) > 7:
+        if len(images) > MAX_POP_IMAGES:
             return Response(
-                {"success": False, "message": "You can upload a maximum of 7 pop-up images."},
+                {"success": False, "message": f"You can upload a maximum of {MAX_POP_IMAGES} pop-up images."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        for img in images:
-            serializer = MakeYourProfilePopSerializer(
-                data={"image": img},
-                context={"request": request}
+        serializer = MakeYourProfilePopSerializer(
+            data=[{"image": img} for img in images],
+            many=True,
+            context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            # the user row lock serializes concurrent uploads, so the limit can't be raced
+            User.objects.select_for_update().only("user_id").get(pk=request.user.pk)
+            positions = list(
+                MakeYourProfilePop.objects.filter(user=request.user).values_list("position", flat=True)
             )
-            serializer.is_valid(raise_exception=True)
-            serializer.save(user=request.user)
-            saved_images.append(serializer.data)
+            if len(positions) + len(images) > MAX_POP_IMAGES:
+                return Response(
+                    {"success": False, "message": f"You can upload a maximum of {MAX_POP_IMAGES} pop-up images."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            start = max(positions, default=-1) + 1
+            created = MakeYourProfilePop.objects.bulk_create([
+                MakeYourProfilePop(user_id=request.user.pk, image=item["image"], position=start + i)
+                for i, item in enumerate(serializer.validated_data)
+            ])
+            # bulk_create sends no post_save, so derivatives and the card are handled here
+            schedule_derivatives_batch("pop_image", [img.pk for img in created])
+            touch_profile(request.user.pk)
+            ProfileCardCache.invalidate(request.user.pk)
 
         return Response(
             {   "success": True,
-                "message": f"{len(saved_images)} pop images uploaded successfully",
-                "data": saved_images
+                "message": f"{len(created)} pop images uploaded successfully",
+                "data": pop_gallery(request)
             },
             status=status.HTTP_201_CREATED
         )
 
 
+class PopImageReorderAPIView(APIView):
+    """{"order": [id, ...]}: the user's full gallery in the new order."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = PopImageReorderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order = serializer.validated_data["order"]
+
+        with transaction.atomic():
+            User.objects.select_for_update().only("user_id").get(pk=request.user.pk)
+            images = MakeYourProfilePop.objects.filter(user=request.user).only("id", "position").in_bulk()
+            if set(order) != set(images):
+                return Response(
+                    {"success": False, "message": "order must list every one of your pop image ids exactly once."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            changed = []
+            for position, pk in enumerate(order):
+                if images[pk].position != position:
+                    images[pk].position = position
+                    changed.append(images[pk])
+            MakeYourProfilePop.objects.bulk_update(changed, ["position"])
+            if changed:
+                touch_profile(request.user.pk)
+                ProfileCardCache.invalidate(request.user.pk)
+
+        return Response(
+            {   "success": True,
+                "message": "Pop images reordered successfully",
+                "data": pop_gallery(request)
+            },
+            status=status.HTTP_200_OK
+        )
+
+
 
 
 class PopImageRetrieveUpdateDeleteAPIView(APIView):
@@ -359,6 +479,20 @@ class PopImageRetrieveUpdateDeleteAPIView(APIView):
 
 # Global Feed View
 from core.utils import ResponseHandler
+from core.fieldsets import pick, selected_fields, wants_compact
+from core.conditional import make_etag, not_modified, set_validators
+from .geo import GeographyKNN, GeographyDWithin
+from .pagination import KeysetPagination
+from .matching import CompatibilityScorer
+from .recommendations import RecommendationQueue
+from .presence import get_presence
+from .impressions import ImpressionFilter
+from .images import derivative_url
+from .filters import FilterParams, FILTER_CACHE_TTL, RANKED_LIMIT, filter_cache_key, filter_queryset
+from .relationships import RelationshipContext, relationship_context
+from .search import PrefixIndex, is_prefix_query, trigram_search
+from .utils import normalize_search_text
+from mutual_system.services import BlockGraph
 class GlobalFeedPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
@@ -407,93 +541,250 @@ class GlobalFeedPagination(PageNumberPagination):
 #             )
 
 
+
+
+FEED_FIELDS = (
+    "user_id", "username", "full_name", "is_online", "hobbies", "age", "bio", "distance",
+    "location", "looking_for", "pop_images", "relationship", "compatibility", "distance_km",
+)
+FEED_VIEWS = {
+    "card": ["user_id", "username", "full_name", "is_online", "age", "pop_images", "compatibility", "distance_km"],
+    "full": None,
+}
+
+
 class GlobalFeedAPIView(APIView):
+    """
+    ?mode=recent (default) -> newest profiles first, page-number pagination.
+    ?mode=nearby           -> nearest profiles first (PostGIS KNN), keyset cursor.
+    ?mode=ranked           -> best compatibility score first (account.matching).
+
+    Every card returned is recorded as seen (account.impressions); with
+    ?exclude_seen=true profiles already shown are skipped. That is opt-in, so
+    re-fetching a page (refresh, retry) returns the same profiles.
+    ?mode=ranked never repeats them either way: the queue is consumed.
+    ?view=card|full or ?fields=... trims the cards (core.fieldsets).
+    """
     permission_classes = [IsAuthenticated]
+    card_fields = None
 
     def get(self, request):
         try:
-            current_user = request.user
-
-            # ✅ include everyone (even if they have 0/1/2 pop images)
-            users_qs = (
-                User.objects.filter(is_active=True)
-                .exclude(pk=current_user.pk)
-                .only(
-                    "user_id",
-                    "username",
-                    "full_name",
-                    "is_online",
-                    "hobbies",
-                    "dob",
-                    "bio",
-                    'distance',
-                    "location",
-                    "looking_for",
-                )
-                # ✅ prefetch ALL pop images efficiently (ordered)
-                .prefetch_related(
-                    Prefetch("pop_images", queryset=MakeYourProfilePop.objects.order_by("-updated_at"))
-                )
-                .order_by("-updated_at")
+            self.card_fields = selected_fields(request, FEED_FIELDS, FEED_VIEWS)
+            mode = request.query_params.get("mode")
+            if mode == "nearby":
+                return self.get_nearby(request)
+            if mode == "ranked":
+                return self.get_ranked(request)
+            return self.get_recent(request)
+
+        except ValidationError as exc:
+            return ResponseHandler.bad_request(message="Invalid feed parameters.", errors=exc.detail)
+        except Exception as exc:
+            return ResponseHandler.server_error(
+                message="Failed to fetch global feed.",
+                errors=str(exc)
             )
 
-            paginator = GlobalFeedPagination()
-            page = paginator.paginate_queryset(users_qs, request)
+    def base_queryset(self, current_user):
+        # ✅ include everyone (even if they have 0/1/2 pop images)
+        qs = (
+            User.objects.filter(is_active=True)
+            .exclude(pk=current_user.pk)
+            .only("user_id")  # the card itself comes from ProfileCardCache
+        )
+        # 🚫 blocked either way -> never shown
+        return BlockGraph.exclude_from(current_user, qs)
+
+    def load_cards(self, users) -> dict:
+        # profile + ordered pop images + live presence, one MGET for the whole page
+        return ProfileCardCache.get_many([user.user_id for user in users])
+
+    def keep_unseen(self, request, users) -> list:
+        users = list(users)
+        if request.query_params.get("exclude_seen") not in ("1", "true"):
+            return users
+        unseen = set(ImpressionFilter.filter_unseen(request.user.pk, [u.user_id for u in users]))
+        return [u for u in users if u.user_id in unseen]
+
+    def record_seen(self, request, feed_data) -> list:
+        """Record the page as seen and return it trimmed to the requested fields."""
+        ImpressionFilter.record(request.user.pk, [card["user_id"] for card in feed_data])
+        return [pick(card, self.card_fields) for card in feed_data]
+
+    def wants(self, field: str) -> bool:
+        return self.card_fields is None or field in self.card_fields
+
+    def load_relationships(self, request, user_ids):
+        return RelationshipContext.load(request.user, user_ids) if self.wants("relationship") else None
+
+    def build_card(self, request, user, relationships=None) -> dict:
+        # user comes from ProfileCardCache: is_online is the live Redis presence
+        pop_images_serialized = MakeYourProfilePopSerializer(
+            user.pop_images.all(), many=True, context={"request": request}
+        ).data if self.wants("pop_images") else []
+
+        return {
+            "user_id": user.user_id,
+            "username": user.username or "",
+            "full_name": user.full_name or "",
+            "is_online": user.is_online,
+            "hobbies": user.hobbies or [],
+            "age": user.age,  # your @property age
+            "bio": user.bio or "",
+            "distance": user.distance or None,
+            "location": user.location or "",
+            "looking_for": user.looking_for or [],
+            "pop_images": pop_images_serialized,  # [] if none
+            "relationship": (relationships or RelationshipContext()).as_dict(user.user_id),
+        }
 
-            feed_data = []
-            for user in page:
-                pop_images_qs = user.pop_images.all()  # ✅ ALL images
+    def get_recent(self, request):
+        users_qs = self.base_queryset(request.user).order_by("-updated_at")
 
-                pop_images_serialized = MakeYourProfilePopSerializer(
-                    pop_images_qs, many=True, context={"request": request}
-                ).data
+        paginator = GlobalFeedPagination()
+        # page numbers stay stable; with ?exclude_seen seen profiles are dropped from the page itself
+        page = self.keep_unseen(request, paginator.paginate_queryset(users_qs, request))
+        cards = self.load_cards(page)
 
-                feed_data.append({
-                    "user_id": user.user_id,
-                    "username": user.username or "",
-                    "full_name": user.full_name or "",
-                    "is_online": user.is_online,
-                    "hobbies": user.hobbies or [],
-
-                    # ✅ new fields
-                    "age": user.age,  # your @property age
-                    "bio": user.bio or "",
-                    'distance': user.distance or None,
-                    "location": user.location or "",
-                    "looking_for": user.looking_for or [],
-
-                    "pop_images": pop_images_serialized,  # [] if none
-                })
+        relationships = self.load_relationships(request, list(cards))
+        feed_data = [
+            self.build_card(request, cards[user.user_id], relationships)
+            for user in page if user.user_id in cards
+        ]
+        feed_data = self.record_seen(request, feed_data)
 
-            return ResponseHandler.success(
-                message="Global feed fetched successfully.",
-                data=paginator.get_paginated_response(feed_data).data
-            )
+        return ResponseHandler.success(
+            message="Global feed fetched successfully.",
+            data=paginator.get_paginated_response(feed_data).data,
+            compact=wants_compact(request),
+        )
 
-        except Exception as exc:
-            return ResponseHandler.server_error(
-                message="Failed to fetch global feed.",
-                errors=str(exc)
+    def get_ranked(self, request):
+        # candidates are precomputed by Celery; each call consumes the next batch
+        page_size = GlobalFeedPagination().get_page_size(request)
+        popped = RecommendationQueue.pop(request.user, page_size)
+
+        visible = self.base_queryset(request.user).in_bulk([user_id for user_id, _ in popped])
+        users = self.load_cards(visible.values())
+        relationships = self.load_relationships(request, list(users))
+
+        feed_data = []
+        for user_id, score in popped:
+            user = users.get(user_id)
+            if user is None:  # deactivated since the queue was built
+                continue
+            card = self.build_card(request, user, relationships)
+            card["compatibility"] = round(score, 3)
+            feed_data.append(card)
+        feed_data = self.record_seen(request, feed_data)
+
+        return ResponseHandler.success(
+            message="Global feed fetched successfully.",
+            data={"next": None, "previous": None, "results": feed_data},
+            compact=wants_compact(request),
+        )
+
+    def get_nearby(self, request):
+        current_user = request.user
+        point = current_user.geo_location
+        if point is None:
+            return ResponseHandler.bad_request(message="Set your location to use nearby discovery.")
+
+        # optional override (km), otherwise the user's distance slider
+        radius_param = request.query_params.get("distance")
+        radius_km = int(radius_param) if radius_param and radius_param.isdigit() else current_user.distance
+
+        users_qs = (
+            self.base_queryset(current_user)
+            .filter(geo_location__isnull=False)
+            .annotate(distance_m=GeographyKNN("geo_location", point))
+            .order_by("distance_m", "user_id")
+        )
+        if radius_km:
+            users_qs = users_qs.filter(GeographyDWithin("geo_location", point, radius_km * 1000))
+
+        paginator = KeysetPagination(request, key_func=lambda u: (u.distance_m, u.user_id))
+        cursor = paginator.get_cursor(size=2)
+        if cursor:
+            try:
+                last_distance, last_user_id = float(cursor[0]), int(cursor[1])
+            except (TypeError, ValueError):
+                raise ValidationError({"cursor": "Invalid cursor."})
+            users_qs = users_qs.filter(
+                Q(distance_m__gt=last_distance)
+                | Q(distance_m=last_distance, user_id__gt=last_user_id)
             )
 
+        page = paginator.paginate(users_qs, keep=lambda rows: self.keep_unseen(request, rows))
+        cards = self.load_cards(page)
+        relationships = self.load_relationships(request, list(cards))
+
+        feed_data = []
+        for user in page:
+            if user.user_id not in cards:
+                continue
+            card = self.build_card(request, cards[user.user_id], relationships)
+            card["distance_km"] = round(user.distance_m / 1000, 1)
+            feed_data.append(card)
+        feed_data = self.record_seen(request, feed_data)
+
+        return ResponseHandler.success(
+            message="Global feed fetched successfully.",
+            data=paginator.get_paginated_data(feed_data),
+            compact=wants_compact(request),
+        )
+
 # get a user profile by username
 class UserDetailsProfileAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, identifier):
         try:
+            fields = UserSerializer.select(request)  # ?fields= / ?view=card|full
+
             # Determine if identifier is numeric (user_id) or string (username)
             if identifier.isdigit():
-                user = get_object_or_404(User, user_id=int(identifier), is_active=True)
+                lookup = {"user_id": int(identifier)}
             else:
-                user = get_object_or_404(User, username=identifier, is_active=True)
+                lookup = {"username": identifier}
 
-            serializer = UserSerializer(user, context={"request": request})
-            return ResponseHandler.success(
+            # version columns first; the full row is only loaded for a 200
+            version = (
+                User.objects.filter(is_active=True, **lookup)
+                .values_list("user_id", "profile_version", "is_online", "updated_at")
+                .first()
+            )
+            if version is None or BlockGraph.is_blocked(request.user, version[0]):
+                return ResponseHandler.not_found(message="User not found.")
+            user_id, profile_version, online, updated_at = version
+
+            # the body also depends on the viewer (is_liked_profile)
+            relationships = RelationshipContext.load(request.user, [user_id])
+            etag = make_etag(
+                request, request.user.pk, user_id, profile_version, online,
+                relationships.is_liked(user_id),
+            )
+            cached = not_modified(request, etag, updated_at, etag_only=True)
+            if cached is not None:
+                return cached
+
+            columns = UserSerializer.columns(fields)
+            users = User.objects.only(*columns) if columns else User.objects.all()
+            user = get_object_or_404(users, pk=user_id)
+
+            serializer = UserSerializer(
+                user, context={"request": request, "fields": fields, "relationships": relationships}
+            )
+            response = ResponseHandler.success(
                 message="User profile fetched successfully.",
-                data=serializer.data
+                data=serializer.data,
+                compact=wants_compact(request),
             )
+            return set_validators(response, etag, updated_at)
 
+        except ValidationError as exc:
+            return ResponseHandler.bad_request(message="Invalid fields.", errors=exc.detail)
         except Exception as exc:
             return ResponseHandler.server_error(
                 message="Failed to fetch user profile.",
@@ -502,7 +793,8 @@ class UserDetailsProfileAPIView(APIView):
             
 
 #liked and unliked user views
-from .services import UserLikeService
+from .services import UserLikeService, LikerIndex
+from rest_framework.utils.urls import replace_query_param
 class LikeUserAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -516,6 +808,23 @@ class LikeUserAPIView(APIView):
             logger.exception("Error liking user")
             return ResponseHandler.generic_error(exception=e)
 
+class PassUserAPIView(APIView):
+    """Swipe left: never show this profile again in discovery (until it decays)."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, user_id):
+        try:
+            if user_id == request.user.pk:
+                return ResponseHandler.bad_request(message="You cannot pass on yourself.")
+            if not User.objects.filter(pk=user_id, is_active=True).exists():
+                return ResponseHandler.not_found(message="User not found.")
+            ImpressionFilter.record(request.user.pk, [user_id])
+            RecommendationQueue.remove(request.user.pk, [user_id])
+            return ResponseHandler.success(message="User passed.", data={"passed": True})
+        except Exception as e:
+            logger.exception("Error passing user")
+            return ResponseHandler.generic_error(exception=e)
+
 class UnlikeUserAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -609,14 +918,82 @@ class UnlikeUserAPIView(APIView):
 #             extra={"pagination": pagination},
 #         )
 
+def user_list_context(request, users, fields) -> dict:
+    """WhoLikedUserSerializer context; relationships are only loaded if they are returned."""
+    if fields is not None and "relationship" not in fields:
+        return {"request": request, "fields": fields}
+    return {**relationship_context(request, users), "fields": fields}
+
+
 class WhoLikedUserAPIView(APIView):
     permission_classes = [IsAuthenticated]
     pagination_class = PageNumberPagination
 
-    def get_cache_key(self, user_id: int, page: int, page_size: int, radius: str) -> str:
-        return f"who_liked:{user_id}:r:{radius}:page:{page}:size:{page_size}"
+    def get_cache_key(self, user_id: int, page: int, page_size: int, radius: str, fields=None) -> str:
+        fieldset = ",".join(fields) if fields is not None else "all"
+        return f"who_liked:{user_id}:r:{radius}:page:{page}:size:{page_size}:f:{fieldset}"
 
     def get(self, request):
+        try:
+            fields = WhoLikedUserSerializer.select(request)  # ?fields= / ?view=card|full
+        except ValidationError as exc:
+            return ResponseHandler.bad_request(message="Invalid fields.", errors=exc.detail)
+
+        # optional override (if frontend sends distance), else the user's slider
+        # -> radius query in the DB, nearest first
+        radius_param = request.query_params.get("distance")  # km
+        if radius_param and radius_param.isdigit():
+            return self.get_within_radius(request, int(radius_param), fields)
+        user = request.user
+        if user.distance and user.latitude is not None and user.longitude is not None:
+            return self.get_within_radius(request, user.distance, fields)
+        return self.get_from_index(request, fields)
+
+    def get_from_index(self, request, fields=None):
+        """
+        Users without a distance slider (or a location): likers come from the
+        Redis likers index, newest like first, the total from the
+        likes_received_count counter, distance only for the returned page.
+        """
+        user = request.user
+        paginator = self.pagination_class()
+
+        try:
+            page_number = max(1, int(request.query_params.get(paginator.page_query_param, 1)))
+        except (TypeError, ValueError):
+            page_number = 1
+        page_size = paginator.get_page_size(request) or paginator.page_size or 20
+
+        try:
+            offset = (page_number - 1) * page_size
+            liker_ids = LikerIndex.page(user, offset, page_size)
+            liker_ids = BlockGraph.exclude_blocked(user, liker_ids)
+
+            page = ProfileCardCache.ordered(liker_ids)
+        except Exception as exc:
+            return ResponseHandler.generic_error(exception=exc)
+
+        serialized = WhoLikedUserSerializer(page, many=True, context=user_list_context(request, page, fields)).data
+
+        total_count = user.likes_received_count
+        url = request.build_absolute_uri()
+        has_next = offset + page_size < total_count
+        pagination = {
+            "count": total_count,
+            "next": replace_query_param(url, paginator.page_query_param, page_number + 1) if has_next else None,
+            "previous": replace_query_param(url, paginator.page_query_param, page_number - 1) if page_number > 1 else None,
+            "page": page_number,
+            "page_size": page_size,
+        }
+
+        return ResponseHandler.success(
+            message=f"{total_count} users liked your profile.",
+            data=serialized,
+            extra={"pagination": pagination},
+            compact=wants_compact(request),
+        )
+
+    def get_within_radius(self, request, radius_km, fields=None):
         user = request.user
         user_id = getattr(user, "user_id", None) or getattr(user, "id")
 
@@ -624,12 +1001,9 @@ class WhoLikedUserAPIView(APIView):
 
         page_number = request.query_params.get(paginator.page_query_param, "1")
         page_size = paginator.get_page_size(request) or paginator.page_size or 20
+        radius_param = str(radius_km)
 
-        # optional override (if frontend sends distance)
-        radius_param = request.query_params.get("distance")  # km
-        radius_km = int(radius_param) if radius_param and radius_param.isdigit() else None
-
-        cache_key = self.get_cache_key(user_id, page_number, page_size, radius_param or "default")
+        cache_key = self.get_cache_key(user_id, page_number, page_size, radius_param or "default", fields)
 
         try:
             cached_payload = cache.get(cache_key)
@@ -642,6 +1016,7 @@ class WhoLikedUserAPIView(APIView):
                 message=f"{cached_payload['pagination']['count']} users liked your profile.",
                 data=cached_payload["results"],
                 extra={"pagination": cached_payload["pagination"]},
+                compact=wants_compact(request),
             )
 
         # ✅ PASS USER OBJECT (not user_id)
@@ -650,9 +1025,10 @@ class WhoLikedUserAPIView(APIView):
         except Exception as exc:
             return ResponseHandler.generic_error(exception=exc)
 
-        page = paginator.paginate_queryset(qs, request, view=self)
+        page = paginator.paginate_queryset(qs.only("user_id"), request, view=self)
+        page = ProfileCardCache.ordered([liker.pk for liker in page])
 
-        serialized = WhoLikedUserSerializer(page, many=True, context={"request": request}).data
+        serialized = WhoLikedUserSerializer(page, many=True, context=user_list_context(request, page, fields)).data
 
         total_count = qs.count()
 
@@ -675,89 +1051,287 @@ class WhoLikedUserAPIView(APIView):
             message=f"{total_count} users liked your profile.",
             data=serialized,
             extra={"pagination": pagination},
+            compact=wants_compact(request),
         )
         
 
-CACHE_TTL = 30  # seconds
-class UserSearchAPIView(APIView):
+# matches (mutual likes)
+from datetime import datetime
+from chat.models import ChatThread, Message
+from .models import Match
+
+
+class MatchPagination(KeysetPagination):
+    page_size = 20
+
+
+class MatchListAPIView(APIView):
+    """
+    My matches, newest first, with presence and the last chat message.
+    Constant query count per page: matches, threads, last messages.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         try:
-            
-            query = request.query_params.get("q", "").strip()
-            if not query:
-                return ResponseHandler.bad_request(message="Query param 'q' is required.")
+            me = request.user
+            matches_qs = (
+                Match.objects.filter(user=me)
+                .select_related("matched_user")
+                .only(
+                    "id", "created_at", "matched_user",
+                    "matched_user__user_id", "matched_user__username",
+                    "matched_user__full_name", "matched_user__profile_pic",
+                    "matched_user__profile_pic_variants",
+                )
+                .order_by("-created_at", "-id")
+            )
 
-            cache_key = f"user_search:{query}"
-            users = cache.get(cache_key)
+            paginator = MatchPagination(request, key_func=lambda m: (m.created_at.isoformat(), m.id))
+            cursor = paginator.get_cursor(size=2)
+            if cursor:
+                try:
+                    last_created_at, last_id = datetime.fromisoformat(cursor[0]), int(cursor[1])
+                except (TypeError, ValueError):
+                    raise ValidationError({"cursor": "Invalid cursor."})
+                matches_qs = matches_qs.filter(
+                    Q(created_at__lt=last_created_at)
+                    | Q(created_at=last_created_at, id__lt=last_id)
+                )
 
-            if not users:
-                users = User.objects.filter(
-                    Q(username__icontains=query) |
-                    Q(full_name__icontains=query) |
-                    Q(email__icontains=query)
-                ).order_by("-created_at")[:50]
-                cache.set(cache_key, users, CACHE_TTL)
+            page = paginator.paginate(matches_qs)
+            other_ids = [m.matched_user_id for m in page]
+
+            presence = get_presence(other_ids)
+            threads, last_messages = self.load_chat_state(me, other_ids)
+
+            data = []
+            for match in page:
+                other = match.matched_user
+                thread = threads.get(other.user_id)
+                last = last_messages.get(thread.id) if thread else None
+                state = presence.get(other.user_id) or {}
+                data.append({
+                    "match_id": match.id,
+                    "matched_at": match.created_at,
+                    "user": {
+                        "user_id": other.user_id,
+                        "username": other.username,
+                        "full_name": other.full_name,
+                        "profile_pic": derivative_url(other.profile_pic, other.profile_pic_variants, request, "thumb"),
+                        "is_online": state.get("is_online", False),
+                        "last_seen": state.get("last_seen"),
+                    },
+                    "thread_id": thread.id if thread else None,
+                    "last_message": {
+                        "message_id": last.id,
+                        "sender_id": last.sender_id,
+                        "content": last.content,
+                        "message_type": last.message_type,
+                        "created_at": last.created_at,
+                    } if last else None,
+                })
 
-            serializer = WhoLikedUserSerializer(users, many=True, context={"request": request})
-            return ResponseHandler.success(data=serializer.data)
+            return ResponseHandler.success(
+                message="Matches fetched successfully.",
+                data=paginator.get_paginated_data(data),
+            )
 
+        except ValidationError as exc:
+            return ResponseHandler.bad_request(message="Invalid parameters.", errors=exc.detail)
         except Exception as e:
+            logger.exception("Error fetching matches")
             return ResponseHandler.generic_error(exception=e)
-        
+
+    def load_chat_state(self, me, other_ids):
+        """({other_user_id: thread}, {thread_id: last message}) in two queries."""
+        if not other_ids:
+            return {}, {}
+
+        threads = {}
+        for thread in ChatThread.objects.filter(
+            Q(user_a=me, user_b_id__in=other_ids) | Q(user_b=me, user_a_id__in=other_ids)
+        ).only("id", "user_a_id", "user_b_id"):
+            other_id = thread.user_b_id if thread.user_a_id == me.pk else thread.user_a_id
+            threads[other_id] = thread
+
+        if not threads:
+            return threads, {}
+
+        # DISTINCT ON (thread_id) picks the newest message per thread
+        last_messages = {
+            m.thread_id: m
+            for m in Message.objects.filter(thread_id__in=[t.id for t in threads.values()])
+            .order_by("thread_id", "-created_at")
+            .distinct("thread_id")
+            .only("id", "thread_id", "sender_id", "content", "message_type", "created_at")
+        }
+        return threads, last_messages
 
 
-class UserFilterAPIView(APIView):
+CACHE_TTL = 30  # seconds
+class UserSearchPagination(KeysetPagination):
+    page_size = 20
+
+
+class UserSearchAPIView(APIView):
+    """
+    ?q=ab      -> autocomplete from the Redis prefix index (single page)
+    ?q=abrar   -> trigram search on search_text, ranked, keyset cursor
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         try:
-            gender = request.query_params.get("gender")
-            min_age = request.query_params.get("min_age")
-            max_age = request.query_params.get("max_age")
-            max_distance = request.query_params.get("max_distance")
+            fields = WhoLikedUserSerializer.select(request)  # ?fields= / ?view=card|full
+            query = normalize_search_text(request.query_params.get("q", ""))
+            if not query:
+                return ResponseHandler.bad_request(message="Query param 'q' is required.")
 
-            filters = Q()
+            if is_prefix_query(query):
+                users, next_link = self.autocomplete(request, query), None
+            else:
+                users, next_link = self.search(request, query)
 
-            if gender:
-                filters &= Q(gender__iexact=gender)  # case insensitive
+            serializer = WhoLikedUserSerializer(users, many=True, context=user_list_context(request, users, fields))
+            return ResponseHandler.success(
+                data=serializer.data, extra={"next": next_link}, compact=wants_compact(request)
+            )
 
-            today = date.today()
+        except ValidationError as exc:
+            return ResponseHandler.bad_request(message="Invalid search parameters.", errors=exc.detail)
+        except Exception as e:
+            return ResponseHandler.generic_error(exception=e)
 
-            if min_age:
-                min_age = int(min_age)
-                max_dob = date(today.year - min_age, today.month, today.day)
-                filters &= Q(dob__lte=max_dob)
+    def autocomplete(self, request, query):
+        page_size = UserSearchPagination(request, key_func=None).get_page_size()
+        # over-fetch a little: self / blocked / deactivated ids are dropped below
+        ids = [uid for uid in PrefixIndex.lookup(query, limit=page_size * 2) if uid != request.user.pk]
+        ids = BlockGraph.exclude_blocked(request.user, ids)[:page_size]
+
+        return ProfileCardCache.ordered(ids, active_only=True)
+
+    def search(self, request, query):
+        # only ids and rank here; the results are hydrated from ProfileCardCache
+        users_qs = trigram_search(query).exclude(pk=request.user.pk).only("user_id")
+        users_qs = BlockGraph.exclude_from(request.user, users_qs)
+
+        paginator = UserSearchPagination(request, key_func=lambda u: (u.rank, u.user_id))
+        cursor = paginator.get_cursor(size=2)
+        if cursor:
+            try:
+                last_rank, last_user_id = float(cursor[0]), int(cursor[1])
+            except (TypeError, ValueError):
+                raise ValidationError({"cursor": "Invalid cursor."})
+            users_qs = users_qs.filter(
+                Q(rank__lt=last_rank) | Q(rank=last_rank, user_id__gt=last_user_id)
+            )
 
-            if max_age:
-                max_age = int(max_age)
-                min_dob = date(today.year - max_age, today.month, today.day)
-                filters &= Q(dob__gte=min_dob)
+        users = paginator.paginate(users_qs)
+        return ProfileCardCache.ordered([user.user_id for user in users]), paginator.get_next_link()
+        
 
-            if max_distance:
-                filters &= Q(distance__lte=int(max_distance))
 
-            cache_key = f"user_filter:{gender}:{min_age}:{max_age}:{max_distance}"
-            users = cache.get(cache_key)
+class UserFilterPagination(KeysetPagination):
+    page_size = 20
 
-            if not users:
-                users = (
-                    User.objects
-                    .filter(filters)
-                    .order_by("-created_at")[:50]
-                )
-                cache.set(cache_key, users, CACHE_TTL)
 
-            serializer = WhoLikedUserSerializer(users, many=True, context={"request": request})
-            return ResponseHandler.success(data=serializer.data)
+class UserFilterAPIView(APIView):
+    """
+    ?gender=&min_age=&max_age=&max_distance=(km from me)
+    &brings=&that=&looking_for=&match=any|all&sort=compatibility&exclude_seen=true
+
+    Newest profiles first with a keyset cursor; ?sort=compatibility pages
+    through the best RANKED_LIMIT matches instead. See account/filters.py.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            params = FilterParams.from_query(request.query_params)
+            fields = WhoLikedUserSerializer.select(request)  # ?fields= / ?view=card|full
+            if params.max_distance and request.user.geo_location is None:
+                return ResponseHandler.bad_request(message="Set your location to filter by distance.")
+
+            paginator = UserFilterPagination(request, key_func=lambda row: row)
+            if params.sort == "compatibility":
+                user_ids = self.get_ranked_ids(request, params, paginator)
+            else:
+                user_ids = self.get_filtered_ids(request, params, paginator)
 
-        except ValueError:
-            return ResponseHandler.error(message="Invalid filter values", status=400)
+            users = ProfileCardCache.ordered(user_ids)
+            ImpressionFilter.record(request.user.pk, [u.pk for u in users])
+
+            serializer = WhoLikedUserSerializer(users, many=True, context=user_list_context(request, users, fields))
+            return ResponseHandler.success(
+                data=serializer.data, extra={"next": paginator.get_next_link()}, compact=wants_compact(request)
+            )
+
+        except ValidationError as exc:
+            return ResponseHandler.bad_request(message="Invalid filter values", errors=exc.detail)
 
         except Exception as e:
             return ResponseHandler.generic_error(exception=e)
 
+    def keep_visible(self, request, rows) -> list:
+        """
+        Drop rows (`(key, user_id)` pairs) of blocked users and, with
+        ?exclude_seen=true, of profiles already shown to the viewer.
+        """
+        user_ids = BlockGraph.exclude_blocked(request.user, [user_id for _, user_id in rows])
+        if request.query_params.get("exclude_seen") in ("1", "true"):
+            user_ids = ImpressionFilter.filter_unseen(request.user.pk, user_ids)
+        visible = set(user_ids)
+        return [row for row in rows if row[1] in visible]
+
+    def get_filtered_ids(self, request, params, paginator) -> list:
+        cursor = paginator.get_cursor(size=2)
+        cache_key = filter_cache_key(request.user, params, cursor)
+
+        # cached window: (created_at, user_id) rows past the cursor, one extra row
+        # so the paginator can tell whether another page exists
+        rows = cache.get(cache_key)
+        if rows is None:
+            users_qs = filter_queryset(request.user, params).order_by("-created_at", "-user_id")
+            if cursor:
+                try:
+                    last_created_at, last_user_id = datetime.fromisoformat(cursor[0]), int(cursor[1])
+                except (TypeError, ValueError):
+                    raise ValidationError({"cursor": "Invalid cursor."})
+                users_qs = users_qs.filter(
+                    Q(created_at__lt=last_created_at)
+                    | Q(created_at=last_created_at, user_id__lt=last_user_id)
+                )
+            scan_size = paginator.get_page_size() * paginator.scan_factor
+            rows = [
+                (created_at.isoformat(), user_id)
+                for created_at, user_id in users_qs.values_list("created_at", "user_id")[: scan_size + 1]
+            ]
+            cache.set(cache_key, rows, FILTER_CACHE_TTL)
+
+        rows = paginator.paginate(rows, keep=lambda window: self.keep_visible(request, window))
+        return [user_id for _, user_id in rows]
+
+    def get_ranked_ids(self, request, params, paginator) -> list:
+        cache_key = filter_cache_key(request.user, params)
+        ranked_ids = cache.get(cache_key)
+        if ranked_ids is None:
+            ranked_ids, _scores = CompatibilityScorer(request.user).rank(filter_queryset(request.user, params))
+            ranked_ids = ranked_ids[:RANKED_LIMIT]
+            cache.set(cache_key, ranked_ids, FILTER_CACHE_TTL)
+
+        # cursor = position in the cached ranking
+        cursor = paginator.get_cursor(size=1)
+        try:
+            offset = int(cursor[0]) if cursor else 0
+        except (TypeError, ValueError):
+            raise ValidationError({"cursor": "Invalid cursor."})
+
+        indexed = list(enumerate(ranked_ids))[offset:]
+        paginator.key_func = lambda row: (row[0] + 1,)
+        rows = paginator.paginate(indexed, keep=lambda window: self.keep_visible(request, window))
+        return [user_id for _, user_id in rows]
+
 
 
 #google login view
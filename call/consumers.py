@@ -4,6 +4,9 @@ from channels.db import database_sync_to_async
 
 from .models import Call
 from .presence import set_online
+from account.cards import ProfileCardCache
+from account.images import derivative_url
+from account.presence import user_group
 
 
 class CallConsumer(AsyncJsonWebsocketConsumer):
@@ -15,7 +18,8 @@ class CallConsumer(AsyncJsonWebsocketConsumer):
 
         self.user = user
         self.user_id = user.pk
-        self.user_group = f"user_{self.user_id}"
+        # also receives presence_offline for this user's matches / chat partners
+        self.user_group = user_group(self.user_id)
 
         await self.channel_layer.group_add(self.user_group, self.channel_name)
         await self.accept()
@@ -207,6 +211,14 @@ class CallConsumer(AsyncJsonWebsocketConsumer):
     async def push_event(self, event):
         await self.send_json(event["payload"])
 
+    async def presence_offline(self, event):
+        await self.send_json({
+            "type": "presence_offline",
+            "success": True,
+            "message": "Users went offline",
+            "data": {"user_ids": event["user_ids"]},
+        })
+
     async def send_error(self, message, event_type="error", data=None):
         await self.send_json({
             "type": event_type,
@@ -217,7 +229,7 @@ class CallConsumer(AsyncJsonWebsocketConsumer):
 
     async def push_call_event(self, target_user_id, event_type, message, call):
         await self.channel_layer.group_send(
-            f"user_{target_user_id}",
+            user_group(target_user_id),
             {
                 "type": "push_event",
                 "payload": {
@@ -242,10 +254,12 @@ class CallConsumer(AsyncJsonWebsocketConsumer):
         "receiver_id": call.receiver_id,
 
         "caller_full_name": call.caller.full_name,
-        "caller_profile_pic": call.caller.profile_pic.url if call.caller.profile_pic else None,
+        "caller_profile_pic": derivative_url(call.caller.profile_pic, call.caller.profile_pic_variants, default_size="thumb"),
+        "caller_is_online": call.caller.is_online,
 
         "receiver_full_name": call.receiver.full_name,
-        "receiver_profile_pic": call.receiver.profile_pic.url if call.receiver.profile_pic else None,
+        "receiver_profile_pic": derivative_url(call.receiver.profile_pic, call.receiver.profile_pic_variants, default_size="thumb"),
+        "receiver_is_online": call.receiver.is_online,
 
         "created_at": call.created_at.isoformat() if call.created_at else None,
         "accepted_at": call.accepted_at.isoformat() if call.accepted_at else None,
@@ -255,9 +269,8 @@ class CallConsumer(AsyncJsonWebsocketConsumer):
 
     @database_sync_to_async
     def get_call(self, call_id):
-        return (
-            Call.objects
-            .select_related("caller", "receiver")
-            .filter(id=call_id)
-            .first()
-        )
\ No newline at end of file
+        call = Call.objects.filter(id=call_id).first()
+        if call is not None:
+            # caller / receiver from the profile card cache, live presence included
+            ProfileCardCache.attach([call], "caller", "receiver")
+        return call
\ No newline at end of file
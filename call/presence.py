@@ -1,18 +1,16 @@
 #call/presence.py
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-import redis
-from django.conf import settings
+from django_redis import get_redis_connection
 
-# If you already have a Redis client in chat, reuse it.
-# Minimal standalone approach:
-_redis = redis.Redis(host="127.0.0.1", port=6379, db=0, decode_responses=True)
+# online state lives in account.presence (one heartbeat for chat, calls and feed)
+from account.presence import PRESENCE_TTL_SECONDS, heartbeat, is_online as _is_online
 
-def set_online(user_id: int, ttl_seconds: int = 60):
-    _redis.setex(f"online:{user_id}", ttl_seconds, "1")
+_redis = get_redis_connection("default")
+
+def set_online(user_id: int, ttl_seconds: int = PRESENCE_TTL_SECONDS):
+    heartbeat(user_id, ttl=ttl_seconds)
 
 def is_online(user_id: int) -> bool:
-    return _redis.exists(f"online:{user_id}") == 1
+    return _is_online(user_id)
 
 def set_in_call(user_id: int, call_id: str, ttl_seconds: int = 3600):
     _redis.setex(f"incall:{user_id}", ttl_seconds, call_id)
@@ -33,7 +33,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from .models import Call
-from .presence import set_in_call, clear_in_call, is_in_call
+from .presence import set_in_call, clear_in_call, is_in_call, is_online
+from account.presence import get_presence
+from mutual_system.services import BlockGraph
 
 
 @api_view(["POST"])
@@ -57,6 +59,9 @@ def start_call(request):
     if not User.objects.filter(pk=receiver_id).exists():
         return Response({"detail": "Receiver not found or exist"}, status=404)
 
+    if BlockGraph.is_blocked(request.user, receiver_id):
+        return Response({"detail": "You cannot call this user"}, status=403)
+
     with transaction.atomic():
         # ✅ auto-expire old ringing calls so users don't stay "busy" forever
         timeout_at = timezone.now() - timedelta(seconds=25)  # tune as needed
@@ -98,6 +103,7 @@ def start_call(request):
         "channel": call.channel,
         "call_type": call.call_type,
         "status": call.status,
+        "receiver_is_online": is_online(receiver_id),
         }
     }, status=201)
 
@@ -279,6 +285,8 @@ def call_status(request, call_id):
     if request.user.pk not in (call.caller_id, call.receiver_id):
         return Response({"detail": "Forbidden"}, status=403)
 
+    presence = get_presence([call.caller_id, call.receiver_id])
+
     return Response({
         "success": True,
         "message": "Call status retrieved",
@@ -289,6 +297,8 @@ def call_status(request, call_id):
             "status": call.status,
             "caller_id": call.caller_id,
             "receiver_id": call.receiver_id,
+            "caller_is_online": presence[call.caller_id]["is_online"],
+            "receiver_is_online": presence[call.receiver_id]["is_online"],
             "created_at": call.created_at,
             "accepted_at": call.accepted_at,
             "ended_at": call.ended_at,
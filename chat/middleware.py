@@ -3,7 +3,7 @@ from urllib.parse import parse_qs
 from channels.middleware import BaseMiddleware
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from account.authentication import CachedJWTAuthentication
 from asgiref.sync import sync_to_async
 
 User = get_user_model()
@@ -20,7 +20,7 @@ class JWTAuthMiddleware(BaseMiddleware):
         if token_list:
             token = token_list[0]
             try:
-                jwt_auth = JWTAuthentication()
+                jwt_auth = CachedJWTAuthentication()
                 validated_token = await sync_to_async(jwt_auth.get_validated_token)(token)
                 user = await sync_to_async(jwt_auth.get_user)(validated_token)
                 scope["user"] = user
@@ -4,13 +4,16 @@ from collections import defaultdict
 # Django
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.core.files.storage import default_storage
 from django.db.models import F, Window
 from django.db.models.functions import Random, RowNumber
 
 # DRF
 from rest_framework import serializers
 
+from account.cards import ProfileCardCache
+from account.images import derivative_url
+from account.presence import is_online
+
 # Local apps
 from .models import (
     ChatThread,
@@ -23,10 +26,26 @@ from .models import (
 
 User = get_user_model()
 class SimpleUserSerializer(serializers.ModelSerializer):
+    profile_pic = serializers.SerializerMethodField()
+    is_online = serializers.SerializerMethodField()
+
     class Meta:
         model = User
         fields = ["user_id", "email", "username", "full_name", "profile_pic", 'is_online']  # updated id → user_id
 
+    def get_profile_pic(self, obj):
+        return derivative_url(obj.profile_pic, obj.profile_pic_variants, self.context.get("request"), default_size="thumb")
+
+    def get_is_online(self, obj):
+        # list views pass a prebuilt {user_id: state} map or users from
+        # ProfileCardCache (live is_online already set); other objects ask Redis
+        presence = self.context.get("presence")
+        if presence is not None and obj.pk in presence:
+            return presence[obj.pk]["is_online"]
+        if getattr(obj, "_presence_loaded", False):
+            return obj.is_online
+        return is_online(obj.pk)
+
 
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -79,12 +98,57 @@ class ThreadListSerializer(serializers.ModelSerializer):
         request_user = self.context.get("request").user
 
         # request_user.pk instead of request_user.id (id does NOT exist)
-        other = obj.user_b if obj.user_a_id == request_user.pk else obj.user_a
+        other_id = obj.user_b_id if obj.user_a_id == request_user.pk else obj.user_a_id
+        other = self._other_users().get(other_id)
+        if other is None:
+            other = obj.user_b if obj.user_a_id == request_user.pk else obj.user_a
         return SimpleUserSerializer(other).data
 
+    def _other_users(self):
+        """
+        Build {user_id: user} once for the whole thread list (profile card cache,
+        live presence and emails included).
+        """
+        if hasattr(self, "_cached_other_users"):
+            return self._cached_other_users
+
+        request_user = self.context.get("request").user
+        instance = self.instance
+        threads = instance if hasattr(instance, "__iter__") else [instance]
+        other_ids = [
+            t.user_b_id if t.user_a_id == request_user.pk else t.user_a_id
+            for t in threads
+        ] if instance is not None else []
+
+        self._cached_other_users = ProfileCardCache.get_many(other_ids, emails=True)
+        return self._cached_other_users
+
     def get_last_message(self, obj):
-        last = obj.messages.order_by("-created_at").first()
-        return MessageSerializer(last).data if last else None
+        last = self._last_messages().get(obj.pk)
+        return MessageSerializer(last, context=self.context).data if last else None
+
+    def _last_messages(self):
+        """
+        Build {thread_id: message} once for the whole thread list: one
+        DISTINCT ON query, senders from the profile card cache.
+        """
+        if hasattr(self, "_cached_last_messages"):
+            return self._cached_last_messages
+
+        instance = self.instance
+        threads = instance if hasattr(instance, "__iter__") else [instance]
+        thread_ids = [t.pk for t in threads] if instance is not None else []
+
+        messages = list(
+            Message.objects.filter(thread_id__in=thread_ids)
+            .order_by("thread_id", "-created_at", "-id")
+            .distinct("thread_id")
+            .prefetch_related("reactions")
+        ) if thread_ids else []
+        ProfileCardCache.attach(messages, "sender", emails=True)
+
+        self._cached_last_messages = {message.thread_id: message for message in messages}
+        return self._cached_last_messages
     
     def get_unread_count(self, obj):
         request = self.context.get("request")
@@ -126,7 +190,6 @@ class SocietySerializer(serializers.ModelSerializer):
         qs = (
             SocietyMember.objects
             .filter(society_id__in=society_ids)
-            .select_related("user")
             .annotate(
                 rn=Window(
                     expression=RowNumber(),
@@ -135,35 +198,23 @@ class SocietySerializer(serializers.ModelSerializer):
                 )
             )
             .filter(rn__lte=5)
-            .values("society_id", "user__profile_pic")
+            .values("society_id", "user_id")
         )
+        rows = list(qs)
+        # member pictures come from the profile card cache, not a users join
+        users = ProfileCardCache.get_many([row["user_id"] for row in rows], presence=False)
 
         mp = defaultdict(list)
         request = self.context.get("request")
 
-        for row in qs:
-            pic = row["user__profile_pic"]
-            if not pic:
+        for row in rows:
+            user = users.get(row["user_id"])
+            if user is None:
                 continue
-
-            pic_str = str(pic).strip()
-
-            # 1) If already absolute (CDN etc.), keep it
-            if pic_str.startswith("http://") or pic_str.startswith("https://"):
-                final_url = pic_str
-
-            else:
-                # 2) If starts with "/", it's already a URL-path like "/media/.."
-                if pic_str.startswith("/"):
-                    url_path = pic_str
-                else:
-                    # 3) If stored like "profile/x.png", convert to "/media/profile/x.png" (or storage URL)
-                    url_path = default_storage.url(pic_str)
-
-                # 4) Make absolute for Flutter
-                final_url = request.build_absolute_uri(url_path) if request else url_path
-
-            mp[row["society_id"]].append(final_url)
+            # thumbnail rendition, absolute for Flutter when there is a request
+            final_url = derivative_url(user.profile_pic, user.profile_pic_variants, request, default_size="thumb")
+            if final_url:
+                mp[row["society_id"]].append(final_url)
 
         self._cached_random_images_map = dict(mp)
         return self._cached_random_images_map
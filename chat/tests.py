@@ -1,3 +1,35 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
 
-# Create your tests here.
+from .models import ChatThread, Message
+from .serializers import ThreadListSerializer
+
+User = get_user_model()
+
+
+class ThreadListLastMessageTests(TestCase):
+    def setUp(self):
+        self.me = User.objects.create_user(email="me@example.com", password="x", username="me")
+        self.threads = []
+        for i in range(3):
+            other = User.objects.create_user(email=f"other{i}@example.com", password="x", username=f"other{i}")
+            thread = ChatThread.get_or_create_thread(self.me, other)
+            Message.objects.create(thread=thread, sender=self.me, content=f"hi {i}")
+            Message.objects.create(thread=thread, sender=other, content=f"bye {i}")
+            self.threads.append(thread)
+
+        request = APIRequestFactory().get("/")
+        force_authenticate(request, self.me)
+        request.user = self.me
+        self.context = {"request": request}
+
+    def test_last_message_per_thread_from_one_query(self):
+        threads = ChatThread.objects.filter(pk__in=[t.pk for t in self.threads]).order_by("pk")
+        serializer = ThreadListSerializer(threads, many=True, context=self.context)
+        data = serializer.data
+
+        self.assertEqual([row["last_message"]["content"] for row in data], ["bye 0", "bye 1", "bye 2"])
+        last_messages = serializer.child._last_messages()
+        # senders come from the card cache with live presence, not one lookup per thread
+        self.assertTrue(all(m.sender._presence_loaded for m in last_messages.values()))
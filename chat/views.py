@@ -12,8 +12,10 @@ from rest_framework import parsers, permissions, serializers, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 
+from account.cards import ProfileCardCache
 from account.presence import touch_chat_presence
 from core.utils import ResponseHandler
+from mutual_system.services import BlockGraph
 
 from .models import (
     ChatThread,
@@ -55,6 +57,8 @@ class ThreadListCreateAPIView(APIView):
         from django.contrib.auth import get_user_model
         User = get_user_model()
         other = get_object_or_404(User, pk=other_id)
+        if BlockGraph.is_blocked(request.user, other):
+            return ResponseHandler.forbidden(message="You cannot message this user.")
         thread = ChatThread.get_or_create_thread(request.user, other)
         serializer = ThreadListSerializer(thread, context={"request": request})
         return ResponseHandler.created(data=serializer.data)
@@ -79,11 +83,8 @@ class MessageListCreateAPIView(APIView):
         key = f"chat:unread:{request.user.pk}:{thread.pk}"
         cache.set(key, 0, timeout=7 * 24 * 3600)
 
-        messages = (
-            Message.objects.filter(thread=thread)
-            .select_related("sender")
-            .order_by("created_at")
-        )
+        messages = list(Message.objects.filter(thread=thread).order_by("created_at"))
+        ProfileCardCache.attach(messages, "sender", emails=True)
 
         serializer = MessageSerializer(messages, many=True, context={"request": request})
         return ResponseHandler.success(data=serializer.data)
@@ -261,12 +262,8 @@ class SocietyMessageListCreateAPIView(APIView):
         if not SocietyMember.objects.filter(society=society, user=request.user).exists():
             return ResponseHandler.forbidden(message="You are not a member of this society.")
 
-        qs = (
-            SocietyMessage.objects
-            .filter(society=society)
-            .select_related("sender")
-            .order_by("created_at")
-        )
+        qs = list(SocietyMessage.objects.filter(society=society).order_by("created_at"))
+        ProfileCardCache.attach(qs, "sender", emails=True)
         return ResponseHandler.success(
             data=SocietyMessageSerializer(qs, many=True).data
         )
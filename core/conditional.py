@@ -0,0 +1,48 @@
+# core/conditional.py
+"""
+Conditional GET for endpoints that are polled but rarely change.
+
+Views first read a cheap version of the resource (a version counter or
+updated_at / last_updated, plus whatever else the body depends on), then call
+`not_modified`: a matching If-None-Match (or If-Modified-Since) is answered
+with 304 before the full row is loaded or serialized. Otherwise `set_validators` stamps the response.
+
+The ETag is strong: it hashes the version parts together with the request's
+query string, since ?fields= / ?view= / ?image_size= change the body. When
+the body depends on more than the timestamp (presence, the viewer's likes),
+pass etag_only=True: Last-Modified is still sent, but only If-None-Match can
+produce a 304.
+"""
+import hashlib
+from typing import Optional
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(request, *parts) -> str:
+    raw = "|".join(str(part) for part in parts) + "|" + request.META.get("QUERY_STRING", "")
+    return '"%s"' % hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _timestamp(last_modified) -> Optional[int]:
+    return int(last_modified.timestamp()) if last_modified else None
+
+
+def not_modified(request, etag: str, last_modified=None, private: bool = True, etag_only: bool = False):
+    """A 304 response if the client's copy is current, else None."""
+    response = get_conditional_response(
+        request, etag=etag, last_modified=None if etag_only else _timestamp(last_modified)
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified, private)
+    return response
+
+
+def set_validators(response, etag: str, last_modified=None, private: bool = True):
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(_timestamp(last_modified))
+    # clients may keep the body but must revalidate before using it
+    patch_cache_control(response, no_cache=True, **({"private": True} if private else {"public": True}))
+    return response
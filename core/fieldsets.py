@@ -0,0 +1,93 @@
+# core/fieldsets.py
+"""
+Sparse fieldsets for read endpoints.
+
+    ?fields=user_id,username,age   exactly these keys
+    ?view=card                     a named set declared by the endpoint (default "full" = everything)
+    ?envelope=compact              {"data": ..., "extra": ...} without success/message/status_code/errors
+
+Serializers opt in with SparseFieldsMixin: Meta.views names the field sets,
+Meta.field_columns maps computed fields to the model columns they read, so a
+view can load just `only(*Serializer.columns(fields))` and pass
+context["fields"] to drop the other keys.
+"""
+from typing import Iterable, Optional
+
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = "fields"
+VIEW_PARAM = "view"
+ENVELOPE_PARAM = "envelope"
+DEFAULT_VIEW = "full"
+
+
+def selected_fields(request, available: Iterable[str], views: dict, default_view: str = DEFAULT_VIEW) -> Optional[list]:
+    """
+    Field names to return, in `available` order, or None for all of them.
+    Raises ValidationError for unknown fields / views.
+    """
+    available = list(available)
+    raw = request.query_params.get(FIELDS_PARAM)
+    if raw:
+        names = {name.strip() for name in raw.split(",") if name.strip()}
+        unknown = names.difference(available)
+        if unknown:
+            raise ValidationError({FIELDS_PARAM: f"Unknown fields: {', '.join(sorted(unknown))}."})
+    else:
+        view = request.query_params.get(VIEW_PARAM) or default_view
+        if view not in views:
+            raise ValidationError({VIEW_PARAM: f"Choose one of: {', '.join(views)}."})
+        if views[view] is None:
+            return None
+        names = set(views[view])
+    return [name for name in available if name in names]
+
+
+def pick(data: dict, fields: Optional[list]) -> dict:
+    """`data` restricted to `fields` (None keeps everything)."""
+    if fields is None:
+        return data
+    return {key: data[key] for key in fields if key in data}
+
+
+def wants_compact(request) -> bool:
+    return request.query_params.get(ENVELOPE_PARAM) == "compact"
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin. context["fields"] (from `select`) keeps only those
+    fields; None or missing keeps all of them.
+
+        class Meta:
+            views = {"card": [...], "full": None}
+            field_columns = {"age": ("dob",), "pop_images": ()}
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get("fields")
+        if fields is not None:
+            for name in set(self.fields).difference(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def select(cls, request, default_view: str = DEFAULT_VIEW) -> Optional[list]:
+        return selected_fields(request, cls.Meta.fields, cls.Meta.views, default_view)
+
+    @classmethod
+    def columns(cls, fields: Optional[list]) -> Optional[list]:
+        """Model columns the selected fields read, for QuerySet.only(); None means all."""
+        if fields is None:
+            return None
+        opts = cls.Meta.model._meta
+        field_columns = getattr(cls.Meta, "field_columns", {})
+        concrete = {f.name for f in opts.concrete_fields}
+
+        columns = {opts.pk.name}
+        for name in fields:
+            if name in field_columns:
+                columns.update(field_columns[name])
+            elif name in concrete:
+                columns.add(name)
+        return sorted(columns)
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     "django.contrib.gis",   # GeoDjango for geospatial features
+    "django.contrib.postgres",  # pg_trgm lookups / GIN indexes for people search
     
     # third-party apps
     "rest_framework",
@@ -173,7 +174,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework & JWT
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # simplejwt with a cached principal instead of a users-table read per request
+        "account.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -334,6 +336,12 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Dhaka'
 CELERY_ENABLE_UTC = False
 
+# CPU-bound Pillow work gets its own prefork pool:
+#   celery -A core worker -Q images --pool=prefork --concurrency=<cores>
+CELERY_TASK_ROUTES = {
+    "account.tasks.generate_image_derivatives": {"queue": "images"},
+}
+
 CELERY_BEAT_SCHEDULE = {
     "cleanup_expired_stories_every_hour": {
         "task": "mutual_system.tasks.cleanup_expired_stories",
@@ -343,14 +351,50 @@ CELERY_BEAT_SCHEDULE = {
         "task": "mutual_system.tasks.sync_redis_view_counts",
         "schedule": crontab(minute="*/10"),
     },
-    "mark-offline-every-15-min": {
+    # sweeps only expired presence heartbeats, so it is cheap to run often
+    "mark-offline-every-30-sec": {
         "task": "account.tasks.mark_offline_task",
-        "schedule": crontab(minute="*/15"),
-    }
+        "schedule": 30.0,
+    },
+    "flush-presence-every-minute": {
+        "task": "account.tasks.flush_presence_task",
+        "schedule": crontab(minute="*"),
+    },
+    "flush-locations-every-minute": {
+        "task": "account.tasks.flush_locations_task",
+        "schedule": crontab(minute="*"),
+    },
+    # picks up email retries whose backoff has elapsed
+    "deliver-outbound-emails-every-minute": {
+        "task": "account.tasks.deliver_outbound_emails",
+        "schedule": crontab(minute="*"),
+    },
+    # sent / failed rows are kept EMAIL_RETENTION_DAYS (account.mailer)
+    "purge-outbound-emails-daily": {
+        "task": "account.tasks.purge_outbound_emails",
+        "schedule": crontab(minute=30, hour=3),
+    },
+    "refresh-google-jwks-every-30-min": {
+        "task": "account.tasks.refresh_google_jwks_task",
+        "schedule": crontab(minute="*/30"),
+    },
+    "refresh-recommendation-queues-every-30-min": {
+        "task": "account.tasks.refresh_stale_recommendation_queues",
+        "schedule": crontab(minute="*/30"),
+    },
 }
 
 SITE_BASE_URL = env("SITE_BASE_URL", default="http://localhost:8000")
 
+# Google sign-in: OAuth client ids accepted as ID token audience (web, iOS, Android).
+# Required: while empty every Google ID token is rejected.
+GOOGLE_CLIENT_IDS = env.list("GOOGLE_CLIENT_IDS", default=[])
+# Google JWKS cache shared by the workers on one host, refreshed by Celery beat
+GOOGLE_JWKS_CACHE_PATH = env("GOOGLE_JWKS_CACHE_PATH", default=None)
+
+# location pings closer than this to the last accepted point are dropped
+LOCATION_MIN_MOVE_METERS = env.int("LOCATION_MIN_MOVE_METERS", default=50)
+
 
 
 
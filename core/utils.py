@@ -14,9 +14,18 @@ class ResponseHandler:
         errors: Optional[Union[dict, list, str]] = None,
         status_code: int = status.HTTP_200_OK,
         extra: Optional[dict] = None,
+        compact: bool = False,
     ) -> Response:
         """Unified API response builder with environment-aware debug handling."""
         normalized_data = data if isinstance(data, (dict, list)) else {}
+
+        # ?envelope=compact (core.fieldsets): successful reads send just the data
+        if compact and success:
+            payload = {"data": normalized_data}
+            if extra and isinstance(extra, dict):
+                payload["extra"] = extra
+            return Response(payload, status=status_code)
+
         normalized_errors = (
             errors if isinstance(errors, (dict, list)) else {"detail": str(errors)}
             if errors else None
@@ -55,8 +64,9 @@ class ResponseHandler:
         data: Optional[Union[dict, list]] = None,
         status_code: int = status.HTTP_200_OK,
         extra: Optional[dict] = None,
+        compact: bool = False,
     ) -> Response:
-        return cls._build_response(True, message, data, None, status_code, extra)
+        return cls._build_response(True, message, data, None, status_code, extra, compact)
 
     @classmethod
     def created(
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-16 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mutual_system', '0004_storyview'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='type',
+            field=models.CharField(choices=[('STORY_LIKE', 'Story Like'), ('USER_LIKE', 'User Like'), ('MATCH', 'Match'), ('PROFILE_SHARE', 'Profile Share'), ('REPORT', 'Report'), ('OTHER', 'Other')], max_length=50),
+        ),
+    ]
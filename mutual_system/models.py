@@ -190,6 +190,7 @@ class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('STORY_LIKE', 'Story Like'),
         ('USER_LIKE', 'User Like'),
+        ('MATCH', 'Match'),
         ('PROFILE_SHARE', 'Profile Share'),
         ('REPORT', 'Report'),
         ('OTHER', 'Other'),
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from account.images import derivative_url
 from .models import Story
 from .services import get_story_view_count, StoryLikeService
 from rest_framework import serializers
@@ -42,11 +43,8 @@ class StorySerializer(serializers.ModelSerializer):
         return obj.likes_count  # use cached field for efficiency
     
     def get_profile_pic(self, obj):
-        request = self.context.get("request")
-        if not obj.user.profile_pic:
-            return None
-        url = obj.user.profile_pic.url
-        return request.build_absolute_uri(url) if request else url
+        user = obj.user
+        return derivative_url(user.profile_pic, user.profile_pic_variants, self.context.get("request"), default_size="thumb")
 
 
 class CreateStorySerializer(serializers.ModelSerializer):
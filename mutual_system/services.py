@@ -16,6 +16,7 @@ from django.utils import timezone
 from django_redis import get_redis_connection
 
 # Local app imports
+from account.models import Match
 from .models import (
     ProfileShare,
     UserBlock,
@@ -128,15 +129,153 @@ def create_share(sharer: "User", target: str) -> tuple["ProfileShare", bool]:
 
 CACHE_TIMEOUT = 60*1
 
+BLOCK_GRAPH_TTL = 60 * 60 * 24   # idle users' sets expire and reload lazily
+BLOCK_GRAPH_LOADED = "0"         # sentinel member: set exists even with no blocks
+
+# SADD only when the set is already loaded, so a write-through never
+# creates a partial set that would hide the user's older blocks
+_SADD_IF_LOADED = REDIS.register_script(
+    "if redis.call('EXISTS', KEYS[1]) == 1 then "
+    "return redis.call('SADD', KEYS[1], ARGV[1]) end return 0"
+)
+
+
+def _uid(user) -> int:
+    return int(getattr(user, "pk", user))
+
+
+class BlockGraph:
+    """
+    Symmetric block graph in Redis.
+
+    `blocks:{user_id}` holds every user id blocked by *or* blocking that user,
+    so one set lookup answers "may these two see each other?" in both
+    directions. Sets are loaded lazily from UserBlock and written through from
+    UserBlockService after the block/unblock commits.
+    """
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"blocks:{user_id}"
+
+    @staticmethod
+    def load(user_id: int) -> set:
+        blocked = set(
+            UserBlock.objects.filter(blocker_id=user_id).values_list("blocked_id", flat=True)
+        ) | set(
+            UserBlock.objects.filter(blocked_id=user_id).values_list("blocker_id", flat=True)
+        )
+        key = BlockGraph.key(user_id)
+        pipe = REDIS.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.sadd(key, BLOCK_GRAPH_LOADED, *blocked)
+        pipe.expire(key, BLOCK_GRAPH_TTL)
+        pipe.execute()
+        return blocked
+
+    @staticmethod
+    def blocked_ids(user) -> set:
+        """Ids of everyone `user` blocked or was blocked by."""
+        user_id = _uid(user)
+        members = REDIS.smembers(BlockGraph.key(user_id))
+        if not members:
+            return BlockGraph.load(user_id)
+        return {int(m) for m in members} - {int(BLOCK_GRAPH_LOADED)}
+
+    @staticmethod
+    def is_blocked(a, b) -> bool:
+        a, b = _uid(a), _uid(b)
+        pipe = REDIS.pipeline(transaction=False)
+        pipe.exists(BlockGraph.key(a))
+        pipe.sismember(BlockGraph.key(a), b)
+        loaded, member = pipe.execute()
+        if not loaded:
+            return b in BlockGraph.load(a)
+        return bool(member)
+
+    @staticmethod
+    def exclude_blocked(viewer, ids) -> list:
+        """`ids` minus blocked pairs, order preserved (single SMISMEMBER)."""
+        ids = list(ids)
+        if not ids:
+            return ids
+        viewer_id = _uid(viewer)
+        key = BlockGraph.key(viewer_id)
+
+        pipe = REDIS.pipeline(transaction=False)
+        pipe.exists(key)
+        pipe.smismember(key, ids)
+        loaded, flags = pipe.execute()
+        if not loaded:
+            blocked = BlockGraph.load(viewer_id)
+            return [i for i in ids if int(i) not in blocked]
+        return [i for i, flag in zip(ids, flags) if not flag]
+
+    @staticmethod
+    def exclude_blocked_many(ids_by_viewer: dict) -> dict:
+        """exclude_blocked for many viewers at once: {viewer_id: ids} in one pipeline."""
+        viewers = [(_uid(viewer), list(ids)) for viewer, ids in ids_by_viewer.items() if ids]
+        pipe = REDIS.pipeline(transaction=False)
+        for viewer_id, ids in viewers:
+            pipe.exists(BlockGraph.key(viewer_id))
+            pipe.smismember(BlockGraph.key(viewer_id), ids)
+        replies = pipe.execute()
+
+        result = {_uid(viewer): [] for viewer in ids_by_viewer}
+        for n, (viewer_id, ids) in enumerate(viewers):
+            loaded, flags = replies[2 * n], replies[2 * n + 1]
+            if not loaded:
+                blocked = BlockGraph.load(viewer_id)
+                flags = [int(i) in blocked for i in ids]
+            result[viewer_id] = [i for i, flag in zip(ids, flags) if not flag]
+        return result
+
+    @staticmethod
+    def exclude_from(viewer, queryset, field: str = "pk"):
+        """Drop blocked users from a queryset with a literal id list (no join)."""
+        blocked = BlockGraph.blocked_ids(viewer)
+        if not blocked:
+            return queryset
+        return queryset.exclude(**{f"{field}__in": blocked})
+
+    @staticmethod
+    def add(blocker_id: int, blocked_id: int) -> None:
+        _SADD_IF_LOADED(keys=[BlockGraph.key(blocker_id)], args=[blocked_id])
+        _SADD_IF_LOADED(keys=[BlockGraph.key(blocked_id)], args=[blocker_id])
+
+    @staticmethod
+    def remove(blocker_id: int, blocked_id: int) -> None:
+        # the reverse block (if any) keeps the pair apart
+        if UserBlock.objects.filter(blocker_id=blocked_id, blocked_id=blocker_id).exists():
+            return
+        pipe = REDIS.pipeline(transaction=False)
+        pipe.srem(BlockGraph.key(blocker_id), blocked_id)
+        pipe.srem(BlockGraph.key(blocked_id), blocker_id)
+        pipe.execute()
+
+
 class UserBlockService:
     @staticmethod
     @transaction.atomic
     def block_user(blocker, blocked_user_id):
+        from account.recommendations import RecommendationQueue  # account imports this module
+
         blocked = User.objects.get(user_id=blocked_user_id)
         obj, created = UserBlock.objects.get_or_create(
             blocker=blocker, blocked=blocked
         )
         cache.delete(f"user_block_list_{blocker.user_id}")
+
+        # a block ends any match between the two
+        Match.objects.filter(user=blocker, matched_user=blocked).delete()
+        Match.objects.filter(user=blocked, matched_user=blocker).delete()
+
+        def write_through(a=blocker.user_id, b=blocked.user_id):
+            BlockGraph.add(a, b)
+            RecommendationQueue.remove(a, [b])
+            RecommendationQueue.remove(b, [a])
+
+        transaction.on_commit(write_through)
         return obj, created
 
     @staticmethod
@@ -146,6 +285,8 @@ class UserBlockService:
             blocker=blocker, blocked__user_id=blocked_user_id
         ).delete()
         cache.delete(f"user_block_list_{blocker.user_id}")
+        if deleted_count:
+            transaction.on_commit(lambda: BlockGraph.remove(blocker.user_id, int(blocked_user_id)))
         return deleted_count
 
     @staticmethod
@@ -298,6 +439,9 @@ class StoryLikeService:
         if story.user == user:
             raise ValueError("You cannot like your own story.")
 
+        if BlockGraph.is_blocked(user, story.user_id):
+            raise ValueError("Story not found.")
+
         obj, created = StoryLike.objects.get_or_create(story=story, user=user)
         if not created:
             raise ValueError("You have already liked this story.")
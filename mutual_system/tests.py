@@ -1,3 +1,56 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import Story, StoryView
+from .services import BlockGraph, UserBlockService
+
+User = get_user_model()
+
+
+class StoryViewBlockTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com", password="x", username="owner")
+        self.viewer = User.objects.create_user(email="viewer@example.com", password="x", username="viewer")
+        self.story = Story.objects.create(user=self.owner, text="hello")
+        # drop Redis block sets left over from other runs
+        BlockGraph.load(self.owner.pk)
+        BlockGraph.load(self.viewer.pk)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+        self.url = reverse("view-story", kwargs={"story_id": self.story.id})
+
+    def test_view_is_recorded(self):
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(StoryView.objects.filter(story=self.story, viewer=self.viewer).exists())
+
+    def test_blocked_viewer_gets_404_and_no_view(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserBlockService.block_user(self.owner, self.viewer.pk)
+
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(StoryView.objects.filter(story=self.story).exists())
+        self.story.refresh_from_db()
+        self.assertEqual(self.story.view_count, 0)
+
+
+class BlockGraphBatchTests(TestCase):
+    def test_exclude_blocked_many_matches_exclude_blocked(self):
+        a, b, c = [
+            User.objects.create_user(email=f"{name}@example.com", password="x", username=name)
+            for name in ("a", "b", "c")
+        ]
+        for user in (a, b, c):
+            BlockGraph.load(user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserBlockService.block_user(a, b.pk)
+
+        result = BlockGraph.exclude_blocked_many({a.pk: [b.pk, c.pk], c.pk: [a.pk, b.pk]})
+
+        self.assertEqual(result, {a.pk: [c.pk], c.pk: [a.pk, b.pk]})
@@ -24,6 +24,9 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 
 from core.utils import ResponseHandler
+from account.cards import ProfileCardCache
+from account.distance import distances_km
+from account.images import derivative_url
 
 from .models import Story, UserFace
 
@@ -41,6 +44,7 @@ from .services import (
     add_story_view,
     get_story_viewers,
     create_share,
+    BlockGraph,
     UserBlockService,
     ReportService,
     ReportServiceError,
@@ -52,6 +56,8 @@ from .serializers import NotificationSerializer
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+STORY_DISTANCE_MODE = "round"  # whole km for viewer lists, see account.distance
+
 
 
 class SmallPagination(PageNumberPagination):
@@ -131,7 +137,6 @@ class MyStoriesAPIView(APIView):
             # 2) Fetch top N viewers per story (PostgreSQL window function)
             views_qs = (
                 StoryView.objects.filter(story_id__in=story_ids)
-                .select_related("viewer")
                 .annotate(
                     rn=Window(
                         expression=RowNumber(),
@@ -143,15 +148,21 @@ class MyStoriesAPIView(APIView):
                 .order_by("story_id", "-created_at")
             )
 
+            views = list(views_qs)
+            # viewers come from the profile card cache instead of a users join
+            ProfileCardCache.attach(views, "viewer", presence=False)
+            # distance from me to every viewer on the page, one vectorized pass
+            distances = distances_km(request.user, [v.viewer for v in views], STORY_DISTANCE_MODE)
+
             viewers_map = defaultdict(list)
 
-            for v in views_qs:
+            for v in views:
                 viewer = v.viewer
                 viewers_map[v.story_id].append({
                     "user_id": viewer.user_id,
                     "full_name": viewer.full_name,
-                    "profile_pic": viewer.profile_pic.url if viewer.profile_pic else None,
-                    "distance": viewer.distance,  # 👈 directly from UserAuth
+                    "profile_pic": derivative_url(viewer.profile_pic, viewer.profile_pic_variants, request, "thumb"),
+                    "distance": distances.get(viewer.user_id),  # km
                 })
 
             # Build response
@@ -260,6 +271,10 @@ class StoryViewAPIView(APIView):
                 is_deleted=False
             )
 
+            # blocked either way -> the story doesn't exist for this viewer
+            if BlockGraph.is_blocked(request.user, story.user_id):
+                return ResponseHandler.not_found(message="Story not found.")
+
             # Prevent users from viewing their own story
             if story.user_id == request.user.user_id:  # or story.user.user_id == request.user.user_id (depending on your AUTH model)
                 return ResponseHandler.bad_request(message="You cannot view your own story.")
@@ -315,9 +330,11 @@ class StoryViewersAPIView(APIView):
             offset = (page - 1) * limit
 
             viewer_ids, total = get_story_viewers(story_id, offset, limit)
-            viewers = User.objects.filter(user_id__in=viewer_ids).only('user_id', 'full_name', 'profile_pic',)
+            viewer_ids = BlockGraph.exclude_blocked(request.user, viewer_ids)
+            viewers = ProfileCardCache.ordered(viewer_ids, presence=False)
+            distances = distances_km(request.user, viewers, STORY_DISTANCE_MODE)
 
-            data = [{"id": u.user_id,"full_name": u.full_name,"profile_pic": u.profile_pic.url if u.profile_pic else None} for u in viewers]
+            data = [{"id": u.user_id,"full_name": u.full_name,"profile_pic": derivative_url(u.profile_pic, u.profile_pic_variants, request, "thumb"),"distance": distances.get(u.user_id)} for u in viewers]
             return ResponseHandler.success(
                 message="Fetched story viewers successfully.",
                 data=data,
@@ -339,11 +356,13 @@ class GlobalStoriesAPIView(APIView):
                 is_deleted=False
             ).select_related('user').only(
                 'id', 'text', 'media', 'view_count', 'created_at', 'expires_at', 'user__username', 'user__full_name',
+                'user__profile_pic', 'user__profile_pic_variants',
             )
 
             # Exclude current user's stories if authenticated
             if request.user.is_authenticated:
                 stories = stories.exclude(user=request.user)
+                stories = BlockGraph.exclude_from(request.user, stories, field="user_id")
 
             stories = list(stories)
             random.shuffle(stories)
@@ -690,6 +709,9 @@ class UserStoriesAPIView(APIView):
 
             user = story.user
 
+            if BlockGraph.is_blocked(request.user, user):
+                return ResponseHandler.not_found(message="Story not found.")
+
             # Fetch all active stories of this user
             user_stories = Story.objects.filter(
                 user__user_id=user.user_id,
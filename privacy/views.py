@@ -13,6 +13,7 @@ from .serializers import (
     ShareThoughtsSerializer
 )
 from account.permissions import IsSuperUserOrReadOnly
+from core.conditional import make_etag, not_modified, set_validators
 
 
 class SingleObjectViewMixin:
@@ -24,18 +25,27 @@ class BaseSingleObjectView(SingleObjectViewMixin, generics.RetrieveUpdateAPIView
     permission_classes = [IsSuperUserOrReadOnly]
 
     def get(self, request, *args, **kwargs):
-        instance = self.get_object()
-        if not instance:
+        # ETag / Last-Modified from last_updated: app start-up polls get a 304
+        # without loading or serializing the (long) description
+        version = self.queryset.values_list("pk", "last_updated").first()
+        if not version:
             return Response(
                 {"success": False, "message": "No content found.", "data": None},
                 status=status.HTTP_404_NOT_FOUND
             )
+        pk, last_updated = version
+        etag = make_etag(request, self.queryset.model._meta.label, pk, last_updated.isoformat())
+        cached = not_modified(request, etag, last_updated, private=False)
+        if cached is not None:
+            return cached
 
+        instance = self.get_object()
         serializer = self.get_serializer(instance)
-        return Response(
+        response = Response(
             {"success": True, "message": "Content retrieved successfully.", "data": serializer.data},
             status=status.HTTP_200_OK
         )
+        return set_validators(response, etag, last_updated, private=False)
 
     @transaction.atomic
     def put(self, request, *args, **kwargs):